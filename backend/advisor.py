@@ -0,0 +1,339 @@
+"""Investigation advisor: which question teaches the investigator the most.
+
+An option is one face-up card put to one opponent, optionally paired with a
+zero-coin card for a double investigation. Its value is the expected number
+of hidden triples it rules out for the investigator:
+
+    expected remaining = sum over outcomes o of P(o) * candidates left after o
+
+Both terms are estimated from consistent deals sampled by the
+SuspectProbabilityEstimator's Markov chains. Every sample is scored against
+every option at once with NumPy: the letters of each sampled hand are
+counted on every card in play in one product with the deck's card x
+suspect incidence matrix (see decks.py), so an extra round of samples
+costs the same whatever the number of options.
+
+Scoring runs on worker threads, so handlers never wait for it. A request
+carries a snapshot of the position (see Position), never the live Game, and
+a deadline: the worker keeps drawing rounds of samples until its estimates
+settle or the deadline passes, then returns the best options found so far.
+The same workers, with the same warm chains, answer requests for a player's
+suspect probabilities (see suspect_probabilities).
+"""
+import concurrent.futures
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import decks
+import deduction_cache
+from deduction import HIDDEN, DeductionEngine
+from game_logic import Game, InvestigationResult
+from probabilities import SuspectProbabilityEstimator, np, viewer_seed
+from suspects import NUM_SUSPECTS, mask_to_letters
+
+DEFAULT_BUDGET = 1.0  # seconds, from the request to the answer
+DEFAULT_WORKERS = 2
+ROUND_STEPS = 4
+MAX_SAMPLES = 1 << 14
+SUGGESTIONS = 3
+CACHED_ENGINES = 64  # per worker
+
+# Outcomes are (coins from the face-up card, coins from the double card),
+# each 0-3, packed into one small int
+OUTCOMES = 16
+
+
+@dataclass(frozen=True)
+class Position:
+    """What the investigator knows at the start of their turn, detached from the Game"""
+    game_id: str
+    version: int
+    player_id: str
+    hand_sizes: Dict[str, int]
+    known_mask: int
+    history: Tuple[InvestigationResult, ...]
+    central_coins: int
+    deck: str  # Deck variant name
+    face_up: Tuple[Tuple[int, str], ...]  # (card index, card id)
+    opponents: Tuple[Tuple[str, str], ...]  # (player id, name)
+    double_cards: Tuple[str, ...]  # Card ids
+
+
+def snapshot(game: Game, player_id: str) -> Position:
+    """Copy what scoring needs out of the game; cheap enough to take under the game lock"""
+    player = game.get_player(player_id)
+    double_cards = game.get_zero_coin_cards() if game.can_use_double_investigation() else []
+    return Position(
+        game_id=game.game_id,
+        version=game.state_version,
+        player_id=player_id,
+        hand_sizes={p.player_id: len(p.suspect_cards) for p in game.players},
+        known_mask=player.suspect_mask,
+        history=tuple(game.investigation_history),
+        central_coins=game.central_coins,
+        deck=game.deck.name,
+        face_up=tuple((i, card.card_id) for i, card in enumerate(game.face_up_cards) if card),
+        opponents=tuple(
+            (p.player_id, p.name) for p in game.get_active_players() if p.player_id != player_id
+        ),
+        double_cards=tuple(card.card_id for card in double_cards)
+    )
+
+
+def available() -> bool:
+    return SuspectProbabilityEstimator.available()
+
+
+# ----- Scoring (runs on the workers) -----
+
+def _engine(position: Position, engines: Optional[OrderedDict]) -> Tuple[DeductionEngine, SuspectProbabilityEstimator]:
+    """The viewer's engine and estimator, from a worker's cache if it has them.
+
+    engines maps (game id, player id) to (engine, estimator), least recently
+    used first. Histories only grow during a game, so a cached engine just
+    syncs the new results and its chains stay warm.
+    """
+    if engines is None:
+        engines = OrderedDict()
+    key = (position.game_id, position.player_id)
+    cached = engines.pop(key, None)
+    if cached is not None and cached[0].results_seen > len(position.history):
+        cached = None  # A recreated game under the same id
+    if cached is None:
+        engine = DeductionEngine(position.hand_sizes, position.player_id, position.known_mask)
+        cached = (engine, SuspectProbabilityEstimator(
+            engine, seed=viewer_seed(position.game_id, position.player_id)))
+    cached[0].sync(list(position.history))
+    engines[key] = cached
+    while len(engines) > CACHED_ENGINES:
+        engines.popitem(last=False)
+    return cached
+
+
+def _options(position: Position, engine: DeductionEngine) -> List[Tuple[int, str, Optional[str], int, int, int]]:
+    """(card index, opponent id, double card id, opponent slot, card row, double row) per option.
+
+    Rows index the incidence matrix _cards_in_play returns; the last row,
+    all zeros, stands for no double card.
+    """
+    double_rows = {card_id: len(position.face_up) + i for i, card_id in enumerate(position.double_cards)}
+    no_double = len(position.face_up) + len(position.double_cards)
+    options = []
+    for row, (card_index, _) in enumerate(position.face_up):
+        for opponent_id, _ in position.opponents:
+            slot = engine.owner_index[opponent_id]
+            options.append((card_index, opponent_id, None, slot, row, no_double))
+            for card_id in position.double_cards:
+                options.append((card_index, opponent_id, card_id, slot, row, double_rows[card_id]))
+    return options
+
+
+def _cards_in_play(position: Position):
+    """(cards, suspects) incidence rows of the face-up cards, then the double cards, then a zero row"""
+    variant = decks.variant(position.deck)
+    card_ids = [card_id for _, card_id in position.face_up] + list(position.double_cards)
+    incidence = np.zeros((len(card_ids) + 1, NUM_SUSPECTS), dtype=np.float32)
+    incidence[:-1] = variant.incidence[[variant.card_rows[card_id] for card_id in card_ids]]
+    return incidence
+
+
+def _outcomes(samples, slots, card_rows, double_rows, incidence, central_coins: int):
+    """(samples, options) packed outcome of every option in every sampled deal"""
+    owners, owner_of_option = np.unique(slots, return_inverse=True)
+    num_samples, num_cards = len(samples), len(incidence)
+    hands = np.ascontiguousarray(samples[:, owners], dtype="<u4").view(np.uint8)
+    letters = np.unpackbits(hands.reshape(num_samples, len(owners), 4), axis=2, bitorder="little")
+    letters = letters[:, :, :NUM_SUSPECTS].reshape(-1, NUM_SUSPECTS).astype(np.float32)
+    # Letters of each sampled hand on each card in play: (samples, owners * cards in play)
+    found = (letters @ incidence.T).reshape(num_samples, len(owners) * num_cards)
+    coins = np.minimum(found[:, owner_of_option * num_cards + card_rows], central_coins)
+    double = np.minimum(found[:, owner_of_option * num_cards + double_rows], central_coins - coins)
+    return (coins * 4 + double).astype(np.int64)
+
+
+def _expected_remaining(triples, outcomes, candidates: int):
+    """Expected candidates left after each option, and the bits it is expected to reveal.
+
+    Candidates left after an outcome are estimated as the share of the
+    sampled triples that still occur with that outcome, so the estimate
+    does not shrink just because rare triples went unsampled.
+    """
+    num_samples, num_options = outcomes.shape
+    distinct_triples, triple_index = np.unique(triples, return_inverse=True)
+    num_triples = len(distinct_triples)
+
+    option_index = np.arange(num_options)
+    outcome_key = option_index * OUTCOMES + outcomes  # (samples, options)
+    joint_key = outcome_key * num_triples + triple_index[:, None]
+
+    outcome_counts = np.bincount(outcome_key.ravel(), minlength=num_options * OUTCOMES)
+    joint_keys, joint_counts = np.unique(joint_key.ravel(), return_counts=True)
+    triples_seen = np.bincount(joint_keys // num_triples, minlength=num_options * OUTCOMES)
+
+    outcome_counts = outcome_counts.reshape(num_options, OUTCOMES)
+    triples_seen = triples_seen.reshape(num_options, OUTCOMES)
+    remaining = (outcome_counts * triples_seen).sum(axis=1) * candidates / (num_samples * num_triples)
+
+    # I(triple; outcome) = H(outcome) + H(triple) - H(triple, outcome)
+    def entropy(counts, axis=None):
+        p = counts / num_samples
+        return -(p * np.log2(np.where(p > 0, p, 1))).sum(axis=axis)
+
+    triple_entropy = entropy(np.bincount(triple_index))
+    joint_entropy = np.bincount(
+        joint_keys // (OUTCOMES * num_triples),
+        weights=-(joint_counts / num_samples) * np.log2(joint_counts / num_samples),
+        minlength=num_options
+    )
+    bits = entropy(outcome_counts, axis=1) + triple_entropy - joint_entropy
+    return remaining, bits
+
+
+def suggest(position: Position, deadline: float, engines: Optional[OrderedDict] = None) -> Dict:
+    """Score every option for the position, returning the best found by the deadline (time.monotonic())"""
+    started = time.monotonic()
+    reply = {
+        "game_id": position.game_id,
+        "version": position.version,
+        "candidates": 0,
+        "suggestions": [],
+        "guess": None,
+        "samples": 0,
+        "complete": False
+    }
+    if started >= deadline:
+        return reply
+
+    engine, estimator = _engine(position, engines)
+    candidates = engine.candidate_masks()
+    reply["candidates"] = len(candidates)
+    if len(candidates) == 1:
+        reply["guess"] = mask_to_letters(candidates[0])
+        reply["complete"] = True
+        return reply
+    options = _options(position, engine)
+    if not candidates or not options:
+        reply["complete"] = True
+        return reply
+    if time.monotonic() >= deadline:  # Narrowing a cold engine can take a while
+        return reply
+
+    slots = np.array([o[3] for o in options], dtype=np.int64)
+    card_rows = np.array([o[4] for o in options], dtype=np.int64)
+    double_rows = np.array([o[5] for o in options], dtype=np.int64)
+    incidence = _cards_in_play(position)
+
+    triples, outcomes = [], []
+    remaining = bits = None
+    while time.monotonic() < deadline:
+        samples = estimator.sample_deals(ROUND_STEPS, deadline)
+        if samples is None:
+            break  # Still burning in; the chains stay warm for the next request
+        triples.append(samples[:, HIDDEN])
+        outcomes.append(_outcomes(samples, slots, card_rows, double_rows, incidence, position.central_coins))
+        remaining, bits = _expected_remaining(
+            np.concatenate(triples), np.concatenate(outcomes), len(candidates)
+        )
+        reply["samples"] = len(triples) * len(samples)
+        if reply["samples"] >= MAX_SAMPLES:
+            reply["complete"] = True
+            break
+    if remaining is None:
+        return reply
+
+    names = dict(position.opponents)
+    ranked = np.lexsort((-bits, remaining))[:SUGGESTIONS]
+    reply["suggestions"] = [{
+        "card_index": options[i][0],
+        "questioned_player_id": options[i][1],
+        "questioned_player_name": names[options[i][1]],
+        "double_card_id": options[i][2],
+        "expected_remaining": round(float(remaining[i]), 2),
+        "expected_reduction": round(len(candidates) - float(remaining[i]), 2),
+        "information_bits": round(float(bits[i]), 3)
+    } for i in ranked]
+    return reply
+
+
+def suspect_probabilities(position: Position, deadline: float, engines: Optional[OrderedDict] = None) -> Dict:
+    """The viewer's suspect probabilities, refined until final or the deadline (time.monotonic())"""
+    def compute():
+        _, estimator = _engine(position, engines)
+        estimate = estimator.estimate()
+        while not estimator.final and time.monotonic() < deadline:
+            estimate = estimator.estimate()
+        return estimate, estimator.final
+
+    canonical = deduction_cache.canonical_position(
+        position.hand_sizes, position.player_id, position.known_mask, position.history)
+    return {
+        "game_id": position.game_id,
+        "version": position.version,
+        "probabilities": deduction_cache.shared.probabilities(canonical, compute)
+    }
+
+
+# ----- The workers (in the server) -----
+
+class InvestigationAdvisor:
+    """Runs suggest() and suspect_probabilities() on a few worker threads.
+
+    Each game is pinned to one worker, which keeps the engines of the
+    games it serves warm. A player has at most one request of each kind
+    pending. Submitting never blocks: the answer is handed to the deliver
+    callback on the worker's thread.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, budget: float = DEFAULT_BUDGET,
+                 observe: Optional[Callable[[Dict, float], None]] = None):
+        self.budget = budget
+        self.observe = observe
+        self._workers = [
+            concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"advisor-{i}")
+            for i in range(max(1, workers))
+        ]
+        self._engines = [OrderedDict() for _ in self._workers]
+        self._pending: Set[Tuple[str, str, str]] = set()
+        self._lock = threading.Lock()
+
+    def submit(self, position: Position, deliver: Callable[[Dict], None]) -> bool:
+        """Queue a position for suggest(); False if the player already has a suggestion in flight"""
+        return self._queue("Suggestion", suggest, position, deliver, self.observe)
+
+    def submit_probabilities(self, position: Position, deliver: Callable[[Dict], None]) -> bool:
+        """Queue a position for suspect_probabilities(); False if the player already has one in flight"""
+        return self._queue("Estimate", suspect_probabilities, position, deliver)
+
+    def _queue(self, kind: str, work: Callable[[Position, float, OrderedDict], Dict], position: Position,
+               deliver: Callable[[Dict], None], observe: Optional[Callable[[Dict, float], None]] = None) -> bool:
+        key = (kind, position.game_id, position.player_id)
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+
+        index = hash(position.game_id) % len(self._workers)
+        submitted = time.monotonic()
+
+        def run():
+            try:
+                reply = work(position, submitted + self.budget, self._engines[index])
+            except Exception as exc:
+                reply = {"game_id": position.game_id, "version": position.version,
+                         "error": f"{kind} failed: {exc}"}
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+            if observe:
+                observe(reply, time.monotonic() - submitted)
+            deliver(reply)
+
+        self._workers[index].submit(run)
+        return True
+
+    def shutdown(self) -> None:
+        for worker in self._workers:
+            worker.shutdown(wait=False, cancel_futures=True)
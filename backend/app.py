@@ -1,43 +1,802 @@
-from flask import Flask, request
+from flask import Flask, Response, request
 from flask_socketio import SocketIO, emit, join_room, leave_room
+from socketio import packet as socketio_packet
 from flask_cors import CORS
+import functools
+import hmac
+import os
+import secrets
+import random
+import threading
+import time
 import uuid
 import logging
-from game_logic import Game, GameStatus, PlayerStatus
+from game_logic import STATE_DELTA_WINDOW, Game, GameStatus
+from persistence import GameStore
+from replay import GameReplay
+from collections import OrderedDict, deque
+from sharding import BusClientManager, ShardRouter, create_bus
+from spectators import SpectatorFeed
+from bot_turns import BotTurns
+import advisor
+import bots
+import deduction_cache
+import decks
+import lobbies
+import metrics
+import move_updates
+import state_codec
+from log_pipeline import LogPipeline
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# Structured JSON logs, written by a background thread (see log_pipeline.py)
+log_pipeline = LogPipeline.from_config(
+    level=os.environ.get('BLACK_VIENNA_LOG_LEVEL', 'INFO'),
+    path=os.environ.get('BLACK_VIENNA_LOG_FILE'),
+    sampling=os.environ.get('BLACK_VIENNA_LOG_SAMPLING', 'engineio=0.01,socketio=0.1')
+)
+logger = logging.getLogger('app')
+ADMIN_TOKEN = os.environ.get('BLACK_VIENNA_ADMIN_TOKEN')
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*", logger=True, engineio_logger=True)
+
+# Sharding: with several workers, each owns the games whose ID hashes to its
+# shard and rooms are shared through the message bus
+SHARD_COUNT = int(os.environ.get('BLACK_VIENNA_SHARDS', '1'))
+SHARD_ID = int(os.environ.get('BLACK_VIENNA_SHARD_ID', '0'))
+BUS_URL = os.environ.get('BLACK_VIENNA_BUS_URL', 'local://')
+
+# Metrics served at /metrics; children are bound up front so the hot path only increments
+registry = metrics.Registry()
+HANDLER_SECONDS = registry.register(metrics.Histogram(
+    'black_vienna_handler_seconds', 'Socket.IO event handler latency', ['event']))
+EMITS = registry.register(metrics.Counter(
+    'black_vienna_emits_total', 'Socket.IO emits by event', ['event']))
+EMITTED_BYTES = registry.register(metrics.Counter(
+    'black_vienna_emitted_bytes_total', 'Encoded Socket.IO payload bytes by event', ['event']))
+STATE_SECONDS = registry.register(metrics.Histogram(
+    'black_vienna_state_build_seconds', 'Time spent building game state payloads', ['method'],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01, 0.1)))
+CONNECTED_CLIENTS = registry.register(metrics.Gauge(
+    'black_vienna_connected_clients', 'Open Socket.IO connections'))
+SPECTATOR_SKIPS = registry.register(metrics.Counter(
+    'black_vienna_spectator_versions_skipped_total', 'State versions not sent to slow spectators'))
+ADVISOR_SECONDS = registry.register(metrics.Histogram(
+    'black_vienna_advisor_seconds', 'Time from a suggest_investigation request to its answer', ['outcome']))
+packet_json = metrics.PacketJSON(EMITS, EMITTED_BYTES)
+
+# The state payloads handlers build, timed here rather than inside Game so
+# other users of Game are unaffected and nested builds are not counted twice
+@metrics.timed(STATE_SECONDS.labels('get_game_state'))
+def public_state(game):
+    return game.get_game_state()
+
+@metrics.timed(STATE_SECONDS.labels('get_player_view'))
+def player_view(game, player_id):
+    return game.get_player_view(player_id)
+
+@metrics.timed(STATE_SECONDS.labels('get_player_update'))
+def player_update(game, player_id, since_version):
+    return game.get_player_update(player_id, since_version)
+
+# Logger objects rather than True, so Socket.IO goes through the pipeline instead of its own handlers
+socketio_options = dict(cors_allowed_origins="*", json=packet_json,
+                        serializer=packet_json.packet_class(socketio_packet.Packet),
+                        logger=logging.getLogger('socketio.server'),
+                        engineio_logger=logging.getLogger('engineio.server'))
+if SHARD_COUNT > 1:
+    bus = create_bus(BUS_URL)
+    router = ShardRouter(SHARD_ID, SHARD_COUNT, bus)
+    socketio = SocketIO(app, client_manager=BusClientManager(bus), **socketio_options)
+else:
+    router = None
+    socketio = SocketIO(app, **socketio_options)
+
+# Event log and snapshots, so running games survive a restart
+DATA_DIR = os.environ.get('BLACK_VIENNA_DATA_DIR', 'game_data')
+if router:
+    DATA_DIR = os.path.join(DATA_DIR, f"shard-{SHARD_ID}")
+SNAPSHOT_INTERVAL = int(os.environ.get('BLACK_VIENNA_SNAPSHOT_INTERVAL', '60'))
+store = GameStore(DATA_DIR)
 
 # Store active games and player sessions
-games = {}
-player_sessions = {}  # Maps session_id to {game_id, player_id}
+games = store.load()
+player_sessions = {}  # Maps player_id (the sid that took the seat) to {game_id, player_id, sid, ...}
+connection_players = {}  # sid -> player_id for connections that resumed a seat taken by another sid
+resume_tokens = {}  # resume token -> player_id
+replays = OrderedDict()  # Recently reviewed finished games, most recent last
+replays_guard = threading.Lock()  # Replays are looked up by several handler threads at once
+connection_games = {}  # sid -> game_id for connections whose game lives on another shard
+routed_handlers = {}  # handler name -> undecorated handler, for forwarded events
+connection_encodings = {}  # sid -> state payload encoding negotiated at connect, if not JSON
+game_locks = {}  # game_id -> lock serializing the events of that game
+game_locks_guard = threading.Lock()
+spectator_feeds = {}  # game_id -> SpectatorFeed of the game's spectators
+spectator_games = {}  # sid -> game_id the connection is spectating
+open_games = lobbies.OpenGames()  # Listed lobbies with free seats, for quick_match
+match_queue = lobbies.MatchQueue()  # Connections waiting for a quick match
+MAX_CACHED_REPLAYS = 64
+logger.info("Restored games", extra={'games': len(games), 'data_dir': DATA_DIR})
+
+# Eviction: finished games are dropped after ENDED_GAME_TTL seconds, lobbies and
+# running games after IDLE_GAME_TTL seconds without any event, lobbies at once when
+# their last human leaves
+ENDED_GAME_TTL = int(os.environ.get('BLACK_VIENNA_ENDED_TTL', '600'))
+IDLE_GAME_TTL = int(os.environ.get('BLACK_VIENNA_IDLE_TTL', '3600'))
+SWEEP_INTERVAL = int(os.environ.get('BLACK_VIENNA_SWEEP_INTERVAL', '30'))
+MAX_LIVE_GAMES = int(os.environ.get('BLACK_VIENNA_MAX_GAMES', '5000'))
+evicted_counts = {'ended': 0, 'idle': 0, 'capacity': 0, 'empty': 0}  # Updated under game_locks_guard
+for restored in games.values():
+    restored['last_active'] = time.monotonic()
+
+# A disconnected player's seat is held for RESUME_GRACE seconds: reconnecting with the
+# resume token from game_created/game_joined takes it back without re-joining
+RESUME_GRACE = int(os.environ.get('BLACK_VIENNA_RESUME_GRACE', '120'))
+
+# quick_match retries this many open lobbies (each may fill up meanwhile) before queueing
+QUICK_MATCH_ATTEMPTS = 3
+
+# Spectators don't take seats; one whose connection has more than SPECTATOR_MAX_BACKLOG
+# unsent packets skips versions and is sent the latest one once it has caught up
+MAX_SPECTATORS = int(os.environ.get('BLACK_VIENNA_MAX_SPECTATORS', '1000'))
+SPECTATOR_MAX_BACKLOG = int(os.environ.get('BLACK_VIENNA_SPECTATOR_BACKLOG', '4'))
+SPECTATOR_CATCH_UP_INTERVAL = float(os.environ.get('BLACK_VIENNA_SPECTATOR_CATCH_UP', '1'))
+
+# Investigation suggestions and suspect probabilities are computed on ADVISOR_WORKERS
+# threads and answered within ADVISOR_BUDGET seconds of the request, with the best found by then
+ADVISOR_WORKERS = int(os.environ.get('BLACK_VIENNA_ADVISOR_WORKERS', '2'))
+ADVISOR_BUDGET = float(os.environ.get('BLACK_VIENNA_ADVISOR_BUDGET', '1.0'))
+
+def advisor_outcome(reply, seconds):
+    outcome = 'error' if 'error' in reply else 'complete' if reply['complete'] else 'budget'
+    ADVISOR_SECONDS.labels(outcome).observe(seconds)
+
+investigation_advisor = advisor.InvestigationAdvisor(ADVISOR_WORKERS, ADVISOR_BUDGET, observe=advisor_outcome)
+
+# The host can seat bots in the lobby. A bot plays its turn BOT_THINK_TIME seconds after
+# it becomes the investigator, on one of BOT_WORKERS threads shared by all games
+BOT_WORKERS = int(os.environ.get('BLACK_VIENNA_BOT_WORKERS', '4'))
+BOT_THINK_TIME = float(os.environ.get('BLACK_VIENNA_BOT_THINK_TIME', '1.5'))
+BOT_POLICY = os.environ.get('BLACK_VIENNA_BOT_POLICY', 'solver')
+bot_rng = random.Random()
+
+# Candidate triples and suspect probabilities are cached across games by canonical position
+deduction_cache.shared.capacity = int(os.environ.get('BLACK_VIENNA_DEDUCTION_CACHE', '2048'))
+
+def on_event(event):
+    """socketio.on(event), recording the handler's latency in HANDLER_SECONDS"""
+    def decorator(handler):
+        return socketio.on(event)(metrics.timed(HANDLER_SECONDS.labels(event))(handler))
+    return decorator
+
+def snapshot_loop():
+    """Background task: periodically write a compact snapshot of every running game"""
+    while True:
+        socketio.sleep(SNAPSHOT_INTERVAL)
+        try:
+            count = store.write_snapshot(games, lock_for=game_lock)
+            logger.info("Snapshot written", extra={'games': count})
+        except Exception as e:
+            logger.error("Error writing snapshot", extra={'error': str(e)})
+
+def game_expired(game_data, now):
+    ttl = ENDED_GAME_TTL if game_data['game'].game_status == GameStatus.ENDED else IDLE_GAME_TTL
+    return now - game_data['last_active'] >= ttl
+
+def evict_game(game_id, reason, still_evictable=lambda game_data: True):
+    """Drop a game from memory, keeping its event log in the archive; returns True if evicted"""
+    with game_lock(game_id):
+        game_data = games.get(game_id)
+        if game_data is None or not still_evictable(game_data):
+            return False
+        del games[game_id]
+        open_games.remove(game_id)
+        # Lobbies have no log; finished games were archived when they ended
+        if game_data['game'].game_status != GameStatus.WAITING:
+            store.archive(game_id)
+        for player_data in game_data['players']:
+            session = player_sessions.get(player_data['id'])
+            if session and session['game_id'] == game_id:
+                end_session(player_data['id'])
+        socketio.close_room(game_id)
+        feed = spectator_feeds.pop(game_id, None)
+        for sid in (feed.spectators if feed else ()):
+            spectator_games.pop(sid, None)
+        socketio.close_room(spectator_room(game_id))
+        for encoding in state_codec.available_encodings():
+            if encoding != state_codec.JSON:
+                socketio.close_room(state_room(game_id, encoding))
+    with game_locks_guard:
+        game_locks.pop(game_id, None)
+        evicted_counts[reason] += 1  # The sweeper and handler threads both evict
+    return True
+
+def abandon_seats(now):
+    """Give up the seats of players who did not come back within RESUME_GRACE"""
+    for player_id, session in list(player_sessions.items()):
+        disconnected_at = session.get('disconnected_at')
+        if disconnected_at is None or now - disconnected_at < RESUME_GRACE:
+            continue
+        with game_lock(session['game_id']):
+            if player_sessions.get(player_id) is not session or session.get('disconnected_at') != disconnected_at:
+                continue  # Resumed or gone meanwhile
+            end_session(player_id)
+            game_data = games.get(session['game_id'])
+            if not game_data:
+                continue
+            if game_data['game'].game_status == GameStatus.WAITING:
+                free_seat(session['game_id'], game_data, player_id)
+            elif game_data['game'].game_status == GameStatus.ACTIVE:
+                # Pushes emit to rooms only, so a bare request context is enough
+                with app.test_request_context('/'):
+                    request.namespace = '/'
+                    forfeit_seat(session['game_id'], player_id)
+
+def sweep_games():
+    """Evict every finished or idle game whose TTL has run out; returns the number evicted"""
+    now = time.monotonic()
+    abandon_seats(now)
+    evicted = 0
+    for game_id, game_data in list(games.items()):
+        if game_expired(game_data, now):
+            reason = 'ended' if game_data['game'].game_status == GameStatus.ENDED else 'idle'
+            evicted += evict_game(game_id, reason, lambda current: game_expired(current, now))
+    return evicted
+
+def make_room_for_game():
+    """Enforce MAX_LIVE_GAMES before creating a game, evicting the oldest finished games first"""
+    if len(games) < MAX_LIVE_GAMES:
+        return True
+    sweep_games()
+    ended = sorted(
+        (game_data['last_active'], game_id) for game_id, game_data in list(games.items())
+        if game_data['game'].game_status == GameStatus.ENDED
+    )
+    for _, game_id in ended[:len(games) - MAX_LIVE_GAMES + 1]:
+        evict_game(game_id, 'capacity')
+    return len(games) < MAX_LIVE_GAMES
+
+def sweep_loop():
+    """Background task: evict finished and abandoned games"""
+    while True:
+        socketio.sleep(SWEEP_INTERVAL)
+        try:
+            evicted = sweep_games()
+            if evicted:
+                logger.info("Evicted games", extra={'evicted': evicted, 'resident': len(games)})
+        except Exception as e:
+            logger.error("Error sweeping games", extra={'error': str(e)})
+
+def routed(handler):
+    """Run a game event on the shard that owns the game, forwarding it there if needed"""
+    routed_handlers[handler.__name__] = handler
+    
+    @functools.wraps(handler)
+    def wrapper(data=None):
+        game_id = str((data or {}).get('game_id') or '').strip().upper()
+        if router and game_id and not router.owns(game_id):
+            connection_games[request.sid] = game_id
+            router.forward(game_id, handler.__name__, request.sid, data,
+                           encoding=connection_encodings.get(request.sid, state_codec.JSON))
+            return
+        return handler(data)
+    
+    return wrapper
+
+def game_lock(game_id):
+    """The lock serializing every event of one game (created on first use)"""
+    with game_locks_guard:
+        lock = game_locks.get(game_id)
+        if lock is None:
+            lock = game_locks[game_id] = threading.RLock()
+        return lock
+
+def serialized(handler):
+    """Apply a game event atomically and in order with the other events of the same game.
+
+    Events of different games still run in parallel. The game is taken from
+    data['game_id'], or from the sender's session for events without one.
+    """
+    @functools.wraps(handler)
+    def wrapper(data=None):
+        game_id = (data or {}).get('game_id') or player_sessions.get(current_player_id(), {}).get('game_id')
+        game_id = str(game_id or '').strip().upper()
+        if game_id not in games:
+            return handler(data)
+        with game_lock(game_id):
+            try:
+                return handler(data)
+            finally:
+                game_data = games.get(game_id)
+                if game_data is not None:
+                    game_data['last_active'] = time.monotonic()
+    
+    return wrapper
+
+def dispatch_forwarded(handler_name, sid, data, context):
+    """Run an event forwarded by another shard as if its client were connected here"""
+    if context.get('encoding', state_codec.JSON) != state_codec.JSON:
+        connection_encodings[sid] = context['encoding']
+    with app.test_request_context('/'):
+        request.sid = sid
+        request.namespace = '/'
+        routed_handlers[handler_name](data)
+
+def new_game_id():
+    """Generate a game ID (8 characters for easier sharing) owned by this shard"""
+    while True:
+        game_id = str(uuid.uuid4())[:8].upper()
+        if game_id not in games and (router is None or router.owns(game_id)):
+            return game_id
+
+def current_player_id():
+    """The player the sending connection plays as: its own sid, unless it resumed a seat"""
+    return connection_players.get(request.sid, request.sid)
+
+def player_connection(player_id):
+    """The sid of the connection currently holding a player's seat"""
+    session = player_sessions.get(player_id)
+    return session['sid'] if session else player_id
+
+def new_session(game_id, player_name, sid):
+    """Seat a connection as a new player; returns the token to resume the seat with"""
+    previous_player_id = connection_players.pop(sid, None)
+    if previous_player_id in player_sessions:
+        player_sessions[previous_player_id]['disconnected_at'] = time.monotonic()
+    token = secrets.token_urlsafe(16)
+    resume_tokens[token] = sid
+    player_sessions[sid] = {
+        'game_id': game_id,
+        'player_id': sid,
+        'player_name': player_name,
+        'sid': sid,
+        'resume_token': token
+    }
+    return token
+
+def restore_seats(game_id, game_data):
+    """Hold the human seats of a game restored at startup as if their connections had just dropped"""
+    names = {p['id']: p['name'] for p in game_data['players']}
+    for player_id, token in game_data.get('resume_tokens', {}).items():
+        resume_tokens[token] = player_id
+        player_sessions[player_id] = {
+            'game_id': game_id,
+            'player_id': player_id,
+            'player_name': names[player_id],
+            'sid': player_id,
+            'resume_token': token,
+            'disconnected_at': time.monotonic()
+        }
+
+def end_session(player_id):
+    session = player_sessions.pop(player_id, None)
+    if session:
+        resume_tokens.pop(session['resume_token'], None)
+        if connection_players.get(session['sid']) == player_id:
+            del connection_players[session['sid']]
+
+def lobby_state(game_data):
+    return {
+        'players': game_data['players'],
+        'min_players': lobbies.MIN_PLAYERS,
+        'max_players': lobbies.MAX_PLAYERS,
+        'can_start': len(game_data['players']) >= lobbies.MIN_PLAYERS,
+        'host_id': game_data['host'],
+        'deck': game_data.get('deck', decks.DEFAULT),
+        'listed': bool(game_data.get('listed')),
+        'bot_policies': sorted(bots.POLICIES)
+    }
+
+def encode_for(game, player_id, payload):
+    """A player state payload in the encoding the player's connection negotiated"""
+    encoding = connection_encodings.get(player_connection(player_id), state_codec.JSON)
+    if encoding == state_codec.JSON:
+        return payload
+    return state_codec.encode(payload, game.players, encoding)
+
+def state_room(game_id, encoding):
+    """Room of a game's players whose connections use a state encoding other than JSON"""
+    return f"{game_id}:{encoding}"
+
+def join_game_rooms(game_id, sid=None):
+    sid = sid or request.sid
+    join_room(game_id, sid=sid, namespace='/')
+    encoding = connection_encodings.get(sid, state_codec.JSON)
+    if encoding != state_codec.JSON:
+        join_room(state_room(game_id, encoding), sid=sid, namespace='/')
+
+def send_player_state(event, game, player_id, payload):
+    """Emit a player's own state, remembering the private fields it leaves their client with"""
+    session = player_sessions.get(player_id)
+    if session is not None:
+        session['private'] = move_updates.held_private(session.get('private'), payload)
+    emit(event, encode_for(game, player_id, payload), room=player_id)
+
+def push_move(game_id, update):
+    """Send a move to the whole game: one broadcast per encoding, then the private envelopes"""
+    game_data = games[game_id]
+    game = game_data['game']
+    game_data.setdefault('recent_events', deque(maxlen=STATE_DELTA_WINDOW)).append(
+        (update['version'], update['events']))
+    by_encoding = {}
+    for player_data in game_data['players']:
+        sid = player_connection(player_data['id'])
+        by_encoding.setdefault(connection_encodings.get(sid, state_codec.JSON), []).append(sid)
+    for encoding in by_encoding:
+        if encoding == state_codec.JSON:
+            # Players on other encodings are in the game room too
+            other_players = [sid for other, sids in by_encoding.items() if other != encoding for sid in sids]
+            emit('game_state_update', update, room=game_id, skip_sid=other_players or None)
+        else:
+            emit('game_state_update', state_codec.encode(update, game.players, encoding),
+                 room=state_room(game_id, encoding))
+    
+    for player_data in game_data['players']:
+        session = player_sessions.get(player_data['id'])
+        if session is None:
+            continue
+        session['private'] = move_updates.held_private(session.get('private'), update)
+        envelope = move_updates.private_envelope(game, player_data['id'], session['private'])
+        if envelope:
+            send_player_state('game_state_update', game, player_data['id'], envelope)
+    
+    push_spectators(game_id, update['events'])
+    schedule_bot_turn(game_id)
+
+# ----- Lobbies -----
+
+def open_lobby(sid, player_name, deck=decks.DEFAULT, listed=True, guests=()):
+    """Create a game hosted by a connection and seat the (sid, name) guests; returns its id,
+    or None when the server is full.
+
+    A listed lobby is in the open-game index, where quick_match finds it, and
+    takes in the players already waiting for a quick match.
+    """
+    if not make_room_for_game():
+        return None
+    game_id = new_game_id()
+    with game_lock(game_id):
+        games[game_id] = {
+            'game': Game(game_id),
+            'players': [{'id': sid, 'name': player_name}],
+            'host': sid,
+            'deck': deck,
+            'listed': listed,
+            'last_active': time.monotonic()
+        }
+        join_game_rooms(game_id, sid)
+        match_queue.cancel(sid)
+        resume_token = new_session(game_id, player_name, sid)
+        logger.info("Game created", extra={'game_id': game_id, 'player_name': player_name})
+        
+        socketio.emit('game_created', {
+            'game_id': game_id,
+            'player_id': sid,
+            'is_host': True,
+            'resume_token': resume_token
+        }, to=sid)
+        socketio.emit('lobby_update', lobby_state(games[game_id]), to=game_id)
+        for guest_sid, guest_name in guests:
+            seat_player(game_id, guest_sid, guest_name)
+        refresh_open_game(game_id)
+        fill_from_queue(game_id)
+    return game_id
+
+def seat_player(game_id, sid, player_name):
+    """Seat a connection in a lobby (game lock held); returns an error message, or None once seated"""
+    game_data = games.get(game_id)
+    if game_data is None:
+        return 'Game not found'
+    if game_data['game'].game_status != GameStatus.WAITING:
+        return 'Game has already started'
+    if len(game_data['players']) >= lobbies.MAX_PLAYERS:
+        return 'Game is full (max 8 players)'
+    
+    join_game_rooms(game_id, sid)
+    game_data['players'].append({'id': sid, 'name': player_name})
+    match_queue.cancel(sid)
+    resume_token = new_session(game_id, player_name, sid)
+    logger.info("Player joined", extra={'game_id': game_id, 'player_name': player_name})
+    
+    socketio.emit('game_joined', {
+        'game_id': game_id,
+        'player_id': sid,
+        'is_host': False,
+        'resume_token': resume_token
+    }, to=sid)
+    socketio.emit('lobby_update', lobby_state(game_data), to=game_id)
+    refresh_open_game(game_id)
+    return None
+
+def refresh_open_game(game_id):
+    """Bring a game's entry in the open-game index up to date with its lobby (O(1))"""
+    game_data = games.get(game_id)
+    if game_data is None or not game_data.get('listed') or game_data['game'].game_status != GameStatus.WAITING:
+        open_games.remove(game_id)
+    else:
+        open_games.update(game_id, lobbies.MAX_PLAYERS - len(game_data['players']))
+
+def fill_from_queue(game_id):
+    """Seat quick-match players waiting in the queue in a listed lobby with free seats (game lock held)"""
+    game_data = games.get(game_id)
+    if game_data is None or game_id not in open_games:
+        return
+    for sid, player_name in match_queue.pop(lobbies.MAX_PLAYERS - len(game_data['players'])):
+        seat_player(game_id, sid, player_name)
+
+def free_seat(game_id, game_data, player_id):
+    """Give up a lobby seat and let a waiting quick-match player have it (game lock held).
+
+    A departing host hands the lobby to the longest-seated human; a lobby with
+    no human left is dropped.
+    """
+    game_data['players'] = [p for p in game_data['players'] if p['id'] != player_id]
+    humans = [p for p in game_data['players'] if not p.get('bot')]
+    if not humans:
+        evict_game(game_id, 'empty')
+        return
+    if game_data['host'] == player_id:
+        game_data['host'] = humans[0]['id']
+        logger.info("Host changed", extra={'game_id': game_id, 'player_name': humans[0]['name']})
+    socketio.emit('lobby_update', lobby_state(game_data), to=game_id)
+    refresh_open_game(game_id)
+    fill_from_queue(game_id)
+
+def finish_investigation(game_id, player_id, questioned_player_id, card_index, double_card_id,
+                         result, since_version):
+    """Record an investigation played by a player or a bot and push it to the game"""
+    game = games[game_id]['game']
+    store.record_investigate(game, player_id, questioned_player_id, card_index, double_card_id)
+    if result.get('game_ended'):
+        store.archive(game_id)
+    logger.info("Investigation", extra={'game_id': game_id, 'coins_taken': result['result'].coins_taken})
+    
+    # The result, the new state and (if it is over) the end of the game, in one broadcast
+    push_move(game_id, move_updates.move_update(
+        game, since_version, move_updates.investigation_events(game, result)))
+
+def finish_guess(game_id, player_id, guessed_suspects, result, since_version):
+    """Record a final guess made by a player or a bot and push it to the game"""
+    game = games[game_id]['game']
+    store.record_guess(game, player_id, guessed_suspects)
+    if game.game_status == GameStatus.ENDED:
+        store.archive(game_id)
+    
+    player_name = game.player_names[player_id]
+    if result['correct']:
+        logger.info("Player won", extra={'game_id': game_id, 'player_name': player_name})
+    else:
+        logger.info("Player eliminated", extra={'game_id': game_id, 'player_name': player_name})
+    
+    push_move(game_id, move_updates.move_update(
+        game, since_version, move_updates.guess_events(game, player_id, guessed_suspects, result)))
+
+def forfeit_seat(game_id, player_id):
+    """Eliminate a player who left a running game or never came back to it (game lock held)"""
+    game = games[game_id]['game']
+    since_version = move_updates.base_version(game)
+    result = game.forfeit(player_id)
+    if 'error' in result:
+        return
+    store.record_forfeit(game, player_id)
+    if result['game_ended']:
+        store.archive(game_id)
+    logger.info("Player forfeited", extra={'game_id': game_id, 'player_name': game.player_names[player_id]})
+    
+    push_move(game_id, move_updates.move_update(
+        game, since_version, move_updates.forfeit_events(game, player_id)))
+
+# ----- Bots -----
+
+def humans_seated(game_data):
+    """Whether any human still holds a seat (possibly disconnected, within RESUME_GRACE)"""
+    return any(p['id'] in player_sessions for p in game_data['players'] if not p.get('bot'))
+
+def schedule_bot_turn(game_id):
+    """Queue the next turn if it is a bot's; bots stop once no human is left to play with"""
+    game_data = games[game_id]
+    game = game_data['game']
+    investigator = game.get_current_investigator()
+    if game.game_status != GameStatus.ACTIVE or investigator is None:
+        return
+    bot = next((p for p in game_data['players'] if p['id'] == investigator.player_id and p.get('bot')), None)
+    if bot and humans_seated(game_data):
+        bot_turns.schedule(game_id, bot['id'], game.state_version)
+
+def play_bot_turn(game_id, bot_id, version):
+    """Run on a bot worker: decide and play a bot's move if the game is still where it was scheduled"""
+    with game_lock(game_id):
+        game_data = games.get(game_id)
+        if game_data is None:
+            return
+        game = game_data['game']
+        investigator = game.get_current_investigator()
+        if game.state_version != version or investigator is None or investigator.player_id != bot_id:
+            return
+        bot = next(p for p in game_data['players'] if p['id'] == bot_id)
+        
+        since_version = move_updates.base_version(game)
+        action = bots.load_policy(bot['bot']).choose_action(game, bot_id, bot_rng)
+        result = bots.apply_action(game, bot_id, action)
+        if 'error' in result:
+            logger.error("Bot move rejected", extra={'game_id': game_id, 'error': result['error']})
+            return
+        
+        # Pushes emit to rooms only, so a bare request context is enough
+        with app.test_request_context('/'):
+            request.namespace = '/'
+            if action.kind == 'guess':
+                finish_guess(game_id, bot_id, action.suspects, result, since_version)
+            else:
+                finish_investigation(game_id, bot_id, action.questioned_player_id, action.card_index,
+                                     action.double_card_id, result, since_version)
+        game_data['last_active'] = time.monotonic()
+
+bot_turns = BotTurns(play_bot_turn, BOT_WORKERS, BOT_THINK_TIME)
+
+# Restored games go on where they stopped, with their humans' seats held as after a disconnect
+for restored_id, restored in list(games.items()):
+    restore_seats(restored_id, restored)
+    schedule_bot_turn(restored_id)
+
+def spectator_room(game_id):
+    return f"{game_id}:spectators"
+
+def send_backlog(sid):
+    """Packets queued for a connection of this worker but not written yet (0 if it is not local)"""
+    try:
+        eio_sid = socketio.server.manager.eio_sid_from_sid(sid, '/')
+        return socketio.server.eio.sockets[eio_sid].queue.qsize()
+    except (KeyError, AttributeError):
+        return 0
+
+def push_spectators(game_id, events=None):
+    """Broadcast the game's new version to its spectators, leaving out those that are behind"""
+    feed = spectator_feeds.get(game_id)
+    if not feed or not feed.spectators:
+        return
+    payload = feed.snapshot(games[game_id]['game'], events)
+    slow = feed.slow(send_backlog, SPECTATOR_MAX_BACKLOG)
+    if slow:
+        SPECTATOR_SKIPS.inc(len(slow))
+    emit('spectator_state', payload, room=spectator_room(game_id), skip_sid=slow or None)
+
+def stop_spectating(sid):
+    """Remove a connection from the feed it watches; returns the game it was watching, if any.
+
+    Takes no game lock (the caller may hold another game's); feeds stay until their game is evicted.
+    """
+    game_id = spectator_games.pop(sid, None)
+    feed = spectator_feeds.get(game_id)
+    if feed:
+        feed.remove(sid)
+    return game_id
+
+def spectator_loop():
+    """Background task: send the latest version to spectators that skipped it and have caught up"""
+    while True:
+        socketio.sleep(SPECTATOR_CATCH_UP_INTERVAL)
+        try:
+            for game_id, feed in list(spectator_feeds.items()):
+                if not feed.behind:
+                    continue
+                with game_lock(game_id):
+                    for sid in feed.caught_up(send_backlog, SPECTATOR_MAX_BACKLOG):
+                        socketio.emit('spectator_state', feed.payload, to=sid)
+        except Exception as e:
+            logger.error("Error catching up spectators", extra={'error': str(e)})
 
 @app.route('/')
 def index():
     return "Black Vienna Game Server Running"
 
+def games_by_status():
+    counts = {(status.value,): 0 for status in GameStatus}
+    for game_data in list(games.values()):
+        counts[(game_data['game'].game_status.value,)] += 1
+    return counts
+
+registry.register(metrics.Gauge(
+    'black_vienna_games', 'Resident games by status', ['status'], function=games_by_status))
+registry.register(metrics.Gauge(
+    'black_vienna_player_sessions', 'Players seated in a resident game',
+    function=lambda: {(): len(player_sessions)}))
+registry.register(metrics.Gauge(
+    'black_vienna_spectators', 'Connections spectating a resident game',
+    function=lambda: {(): len(spectator_games)}))
+registry.register(metrics.Gauge(
+    'black_vienna_deduction_cache_lookups', 'Deduction result cache lookups since startup', ['kind', 'result'],
+    function=lambda: {
+        **{(kind, 'hit'): count for kind, count in deduction_cache.shared.hits.items()},
+        **{(kind, 'miss'): count for kind, count in deduction_cache.shared.misses.items()}
+    }))
+registry.register(metrics.Gauge(
+    'black_vienna_deduction_cache_entries', 'Results held by the deduction result cache',
+    function=lambda: {(): len(deduction_cache.shared)}))
+registry.register(metrics.Gauge(
+    'black_vienna_open_lobbies', 'Listed lobbies with free seats, by free seats', ['free_seats'],
+    function=lambda: {(str(free),): count for free, count in open_games.counts().items()}))
+registry.register(metrics.Gauge(
+    'black_vienna_quick_match_waiting', 'Connections queued for a quick match',
+    function=lambda: {(): len(match_queue)}))
+registry.register(metrics.Gauge(
+    'black_vienna_bot_turns_pending', 'Bot turns waiting out their think time',
+    function=lambda: {(): bot_turns.pending()}))
+registry.register(metrics.Gauge(
+    'black_vienna_games_evicted', 'Games evicted since startup, by reason', ['reason'],
+    function=lambda: {(reason,): count for reason, count in evicted_counts.items()}))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/logging', methods=['GET', 'POST'])
+def logging_settings():
+    """Inspect or change log levels and sampling rates at runtime.
+
+    POST {"levels": {"engineio": "WARNING"}, "sampling": {"engineio": 0.05}}
+    with the X-Admin-Token header set to BLACK_VIENNA_ADMIN_TOKEN.
+    """
+    token = request.headers.get('X-Admin-Token', '')
+    if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+        return {"error": "Forbidden"}, 403
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        try:
+            return log_pipeline.configure(body.get('levels'), body.get('sampling'))
+        except (TypeError, ValueError) as e:
+            return {"error": str(e)}, 400
+    return log_pipeline.settings()
+
 @app.route('/health')
 def health():
-    return {"status": "healthy", "games_active": len(games)}
+    return {
+        "status": "healthy",
+        "games_active": len(games),
+        "games_resident": len(games),
+        "games_evicted": sum(evicted_counts.values()),
+        "games_evicted_by_reason": evicted_counts,
+        "sessions": len(player_sessions),
+        "spectators": len(spectator_games),
+        "shard": SHARD_ID,
+        "shards": SHARD_COUNT
+    }
 
-@socketio.on('connect')
-def handle_connect():
-    logger.info(f"Client connected: {request.sid}")
-    emit('connected', {'session_id': request.sid})
+@on_event('connect')
+def handle_connect(auth=None):
+    CONNECTED_CLIENTS.inc()
+    # Clients may ask for compact binary state payloads: io(url, {auth: {encoding: 'msgpack'}})
+    requested = (auth or {}).get('encoding') if isinstance(auth, dict) else None
+    encoding = state_codec.negotiate(requested or request.args.get('encoding'))
+    if encoding != state_codec.JSON:
+        connection_encodings[request.sid] = encoding
+    logger.info("Client connected", extra={'sid': request.sid, 'encoding': encoding})
+    emit('connected', {'session_id': request.sid, 'encoding': encoding})
 
-@socketio.on('disconnect')
-def handle_disconnect():
-    logger.info(f"Client disconnected: {request.sid}")
+@on_event('disconnect')
+def handle_disconnect(reason=None):
+    CONNECTED_CLIENTS.dec()
+    connection_encodings.pop(request.sid, None)
+    match_queue.cancel(request.sid)
+    logger.info("Client disconnected", extra={'sid': request.sid, 'reason': reason})
     
-    # Handle player leaving
-    if request.sid in player_sessions:
-        session_data = player_sessions[request.sid]
+    # The session lives on the shard that owns the game
+    if request.sid in connection_games:
+        game_id = connection_games.pop(request.sid)
+        router.forward(game_id, 'handle_player_disconnect', request.sid, {'game_id': game_id})
+        return
+    handle_player_disconnect()
+
+@routed
+@serialized
+def handle_player_disconnect(data=None):
+    connection_encodings.pop(request.sid, None)  # Set here if the connection is on another shard
+    stop_spectating(request.sid)
+    # Handle player leaving; the seat is held for RESUME_GRACE seconds
+    player_id = connection_players.pop(request.sid, request.sid)
+    session_data = player_sessions.get(player_id)
+    if session_data and session_data['sid'] == request.sid:
         game_id = session_data['game_id']
         
         # Notify other players in the game
@@ -47,66 +806,34 @@ def handle_disconnect():
                 'message': 'A player has disconnected'
             }, room=game_id)
         
-        # Clean up session
-        del player_sessions[request.sid]
+        session_data['disconnected_at'] = time.monotonic()
 
-@socketio.on('create_game')
+@on_event('create_game')
 def handle_create_game(data):
     try:
         player_name = data.get('player_name', '').strip()
+        deck = data.get('deck') or decks.DEFAULT
         
         if not player_name:
             emit('error', {'message': 'Player name is required'})
             return
         
-        # Generate unique game ID (6 characters for easier sharing)
-        game_id = str(uuid.uuid4())[:8].upper()
-        
-        # Create new game
-        game = Game(game_id)
-        
-        # Store game
-        games[game_id] = {
-            'game': game,
-            'players': [{
-                'id': request.sid,
-                'name': player_name
-            }],
-            'host': request.sid
-        }
-        
-        # Join room
-        join_room(game_id)
-        
-        # Track player session
-        player_sessions[request.sid] = {
-            'game_id': game_id,
-            'player_id': request.sid,
-            'player_name': player_name
-        }
-        
-        logger.info(f"Game created: {game_id} by {player_name}")
-        
-        emit('game_created', {
-            'game_id': game_id,
-            'player_id': request.sid,
-            'is_host': True
-        })
+        if deck not in decks.VARIANTS:
+            emit('error', {'message': f'Unknown deck: {deck}'})
+            return
         
-        # Send initial lobby state
-        emit('lobby_update', {
-            'players': games[game_id]['players'],
-            'min_players': 3,
-            'max_players': 8,
-            'can_start': len(games[game_id]['players']) >= 3,
-            'host_id': games[game_id]['host']
-        }, room=game_id)
+        # Private lobbies can only be joined by their ID, never through quick_match
+        if open_lobby(request.sid, player_name, deck, listed=not data.get('private')) is None:
+            emit('error', {'message': 'Server is full, please try again later'})
+            return
         
     except Exception as e:
-        logger.error(f"Error creating game: {e}")
+        logger.error("Error creating game", extra={'error': str(e)})
         emit('error', {'message': 'Failed to create game'})
 
-@socketio.on('join_game')
+@on_event('join_game')
+@routed
+@serialized
 def handle_join_game(data):
     try:
         game_id = data.get('game_id', '').strip().upper()
@@ -116,58 +843,197 @@ def handle_join_game(data):
             emit('error', {'message': 'Game ID and player name are required'})
             return
         
+        error = seat_player(game_id, request.sid, player_name)
+        if error:
+            emit('error', {'message': error})
+        
+    except Exception as e:
+        logger.error("Error joining game", extra={'error': str(e)})
+        emit('error', {'message': 'Failed to join game'})
+
+@on_event('quick_match')
+def handle_quick_match(data):
+    """Join the fullest listed lobby, or wait in the queue until one opens.
+
+    With nobody to play with, the queue fills up until MIN_PLAYERS players are
+    waiting; they are then seated together in a new lobby hosted by the
+    player who waited longest. Only the lobbies of this shard are considered.
+    """
+    try:
+        player_name = str(data.get('player_name') or '').strip()
+        
+        if not player_name:
+            emit('error', {'message': 'Player name is required'})
+            return
+        if current_player_id() in player_sessions:
+            emit('error', {'message': 'Leave your current game first'})
+            return
+        
+        for _ in range(QUICK_MATCH_ATTEMPTS):
+            game_id = open_games.fullest()
+            if game_id is None:
+                break
+            with game_lock(game_id):
+                if seat_player(game_id, request.sid, player_name) is None:
+                    games[game_id]['last_active'] = time.monotonic()
+                    return
+                refresh_open_game(game_id)  # Filled or started since it was indexed
+        
+        waiting = match_queue.push(request.sid, player_name)
+        emit('quick_match_queued', {'waiting': waiting})
+        if waiting >= lobbies.MIN_PLAYERS:
+            players = match_queue.pop(lobbies.MAX_PLAYERS)
+            if players and open_lobby(*players[0], guests=players[1:]) is None:
+                for sid, _ in players:
+                    socketio.emit('error', {'message': 'Server is full, please try again later'}, to=sid)
+        
+    except Exception as e:
+        logger.error("Error matching player", extra={'error': str(e)})
+        emit('error', {'message': 'Failed to find a game'})
+
+@on_event('add_bot')
+@routed
+@serialized
+def handle_add_bot(data):
+    """Host only: seat a server-side bot in the lobby, playing data['policy'] (a registered bot policy)"""
+    try:
+        game_id = str(data.get('game_id') or '').strip().upper()
+        policy = data.get('policy') or BOT_POLICY
+        
         if game_id not in games:
             emit('error', {'message': 'Game not found'})
             return
         
         game_data = games[game_id]
-        
-        # Check if game has started
+        if current_player_id() != game_data['host']:
+            emit('error', {'message': 'Only the host can add bots'})
+            return
         if game_data['game'].game_status != GameStatus.WAITING:
             emit('error', {'message': 'Game has already started'})
             return
-        
-        # Check player limit
-        if len(game_data['players']) >= 8:
+        if len(game_data['players']) >= lobbies.MAX_PLAYERS:
             emit('error', {'message': 'Game is full (max 8 players)'})
             return
+        if policy not in bots.POLICIES:
+            emit('error', {'message': f'Unknown bot policy: {policy}'})
+            return
         
-        # Add player
-        join_room(game_id)
+        names = {p['name'] for p in game_data['players']}
+        number = 1
+        while f"Bot {number}" in names:
+            number += 1
         game_data['players'].append({
-            'id': request.sid,
-            'name': player_name
+            'id': f"bot-{uuid.uuid4().hex[:12]}",
+            'name': f"Bot {number}",
+            'bot': policy
         })
         
-        # Track player session
-        player_sessions[request.sid] = {
-            'game_id': game_id,
-            'player_id': request.sid,
-            'player_name': player_name
-        }
+        logger.info("Bot added", extra={'game_id': game_id, 'policy': policy})
+        emit('lobby_update', lobby_state(game_data), room=game_id)
+        refresh_open_game(game_id)
+        
+    except Exception as e:
+        logger.error("Error adding bot", extra={'error': str(e)})
+        emit('error', {'message': 'Failed to add bot'})
+
+@on_event('remove_bot')
+@routed
+@serialized
+def handle_remove_bot(data):
+    """Host only: take a bot's seat back in the lobby"""
+    try:
+        game_id = str(data.get('game_id') or '').strip().upper()
         
-        logger.info(f"Player {player_name} joined game {game_id}")
+        if game_id not in games:
+            emit('error', {'message': 'Game not found'})
+            return
         
-        emit('game_joined', {
+        game_data = games[game_id]
+        if current_player_id() != game_data['host']:
+            emit('error', {'message': 'Only the host can remove bots'})
+            return
+        if game_data['game'].game_status != GameStatus.WAITING:
+            emit('error', {'message': 'Game has already started'})
+            return
+        
+        if any(p.get('bot') and p['id'] == data.get('player_id') for p in game_data['players']):
+            free_seat(game_id, game_data, data.get('player_id'))
+        
+    except Exception as e:
+        logger.error("Error removing bot", extra={'error': str(e)})
+        emit('error', {'message': 'Failed to remove bot'})
+
+@on_event('resume_session')
+@routed
+@serialized
+def handle_resume_session(data):
+    """Take a seat back after a reconnect, without re-joining.
+
+    data: {game_id, token, version}; token comes from game_created/game_joined and
+    version is the last state version the client holds (omitted after a reload).
+    The client is sent what it missed since that version: a delta when possible,
+    else a full view, with the outcome events of the moves in between.
+    """
+    try:
+        game_id = str(data.get('game_id') or '').strip().upper()
+        player_id = resume_tokens.get(str(data.get('token') or ''))
+        session = player_sessions.get(player_id)
+        if session is None or session['game_id'] != game_id or game_id not in games:
+            emit('resume_failed', {'message': 'Session expired, please join again'})
+            return
+        
+        # The seat moves to this connection; an older connection still holding it loses it
+        previous_sid = session['sid']
+        if previous_sid != request.sid:
+            connection_players.pop(previous_sid, None)
+            leave_room(game_id, sid=previous_sid)
+            if previous_sid != player_id:
+                leave_room(player_id, sid=previous_sid)
+        if request.sid != player_id:
+            connection_players[request.sid] = player_id
+            join_room(player_id)
+        session['sid'] = request.sid
+        session.pop('disconnected_at', None)
+        join_game_rooms(game_id)
+        
+        game_data = games[game_id]
+        game = game_data['game']
+        logger.info("Player resumed", extra={'game_id': game_id, 'player_name': session['player_name']})
+        emit('session_resumed', {
             'game_id': game_id,
-            'player_id': request.sid,
-            'is_host': False
+            'player_id': player_id,
+            'is_host': game_data['host'] == player_id,
+            'status': game.game_status.value
         })
+        emit('player_reconnected', {
+            'player_id': player_id,
+            'player_name': session['player_name']
+        }, room=game_id, include_self=False)
         
-        # Update all players in lobby
-        emit('lobby_update', {
-            'players': game_data['players'],
-            'min_players': 3,
-            'max_players': 8,
-            'can_start': len(game_data['players']) >= 3,
-            'host_id': game_data['host']
-        }, room=game_id)
+        if game.game_status == GameStatus.WAITING:
+            emit('lobby_update', lobby_state(game_data))
+            return
+        version = data.get('version') if isinstance(data.get('version'), int) else None
+        update = player_update(game, player_id, version)
+        recent_events = game_data.get('recent_events', ())
+        if version:
+            update['events'] = [event for event_version, events in recent_events
+                                if event_version > version for event in events]
+        else:
+            # After a reload only how the game ended matters, not every past move
+            update['events'] = [event for event in (recent_events[-1][1] if recent_events else ())
+                                if event['event'] in ('game_won', 'game_ended')]
+        # A client that never saw the game start still shows the lobby
+        send_player_state('game_state_update' if version else 'game_started', game, player_id, update)
+        schedule_bot_turn(game_id)
         
     except Exception as e:
-        logger.error(f"Error joining game: {e}")
-        emit('error', {'message': 'Failed to join game'})
+        logger.error("Error resuming session", extra={'error': str(e)})
+        emit('error', {'message': 'Failed to resume session'})
 
-@socketio.on('start_game')
+@on_event('start_game')
+@routed
+@serialized
 def handle_start_game(data):
     try:
         game_id = data.get('game_id')
@@ -179,35 +1045,52 @@ def handle_start_game(data):
         game_data = games[game_id]
         
         # Verify requester is host
-        if request.sid != game_data['host']:
+        if current_player_id() != game_data['host']:
             emit('error', {'message': 'Only the host can start the game'})
             return
         
         # Check player count
         num_players = len(game_data['players'])
-        if num_players < 3:
+        if num_players < lobbies.MIN_PLAYERS:
             emit('error', {'message': 'Need at least 3 players to start'})
             return
         
         # Setup and start the game
         game = game_data['game']
-        game.setup_game(game_data['players'])
+        if game.game_status != GameStatus.WAITING:
+            emit('error', {'message': 'Game has already started'})
+            return
+        rng_state = game.rng.getstate()
+        game.setup_game(game_data['players'], deck=game_data.get('deck'))
+        open_games.remove(game_id)
+        game_data['resume_tokens'] = {
+            p['id']: player_sessions[p['id']]['resume_token']
+            for p in game_data['players'] if p['id'] in player_sessions
+        }
+        store.record_setup(game, game_data['players'], game_data['host'], rng_state,
+                           game_data['resume_tokens'])
         
-        logger.info(f"Game {game_id} started with {num_players} players")
+        logger.info("Game started", extra={'game_id': game_id, 'players': num_players})
         
         # Send personalized game state to each player
         for player_data in game_data['players']:
-            player_state = game.get_player_view(player_data['id'])
-            emit('game_started', player_state, room=player_data['id'])
+            if player_data.get('bot'):
+                continue
+            player_state = player_view(game, player_data['id'])
+            send_player_state('game_started', game, player_data['id'], player_state)
         
         # Broadcast game update to all
-        emit('game_update', game.get_game_state(), room=game_id)
+        emit('game_update', public_state(game), room=game_id)
+        push_spectators(game_id)
+        schedule_bot_turn(game_id)
         
     except Exception as e:
-        logger.error(f"Error starting game: {e}")
+        logger.error("Error starting game", extra={'error': str(e)})
         emit('error', {'message': 'Failed to start game'})
 
-@socketio.on('investigate')
+@on_event('investigate')
+@routed
+@serialized
 def handle_investigate(data):
     try:
         game_id = data.get('game_id')
@@ -220,10 +1103,12 @@ def handle_investigate(data):
             return
         
         game = games[game_id]['game']
+        since_version = move_updates.base_version(game)
         
         # Perform investigation
+        player_id = current_player_id()
         result = game.investigate(
-            investigator_id=request.sid,
+            investigator_id=player_id,
             questioned_player_id=questioned_player_id,
             card_index=card_index,
             double_card_id=double_card_id
@@ -233,42 +1118,16 @@ def handle_investigate(data):
             emit('error', {'message': result['error']})
             return
         
-        logger.info(f"Investigation in game {game_id}: {result['result'].coins_taken} coins taken")
-        
-        # Send investigation result to all players
-        emit('investigation_result', {
-            'result': {
-                'investigator_id': result['result'].investigator_id,
-                'investigator_name': next(p['name'] for p in games[game_id]['players'] if p['id'] == result['result'].investigator_id),
-                'questioned_player_id': result['result'].questioned_player_id,
-                'questioned_player_name': next(p['name'] for p in games[game_id]['players'] if p['id'] == result['result'].questioned_player_id),
-                'card_letters': result['result'].card_letters,
-                'coins_taken': result['result'].coins_taken
-            },
-            'double_result': {
-                'card_letters': result['double_result'].card_letters,
-                'coins_taken': result['double_result'].coins_taken
-            } if result.get('double_result') else None
-        }, room=game_id)
-        
-        # Send updated game state to all players
-        for player_data in games[game_id]['players']:
-            player_state = game.get_player_view(player_data['id'])
-            emit('game_state_update', player_state, room=player_data['id'])
-        
-        # Check if game ended
-        if result.get('game_ended'):
-            emit('game_ended', {
-                'reason': 'conditions_met',
-                'solution': game.hidden_suspects,
-                'final_state': game.get_game_state()
-            }, room=game_id)
+        finish_investigation(game_id, player_id, questioned_player_id, card_index, double_card_id,
+                             result, since_version)
             
     except Exception as e:
-        logger.error(f"Error during investigation: {e}")
+        logger.error("Error during investigation", extra={'error': str(e)})
         emit('error', {'message': 'Investigation failed'})
 
-@socketio.on('make_guess')
+@on_event('make_guess')
+@routed
+@serialized
 def handle_make_guess(data):
     try:
         game_id = data.get('game_id')
@@ -279,54 +1138,104 @@ def handle_make_guess(data):
             return
         
         game = games[game_id]['game']
+        since_version = move_updates.base_version(game)
         
         # Make the guess
-        result = game.make_guess(request.sid, guessed_suspects)
+        player_id = current_player_id()
+        result = game.make_guess(player_id, guessed_suspects)
         
         if 'error' in result:
             emit('error', {'message': result['error']})
             return
         
-        player_name = next(p['name'] for p in games[game_id]['players'] if p['id'] == request.sid)
-        
-        if result['correct']:
-            # Player won!
-            logger.info(f"Player {player_name} won game {game_id}")
-            emit('game_won', {
-                'winner_id': request.sid,
-                'winner_name': player_name,
-                'solution': result['solution'],
-                'final_state': game.get_game_state()
-            }, room=game_id)
-        else:
-            # Player eliminated
-            logger.info(f"Player {player_name} eliminated in game {game_id}")
-            emit('player_eliminated', {
-                'player_id': request.sid,
-                'player_name': player_name,
-                'wrong_guess': guessed_suspects
-            }, room=game_id)
-            
-            # Update all players
-            for player_data in games[game_id]['players']:
-                player_state = game.get_player_view(player_data['id'])
-                emit('game_state_update', player_state, room=player_data['id'])
-            
-            # Check if game ended (all eliminated)
-            if game.game_status == GameStatus.ENDED:
-                emit('game_ended', {
-                    'reason': 'all_eliminated',
-                    'solution': game.hidden_suspects,
-                    'final_state': game.get_game_state()
-                }, room=game_id)
+        finish_guess(game_id, player_id, guessed_suspects, result, since_version)
                 
     except Exception as e:
-        logger.error(f"Error making guess: {e}")
+        logger.error("Error making guess", extra={'error': str(e)})
         emit('error', {'message': 'Guess failed'})
 
-@socketio.on('request_game_state')
+@on_event('suggest_investigation')
+@routed
+@serialized
+def handle_suggest_investigation(data):
+    """Opt-in hint for the investigator: the questions expected to rule out the most triples.
+
+    The position is copied under the game lock and scored on a worker
+    thread; the answer arrives later as investigation_suggestion, tagged
+    with the state version it was computed for.
+    """
+    try:
+        game_id = data.get('game_id')
+        
+        if game_id not in games:
+            emit('error', {'message': 'Game not found'})
+            return
+        if not advisor.available():
+            emit('error', {'message': 'Suggestions are not available on this server'})
+            return
+        
+        game = games[game_id]['game']
+        player_id = current_player_id()
+        investigator = game.get_current_investigator()
+        if game.game_status != GameStatus.ACTIVE or investigator is None or investigator.player_id != player_id:
+            emit('error', {'message': 'Suggestions are only available on your turn'})
+            return
+        
+        def deliver(reply):
+            socketio.emit('investigation_suggestion', reply, to=player_connection(player_id))
+        
+        if not investigation_advisor.submit(advisor.snapshot(game, player_id), deliver):
+            emit('error', {'message': 'A suggestion is already being computed'})
+        
+    except Exception as e:
+        logger.error("Error suggesting investigation", extra={'error': str(e)})
+        emit('error', {'message': 'Failed to suggest an investigation'})
+
+@on_event('spectate_game')
+@routed
+@serialized
+def handle_spectate_game(data):
+    """Watch a game: the public state of every version, without taking a seat"""
+    try:
+        game_id = str(data.get('game_id') or '').strip().upper()
+        
+        if game_id not in games:
+            emit('error', {'message': 'Game not found'})
+            return
+        
+        feed = spectator_feeds.get(game_id)
+        if feed is None:
+            feed = spectator_feeds[game_id] = SpectatorFeed(game_id)
+        if len(feed.spectators) >= MAX_SPECTATORS:
+            emit('error', {'message': 'Too many spectators, please try again later'})
+            return
+        
+        previous_game_id = spectator_games.get(request.sid)
+        if previous_game_id not in (None, game_id):
+            stop_spectating(request.sid)
+            leave_room(spectator_room(previous_game_id))
+        spectator_games[request.sid] = game_id
+        feed.add(request.sid)
+        join_room(spectator_room(game_id))
+        
+        logger.info("Spectator joined", extra={'game_id': game_id, 'spectators': len(feed.spectators)})
+        emit('spectating', {'game_id': game_id, 'spectators': len(feed.spectators)})
+        emit('spectator_state', feed.snapshot(games[game_id]['game']))
+        
+    except Exception as e:
+        logger.error("Error spectating game", extra={'error': str(e)})
+        emit('error', {'message': 'Failed to spectate game'})
+
+@on_event('request_game_state')
+@routed
+@serialized
 def handle_request_game_state(data):
-    """Allow players to request current game state"""
+    """Allow players to request current game state.
+
+    With include_probabilities the player's suspect probabilities follow
+    as suspect_probabilities, estimated on the advisor's workers so the
+    game lock is not held while the chains are sampled.
+    """
     try:
         game_id = data.get('game_id')
         
@@ -335,48 +1244,107 @@ def handle_request_game_state(data):
             return
         
         game = games[game_id]['game']
-        player_state = game.get_player_view(request.sid)
-        emit('game_state_update', player_state)
+        player_id = current_player_id()
+        player_state = player_view(game, player_id)
+        send_player_state('game_state_update', game, player_id, player_state)
+        
+        if (data.get('include_probabilities') and advisor.available()
+                and game.game_status != GameStatus.WAITING and game.get_player(player_id)):
+            def deliver(reply):
+                socketio.emit('suspect_probabilities', reply, to=player_connection(player_id))
+            
+            # One estimate per player at a time: requests made meanwhile are dropped, and
+            # the answer names the version it was computed for
+            investigation_advisor.submit_probabilities(advisor.snapshot(game, player_id), deliver)
         
     except Exception as e:
-        logger.error(f"Error getting game state: {e}")
+        logger.error("Error getting game state", extra={'error': str(e)})
         emit('error', {'message': 'Failed to get game state'})
 
-@socketio.on('leave_game')
+@on_event('request_replay_state')
+@routed
+def handle_request_replay_state(data):
+    """Post-game review: the public state of a finished game at a given round"""
+    try:
+        game_id = data.get('game_id')
+        round_number = data.get('round', 0)
+        
+        if game_id in games and games[game_id]['game'].game_status != GameStatus.ENDED:
+            emit('error', {'message': 'Replays are only available for finished games'})
+            return
+        
+        with replays_guard:
+            replay = replays.get(game_id)
+            if replay is not None:
+                replays.move_to_end(game_id)
+        if replay is None:
+            # Checkpoints are built before the replay is shared, so seeks only read it
+            replay = GameReplay.from_store(store, game_id)
+            replay.final_round
+            with replays_guard:
+                replay = replays.setdefault(game_id, replay)
+                if len(replays) > MAX_CACHED_REPLAYS:
+                    replays.popitem(last=False)
+        
+        state = public_state(replay.state_at_round(int(round_number)))
+        state['final_round'] = replay.final_round
+        emit('replay_state', state)
+        
+    except FileNotFoundError:
+        emit('error', {'message': 'Game not found'})
+    except Exception as e:
+        logger.error("Error replaying game", extra={'error': str(e)})
+        emit('error', {'message': 'Failed to load replay'})
+
+@on_event('leave_game')
+@routed
+@serialized
 def handle_leave_game(data):
     """Handle player leaving a game"""
     try:
-        if request.sid in player_sessions:
-            session_data = player_sessions[request.sid]
+        match_queue.cancel(request.sid)
+        spectated_game_id = stop_spectating(request.sid)
+        if spectated_game_id:
+            leave_room(spectator_room(spectated_game_id))
+        
+        player_id = current_player_id()
+        if player_id in player_sessions:
+            session_data = player_sessions[player_id]
             game_id = session_data['game_id']
             
             leave_room(game_id)
+            encoding = connection_encodings.get(request.sid, state_codec.JSON)
+            if encoding != state_codec.JSON:
+                leave_room(state_room(game_id, encoding))
+            if player_id != request.sid:
+                leave_room(player_id)
             
-            # Remove from game if still in lobby
+            # Remove from game if still in lobby, give the seat up if it is running
             if game_id in games:
                 game_data = games[game_id]
                 if game_data['game'].game_status == GameStatus.WAITING:
-                    game_data['players'] = [
-                        p for p in game_data['players'] 
-                        if p['id'] != request.sid
-                    ]
-                    
-                    # Update lobby
-                    emit('lobby_update', {
-                        'players': game_data['players'],
-                        'min_players': 3,
-                        'max_players': 8,
-                        'can_start': len(game_data['players']) >= 3,
-                        'host_id': game_data['host']
-                    }, room=game_id)
+                    free_seat(game_id, game_data, player_id)
+                elif game_data['game'].game_status == GameStatus.ACTIVE:
+                    forfeit_seat(game_id, player_id)
             
-            del player_sessions[request.sid]
+            end_session(player_id)
             
         emit('left_game', {'success': True})
         
     except Exception as e:
-        logger.error(f"Error leaving game: {e}")
+        logger.error("Error leaving game", extra={'error': str(e)})
         emit('error', {'message': 'Failed to leave game'})
 
 if __name__ == '__main__':
-    socketio.run(app, debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+    # Sharded workers must not run the reloader: its watcher process would also consume events
+    debug = router is None
+    # With the reloader, only the reloaded child process serves requests
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        socketio.start_background_task(snapshot_loop)
+        socketio.start_background_task(sweep_loop)
+        socketio.start_background_task(spectator_loop)
+        if router:
+            socketio.start_background_task(router.serve, dispatch_forwarded)
+    socketio.run(app, debug=debug, host='0.0.0.0',
+                 port=int(os.environ.get('BLACK_VIENNA_PORT', '5001')),
+                 allow_unsafe_werkzeug=True)
\ No newline at end of file
@@ -0,0 +1,183 @@
+"""asyncio (ASGI) entry point: app.py's server on python-socketio's AsyncServer.
+
+    uvicorn async_app:asgi_app --port 5001      (or: python async_app.py)
+
+The event loop accepts the connections and moves packets; it never runs game
+code. Every Socket.IO event is handed to app.py's own handler, through the
+same Flask-SocketIO dispatch the threaded server uses, on a worker thread. So
+the per-game locks, persistence, eviction, metrics, msgpack payloads and any
+later change to a handler apply to both servers: nothing here is a copy.
+
+Handlers emit and join rooms through Flask-SocketIO, which calls
+app.socketio.server. LoopBridge stands in for that server and runs each call
+on the event loop, where the AsyncServer owns the connections, waiting for it
+so a handler's emits keep their order. Flask's HTTP routes (/health,
+/metrics, /admin/...) are served from a worker thread as well.
+
+Sharding stays with app.py (see run_shards.py).
+"""
+import asyncio
+import concurrent.futures
+import functools
+import io
+import os
+import sys
+import threading
+import time
+
+import socketio
+
+import app as threaded
+
+# Events and HTTP requests are served on this many worker threads; a handler waiting
+# for a busy game's lock holds one, as it would hold its own thread in app.py
+HANDLER_THREADS = int(os.environ.get('BLACK_VIENNA_ASYNC_WORKERS', '64'))
+
+if threaded.router is not None:
+    raise RuntimeError("The asyncio server runs a single shard; use app.py for BLACK_VIENNA_SHARDS > 1")
+
+
+class LoopBridge:
+    """What app.py's handlers expect of socketio.server, carried out on the event loop.
+
+    Called from worker threads only: each call waits for the loop, which
+    would deadlock if the loop itself made it.
+    """
+
+    def __init__(self, server: socketio.AsyncServer, loop: asyncio.AbstractEventLoop):
+        self.server = server
+        self.loop = loop
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def emit(self, event, data=None, to=None, room=None, skip_sid=None, namespace=None,
+             callback=None, ignore_queue=False):
+        self._run(self.server.emit(event, data, to=to, room=room, skip_sid=skip_sid,
+                                   namespace=namespace, callback=callback, ignore_queue=ignore_queue))
+
+    def enter_room(self, sid, room, namespace=None):
+        self._run(self.server.enter_room(sid, room, namespace=namespace))
+
+    def leave_room(self, sid, room, namespace=None):
+        self._run(self.server.leave_room(sid, room, namespace=namespace))
+
+    def close_room(self, room, namespace=None):
+        self._run(self.server.close_room(room, namespace=namespace))
+
+    def disconnect(self, sid, namespace=None, ignore_queue=False):
+        self._run(self.server.disconnect(sid, namespace=namespace, ignore_queue=ignore_queue))
+
+    def get_environ(self, sid, namespace=None):
+        """The connection's environ, with what Flask needs to build a request context from it"""
+        environ = self.server.get_environ(sid, namespace=namespace)
+        if environ is not None:
+            environ.setdefault('flask.app', threaded.app)
+            environ.setdefault('wsgi.url_scheme', 'http')
+        return environ
+
+    # app.py's background tasks are threads here too
+    @staticmethod
+    def sleep(seconds=0):
+        time.sleep(seconds)
+
+    @staticmethod
+    def start_background_task(target, *args, **kwargs):
+        thread = threading.Thread(target=target, args=args, kwargs=kwargs, daemon=True)
+        thread.start()
+        return thread
+
+    def __getattr__(self, name):
+        return getattr(self.server, name)  # manager, eio: read-only lookups (see app.send_backlog)
+
+
+sio = socketio.AsyncServer(async_mode='asgi', **threaded.socketio_options)
+threaded_handlers = threaded.socketio.server.handlers  # As Flask-SocketIO registered them
+
+
+def on_worker(handler):
+    """Run a Flask-SocketIO handler (sid, *args) on a worker thread"""
+    @functools.wraps(handler)
+    async def run(sid, *args):
+        return await asyncio.to_thread(handler, sid, *args)
+    return run
+
+
+for namespace, handlers in threaded_handlers.items():
+    for event, handler in handlers.items():
+        sio.on(event, on_worker(handler), namespace=namespace)
+
+
+def wsgi_environ(scope, body: bytes) -> dict:
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = f"HTTP_{key}"
+        environ[key] = value.decode('latin-1')
+    return environ
+
+
+def call_flask(environ):
+    """app.py's Flask app for one request: (status code, headers, body)"""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'], response['headers'] = int(status.split()[0]), headers
+
+    chunks = threaded.app(environ, start_response)
+    try:
+        body = b''.join(chunks)
+    finally:
+        getattr(chunks, 'close', lambda: None)()
+    return response['status'], response['headers'], body
+
+
+async def http_routes(scope, receive, send):
+    """ASGI app for the requests that are not Socket.IO's: Flask's routes, on a worker thread"""
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    status, headers, payload = await asyncio.to_thread(call_flask, wsgi_environ(scope, body))
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]})
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+def start():
+    """Lifespan startup: route app.py's emits to this loop and start its background tasks"""
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(
+        HANDLER_THREADS, thread_name_prefix='handler'))
+    threaded.socketio.server = LoopBridge(sio, loop)
+    threaded.socketio.start_background_task(threaded.snapshot_loop)
+    threaded.socketio.start_background_task(threaded.sweep_loop)
+    threaded.socketio.start_background_task(threaded.spectator_loop)
+
+
+asgi_app = socketio.ASGIApp(sio, other_asgi_app=http_routes, on_startup=start)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(asgi_app, host='0.0.0.0', port=int(os.environ.get('BLACK_VIENNA_PORT', '5001')),
+                log_level='warning')
@@ -0,0 +1,327 @@
+"""Load generator: many simulated clients playing whole games against a local server.
+
+Every game connects its players, creates and fills a lobby, starts, and
+plays random legal moves (investigations, the odd guess) until the game
+ends, then disconnects. Clients apply state deltas like the web client. A
+fraction of games also has a client join the lobby and leave again before
+the start.
+
+Reports events/s, move latency percentiles (emit to the mover's next
+state update), bytes pushed to clients per move and server memory per
+live game. Results can be saved as a JSON baseline and compared against
+one to catch regressions.
+
+Run from the backend directory:
+    python benchmarks/bench_load.py --games 200 --concurrency 50
+    python benchmarks/bench_load.py --save benchmarks/baselines/load_threading.json
+    python benchmarks/bench_load.py --compare benchmarks/baselines/load_threading.json
+    python benchmarks/bench_load.py --mode asyncio --save benchmarks/baselines/load_asyncio.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import socketio
+
+from bench_server_capacity import SERVER_COMMANDS, percentile, start_server, stop_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from suspects import SUSPECTS  # noqa: E402
+
+APPENDED_KEYS = ('investigation_history', 'zero_coin_cards')
+GAME_TIMEOUT = 120
+
+# Metric -> True if higher is better; used when comparing against a baseline
+METRICS = {
+    'events_per_sec': True,
+    'moves_per_sec': True,
+    'latency_p50_ms': False,
+    'latency_p95_ms': False,
+    'latency_p99_ms': False,
+    'bytes_per_move': False,
+    'memory_per_game_kb': False,
+}
+
+
+class LoadStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.moves = 0
+        self.events_emitted = 0
+        self.bytes_received = 0
+        self.errors = 0
+        self.games_finished = 0
+        self.games_timed_out = 0
+        self.live_games = 0
+        self.peak_live_games = 0
+
+    def add(self, **counts) -> None:
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+            self.peak_live_games = max(self.peak_live_games, self.live_games)
+
+
+def apply_delta(state, update):
+    """Python counterpart of game/src/utils/stateDelta.js"""
+    if state is None or state.get('version', -1) < update['base_version']:
+        return None
+    new_state = dict(state)
+    new_state.update(update.get('private', {}))
+    new_state['version'] = update['version']
+    for key, value in update['changes'].items():
+        if key in APPENDED_KEYS:
+            new_state[key] = state.get(key, [])[:value['from']] + value['entries']
+        else:
+            new_state[key] = value
+    if not new_state['is_my_turn']:
+        new_state.pop('can_question', None)
+    return new_state
+
+
+class LoadClient:
+    """One simulated player; plays its own turns from the event handler thread"""
+
+    def __init__(self, url: str, name: str, stats: LoadStats, rng: random.Random, guess_rate: float):
+        self.name = name
+        self.stats = stats
+        self.rng = rng
+        self.guess_rate = guess_rate
+        self.game_id = None
+        self.state = None
+        self.pending_since = None
+        self.replies = {event: threading.Event() for event in ('game_created', 'game_joined', 'left_game')}
+        self.finished = threading.Event()
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on('*', self._on_event)
+        self.sio.connect(url, transports=['websocket'], wait_timeout=10)
+
+    def emit(self, event: str, data: dict) -> None:
+        if not self.sio.connected:  # Updates still arriving while the game is torn down
+            return
+        self.stats.add(events_emitted=1)
+        self.sio.emit(event, data)
+
+    def _on_event(self, event, data=None):
+        self.stats.add(bytes_received=len(json.dumps(data, separators=(',', ':'))))
+        if event in self.replies:
+            if event in ('game_created', 'game_joined'):
+                self.game_id = data['game_id']
+            self.replies[event].set()
+        elif event in ('game_started', 'game_state_update'):
+            self._on_state(data)
+        elif event == 'error':
+            self.stats.add(errors=1)
+            if self.pending_since is not None:
+                self._move_done()
+                self._play()
+
+    def _on_state(self, update):
+        if update.get('delta'):
+            state = apply_delta(self.state, update)
+            if state is None:
+                self.emit('request_game_state', {'game_id': self.game_id})
+                return
+            self.state = state
+        else:
+            self.state = update
+        self._move_done()
+        if self.state['status'] != 'active':
+            self.finished.set()
+        else:
+            self._play()
+
+    def _move_done(self):
+        if self.pending_since is not None:
+            latency = time.perf_counter() - self.pending_since
+            self.pending_since = None
+            with self.stats.lock:
+                self.stats.latencies.append(latency)
+
+    def _play(self):
+        state = self.state
+        if not state['is_my_turn'] or state['my_status'] != 'active' or self.pending_since is not None:
+            return
+        self.pending_since = time.perf_counter()
+        self.stats.add(moves=1)
+        late = state['round_count'] > 2 * len(state['players'])
+        # The last active player has nobody left to question and must guess
+        if not state['can_question'] or (late and self.rng.random() < self.guess_rate):
+            candidates = [letter for letter in SUSPECTS if letter not in state['my_cards']]
+            self.emit('make_guess', {'game_id': self.game_id, 'suspects': self.rng.sample(candidates, 3)})
+            return
+        move = {
+            'game_id': self.game_id,
+            'questioned_player_id': self.rng.choice(state['can_question'])['id'],
+            'card_index': self.rng.choice([i for i, slot in enumerate(state['face_up_cards']) if slot['card']]),
+        }
+        if state['double_investigation_enabled'] and state['zero_coin_cards'] and self.rng.random() < 0.5:
+            move['double_card_id'] = self.rng.choice(state['zero_coin_cards'])['id']
+        self.emit('investigate', move)
+
+    def wait(self, event: str, timeout: float = 30) -> None:
+        if not self.replies[event].wait(timeout):
+            raise TimeoutError(f"{self.name}: no {event}")
+
+
+def play_game(url: str, index: int, stats: LoadStats, args) -> None:
+    rng = random.Random(f"{args.seed}:{index}")
+    num_players = rng.randint(args.min_players, args.max_players)
+    clients = [LoadClient(url, f"g{index}p{i}", stats, rng, args.guess_rate) for i in range(num_players)]
+    stats.add(live_games=1)
+    try:
+        host = clients[0]
+        host.emit('create_game', {'player_name': host.name})
+        host.wait('game_created')
+        for client in clients[1:]:
+            client.emit('join_game', {'game_id': host.game_id, 'player_name': client.name})
+            client.wait('game_joined')
+
+        if rng.random() < args.churn:
+            leaver = LoadClient(url, f"g{index}x", stats, rng, args.guess_rate)
+            leaver.emit('join_game', {'game_id': host.game_id, 'player_name': leaver.name})
+            leaver.wait('game_joined')
+            leaver.emit('leave_game', {'game_id': host.game_id})
+            leaver.wait('left_game')
+            leaver.sio.disconnect()
+
+        host.emit('start_game', {'game_id': host.game_id})
+        deadline = time.time() + GAME_TIMEOUT
+        if all(client.finished.wait(max(0.0, deadline - time.time())) for client in clients):
+            stats.add(games_finished=1)
+        else:
+            stats.add(games_timed_out=1)
+    finally:
+        stats.add(live_games=-1)
+        for client in clients:
+            client.sio.disconnect()
+
+
+def process_group_rss_kb(pgid: int) -> int:
+    """Resident memory of every process in a process group (Linux /proc)"""
+    total = 0
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            with open(f"/proc/{pid}/stat") as stat:
+                if int(stat.read().rsplit(')', 1)[1].split()[2]) != pgid:
+                    continue
+            with open(f"/proc/{pid}/status") as status:
+                total += next(int(line.split()[1]) for line in status if line.startswith('VmRSS:'))
+        except (OSError, StopIteration, ValueError, IndexError):
+            continue
+    return total
+
+
+def run_load(args) -> dict:
+    server = start_server(args.port, args.data_dir, args.mode)
+    url = f"http://127.0.0.1:{args.port}"
+    stats = LoadStats()
+    peak_rss = [0]
+    stop_sampling = threading.Event()
+
+    def sample_memory():
+        while not stop_sampling.wait(0.25):
+            peak_rss[0] = max(peak_rss[0], process_group_rss_kb(server.pid))
+
+    try:
+        base_rss = process_group_rss_kb(server.pid)
+        sampler = threading.Thread(target=sample_memory, daemon=True)
+        sampler.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for future in [pool.submit(play_game, url, i, stats, args) for i in range(args.games)]:
+                try:
+                    future.result()
+                except Exception as e:
+                    stats.add(errors=1)
+                    print(f"game failed: {e}", file=sys.stderr)
+        elapsed = time.perf_counter() - started
+        stop_sampling.set()
+        sampler.join()
+    finally:
+        stop_server(server)
+
+    latencies = sorted(stats.latencies)
+    return {
+        'games': args.games,
+        'games_finished': stats.games_finished,
+        'games_timed_out': stats.games_timed_out,
+        'peak_concurrent_games': stats.peak_live_games,
+        'errors': stats.errors,
+        'moves': stats.moves,
+        'elapsed_sec': round(elapsed, 2),
+        'events_per_sec': round(stats.events_emitted / elapsed, 1),
+        'moves_per_sec': round(stats.moves / elapsed, 1),
+        'latency_p50_ms': round(percentile(latencies, 0.50) * 1e3, 2) if latencies else None,
+        'latency_p95_ms': round(percentile(latencies, 0.95) * 1e3, 2) if latencies else None,
+        'latency_p99_ms': round(percentile(latencies, 0.99) * 1e3, 2) if latencies else None,
+        'bytes_per_move': round(stats.bytes_received / max(stats.moves, 1)),
+        'memory_per_game_kb': round((peak_rss[0] - base_rss) / max(stats.peak_live_games, 1), 1),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Metrics that got worse than the baseline by more than the tolerance"""
+    regressions = []
+    for metric, higher_is_better in METRICS.items():
+        old, new = baseline.get(metric), results.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=sorted(SERVER_COMMANDS), default='threading')
+    parser.add_argument('--port', type=int, default=5097)
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=25, help="games played at the same time")
+    parser.add_argument('--min-players', type=int, default=3)
+    parser.add_argument('--max-players', type=int, default=6)
+    parser.add_argument('--guess-rate', type=float, default=0.02, help="chance a late turn is a guess")
+    parser.add_argument('--churn', type=float, default=0.1, help="fraction of games with a lobby leaver")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default='/tmp/black-vienna-load')
+    parser.add_argument('--save', help="write the results to this JSON baseline file")
+    parser.add_argument('--compare', help="fail if results regress against this JSON baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = run_load(args)
+    print(json.dumps(results, indent=2))
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as baseline:
+            json.dump({
+                'mode': args.mode,
+                'settings': {key: getattr(args, key) for key in
+                             ('games', 'concurrency', 'min_players', 'max_players', 'guess_rate', 'churn', 'seed')},
+                'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                            'cpus': os.cpu_count()},
+                'results': results,
+            }, baseline, indent=2)
+            baseline.write('\n')
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline)['results'], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
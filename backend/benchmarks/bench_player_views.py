@@ -0,0 +1,53 @@
+"""Per-move cost of sending every player their view, with and without the shared snapshot.
+
+Run from the backend directory:  python benchmarks/bench_player_views.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bots import RandomPolicy, apply_action  # noqa: E402
+from game_logic import Game, GameStatus  # noqa: E402
+
+HISTORY_LENGTH = 30
+REPEATS = 300
+
+
+def late_game(num_players: int, seed: int = 0) -> Game:
+    rng = random.Random(seed)
+    game = Game("BENCH", rng=rng)
+    game.setup_game([{'id': f"p{i}", 'name': f"Player {i}"} for i in range(num_players)])
+    policy = RandomPolicy()
+    while game.game_status == GameStatus.ACTIVE and game.total_investigations < HISTORY_LENGTH:
+        player = game.get_current_investigator()
+        apply_action(game, player.player_id, policy.choose_action(game, player.player_id, rng))
+    game.game_status = GameStatus.ACTIVE
+    return game
+
+
+def per_move_cost(game: Game, shared: bool) -> float:
+    """Seconds to build all P views after one state change"""
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        game.mark_state_changed()
+        for player in game.players:
+            if not shared:
+                game.mark_state_changed()  # Old behaviour: every view rebuilt the public state
+            game.get_player_view(player.player_id)
+    return (time.perf_counter() - started) / REPEATS
+
+
+def main() -> None:
+    print(f"{'players':>7} {'rebuilt/move':>14} {'shared/move':>13} {'speedup':>8}")
+    for num_players in range(3, 9):
+        game = late_game(num_players)
+        rebuilt = per_move_cost(game, shared=False)
+        shared = per_move_cost(game, shared=True)
+        print(f"{num_players:>7} {rebuilt * 1e6:>12.1f}us {shared * 1e6:>11.1f}us {rebuilt / shared:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
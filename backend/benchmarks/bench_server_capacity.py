@@ -0,0 +1,151 @@
+"""Concurrent connections and event latency: threaded Flask server vs asyncio server.
+
+Starts the chosen server (app.py or async_app.py) on a local port, connects
+batches of 4-player games, and has every client round-trip
+request_game_state. Reports how many connections were accepted and p50/p99
+latency per batch size.
+
+Run from the backend directory:
+    python benchmarks/bench_server_capacity.py --mode threading
+    python benchmarks/bench_server_capacity.py --mode asyncio   (needs uvicorn)
+"""
+import argparse
+import importlib.util
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+import socketio
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLAYERS_PER_GAME = 4
+SERVER_COMMANDS = {
+    'threading': [sys.executable, 'app.py'],
+    'asyncio': [sys.executable, 'async_app.py'],
+}
+
+
+def start_server(port: int, data_dir: str, mode: str = 'threading') -> subprocess.Popen:
+    if mode == 'asyncio' and importlib.util.find_spec('uvicorn') is None:
+        sys.exit("The asyncio mode needs an ASGI server: pip install uvicorn")
+    env = dict(os.environ, BLACK_VIENNA_PORT=str(port), BLACK_VIENNA_DATA_DIR=data_dir)
+    server = subprocess.Popen(SERVER_COMMANDS[mode], cwd=BACKEND_DIR, env=env, start_new_session=True,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            return server
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    stop_server(server)
+    raise RuntimeError(f"{mode} server did not come up on port {port}")
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    os.killpg(server.pid, signal.SIGTERM)
+    server.wait()
+
+
+class BenchClient:
+    """One socket that waits for the replies to its own requests"""
+
+    def __init__(self, url: str):
+        self.sio = socketio.Client(reconnection=False)
+        self.replies = {}
+        self.events = {}
+        for event in ('game_created', 'game_joined', 'game_started', 'game_state_update'):
+            self.events[event] = threading.Event()
+            self.sio.on(event, self._handler(event))
+        self.sio.connect(url, transports=['websocket'], wait_timeout=10)
+
+    def _handler(self, event):
+        def handle(data):
+            self.replies[event] = data
+            self.events[event].set()
+        return handle
+
+    def request(self, event: str, data: dict, reply: str, timeout: float = 30) -> dict:
+        self.events[reply].clear()
+        self.sio.emit(event, data)
+        if not self.events[reply].wait(timeout):
+            raise TimeoutError(f"No {reply} after {event}")
+        return self.replies[reply]
+
+
+def connect_games(url: str, num_games: int):
+    """Connect num_games full lobbies and start them; returns (clients, game_ids, failures)"""
+    clients, game_ids, failures = [], [], 0
+    for _ in range(num_games):
+        try:
+            group = [BenchClient(url) for _ in range(PLAYERS_PER_GAME)]
+        except Exception:
+            failures += 1
+            continue
+        game_id = group[0].request('create_game', {'player_name': 'host'}, 'game_created')['game_id']
+        for i, client in enumerate(group[1:], start=1):
+            client.request('join_game', {'game_id': game_id, 'player_name': f"p{i}"}, 'game_joined')
+        group[0].request('start_game', {'game_id': game_id}, 'game_started')
+        clients.extend((client, game_id) for client in group)
+        game_ids.append(game_id)
+    return clients, game_ids, failures
+
+
+def measure_latency(clients, rounds: int):
+    """Every client round-trips request_game_state `rounds` times, all clients concurrently"""
+    latencies = []
+    lock = threading.Lock()
+
+    def run(client, game_id):
+        own = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            client.request('request_game_state', {'game_id': game_id}, 'game_state_update')
+            own.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=run, args=pair) for pair in clients]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return latencies, len(latencies) / elapsed
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=sorted(SERVER_COMMANDS), default='threading')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--games', type=int, nargs='+', default=[5, 25, 50])
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--data-dir', default='/tmp/black-vienna-bench')
+    args = parser.parse_args()
+    server = start_server(args.port, args.data_dir, args.mode)
+    url = f"http://127.0.0.1:{args.port}"
+    print(f"{'mode':>9} {'sockets':>8} {'refused':>8} {'events/s':>9} {'p50':>9} {'p99':>9}")
+    try:
+        for num_games in args.games:
+            clients, _, failures = connect_games(url, num_games)
+            latencies, rate = measure_latency(clients, args.rounds)
+            print(f"{args.mode:>9} {len(clients):>8} {failures:>8} {rate:>9.0f} "
+                  f"{percentile(latencies, 0.5) * 1e3:>7.1f}ms {percentile(latencies, 0.99) * 1e3:>7.1f}ms")
+            for client, _ in clients:
+                client.sio.disconnect()
+    finally:
+        stop_server(server)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Payload size and encode time of player state: JSON dicts vs the compact msgpack encoding.
+
+Measures a late-game full view and a one-move delta for 3-8 players, as
+JSON (what Socket.IO sends today), plain msgpack, the compact form as JSON
+and the compact form as msgpack (what opted-in clients receive).
+
+Run from the backend directory:  python benchmarks/bench_state_encoding.py
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import msgpack  # noqa: E402
+
+from bench_player_views import late_game  # noqa: E402
+from bots import RandomPolicy, apply_action  # noqa: E402
+from state_codec import compact_state  # noqa: E402
+
+REPEATS = 2000
+
+ENCODINGS = {
+    'json': lambda payload, players: json.dumps(payload, separators=(',', ':')).encode(),
+    'msgpack': lambda payload, players: msgpack.packb(payload, use_bin_type=True),
+    'compact json': lambda payload, players: json.dumps(compact_state(payload, players),
+                                                        separators=(',', ':')).encode(),
+    'compact msgpack': lambda payload, players: msgpack.packb(compact_state(payload, players),
+                                                              use_bin_type=True),
+}
+
+
+def sample_payloads(num_players: int):
+    """A late-game full view and the delta produced by one more move"""
+    game = late_game(num_players)
+    viewer = game.players[0].player_id
+    full = game.get_player_view(viewer)
+    investigator = game.get_current_investigator()
+    apply_action(game, investigator.player_id,
+                 RandomPolicy().choose_action(game, investigator.player_id, game.rng))
+    delta = game.get_player_update(viewer, full['version'])
+    return game.players, full, delta
+
+
+def measure(encode, payload, players):
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        encoded = encode(payload, players)
+    return len(encoded), (time.perf_counter() - started) / REPEATS
+
+
+def main() -> None:
+    print(f"{'players':>7} {'payload':>7} " + " ".join(f"{name:>22}" for name in ENCODINGS))
+    for num_players in range(3, 9):
+        players, full, delta = sample_payloads(num_players)
+        for label, payload in (('full', full), ('delta', delta)):
+            cells = []
+            for encode in ENCODINGS.values():
+                size, seconds = measure(encode, payload, players)
+                cells.append(f"{size:>7}B {seconds * 1e6:>9.1f}us")
+            print(f"{num_players:>7} {label:>7} " + " ".join(f"{cell:>22}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Hammer a single game from many clients and check that no move was applied twice.
+
+Phase 1 has more clients than seats join one lobby at once; the lobby must
+end with at most 8 players. Phase 2 has every player fire bursts of
+concurrent investigate events (the server runs each in its own thread) and
+checks the final state: coins taken plus coins left must equal the starting
+pool, no investigation card may be drawn twice, and every recorded
+investigation must correspond to exactly one turn.
+
+Run from the backend directory:  python benchmarks/stress_game_locking.py
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+from bench_server_capacity import BenchClient, start_server, stop_server
+
+STARTING_COINS = 40
+MAX_PLAYERS = 8
+
+
+def fill_lobby(url: str, joiners: int):
+    host = BenchClient(url)
+    game_id = host.request('create_game', {'player_name': 'host'}, 'game_created')['game_id']
+    clients = [BenchClient(url) for _ in range(joiners)]
+    barrier = threading.Barrier(joiners)
+
+    def join(index, client):
+        barrier.wait()
+        client.sio.emit('join_game', {'game_id': game_id, 'player_name': f"p{index}"})
+
+    threads = [threading.Thread(target=join, args=pair) for pair in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(1.0)
+    seated = [client for client in clients if client.events['game_joined'].is_set()]
+    return host, game_id, seated, clients
+
+
+def hammer(players, game_id: str, bursts: int, burst_size: int, seed: int) -> None:
+    rng = random.Random(seed)
+    ids = [client.sio.get_sid() for client in players]
+
+    def run(client):
+        own_id = client.sio.get_sid()
+        for _ in range(bursts):
+            for _ in range(burst_size):
+                target = rng.choice([pid for pid in ids if pid != own_id])
+                client.sio.emit('investigate', {
+                    'game_id': game_id, 'questioned_player_id': target, 'card_index': rng.randrange(3)
+                })
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=run, args=(client,)) for client in players]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(1.0)
+
+
+def check_state(state) -> list:
+    problems = []
+    history = state['investigation_history']
+    taken = sum(entry['coins'] for entry in history)
+    if taken + state['central_coins'] != STARTING_COINS:
+        problems.append(f"coins: {taken} taken + {state['central_coins']} left != {STARTING_COINS}")
+    drawn = [tuple(entry['letters']) for entry in history if not entry['is_double']]
+    if len(drawn) != len(set(drawn)):
+        problems.append(f"{len(drawn) - len(set(drawn))} investigation cards drawn twice")
+    if len(drawn) != state['total_investigations']:
+        problems.append(f"{len(drawn)} single investigations recorded for "
+                        f"{state['total_investigations']} turns")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--joiners', type=int, default=16)
+    parser.add_argument('--bursts', type=int, default=40)
+    parser.add_argument('--burst-size', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default='/tmp/black-vienna-stress')
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.data_dir)
+    url = f"http://127.0.0.1:{args.port}"
+    problems = []
+    try:
+        host, game_id, seated, clients = fill_lobby(url, args.joiners)
+        if len(seated) + 1 > MAX_PLAYERS:
+            problems.append(f"lobby overfilled: {len(seated) + 1} players")
+        print(f"lobby: {len(seated) + 1} of {args.joiners + 1} clients seated")
+
+        host.request('start_game', {'game_id': game_id}, 'game_started')
+        players = [host] + seated
+        hammer(players, game_id, args.bursts, args.burst_size, args.seed)
+
+        state = host.request('request_game_state', {'game_id': game_id}, 'game_state_update')
+        print(f"moves: {state['total_investigations']} investigations, "
+              f"{STARTING_COINS - state['central_coins']} coins taken, status {state['status']}")
+        problems += check_state(state)
+        for client in [host] + clients:
+            client.sio.disconnect()
+    finally:
+        stop_server(server)
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if problems:
+        sys.exit(1)
+    print("OK: no lost coins, no double-drawn cards")
+
+
+if __name__ == '__main__':
+    main()
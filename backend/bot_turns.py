@@ -0,0 +1,65 @@
+"""Timing of server-side bots' turns.
+
+When a bot becomes the investigator its turn is scheduled think_time
+seconds ahead. One timer thread keeps every pending turn in a heap and
+hands the due ones to a shared pool of workers, so a bot that is
+"thinking" holds no thread, and hundreds of games with bots share a
+handful of workers instead of a thread each.
+
+What a turn does is up to the play callback: it is called with the game,
+the bot and the state version the turn was scheduled at, and is expected
+to do nothing if the game has moved on since.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_THINK_TIME = 1.5  # seconds
+
+
+class BotTurns:
+    """Schedules bots' turns and plays them on a shared worker pool once they are due"""
+
+    def __init__(self, play: Callable[[str, str, int], None], workers: int = DEFAULT_WORKERS,
+                 think_time: float = DEFAULT_THINK_TIME):
+        self.play = play
+        self.think_time = think_time
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bot")
+        self._due: List[Tuple[float, int, str, str, int]] = []  # (due, order, game_id, player_id, version)
+        self._order = itertools.count()
+        self._wakeup = threading.Condition()
+        self._timer: Optional[threading.Thread] = None
+
+    def schedule(self, game_id: str, player_id: str, version: int) -> None:
+        """Play player_id's turn in game_id think_time seconds from now"""
+        with self._wakeup:
+            heapq.heappush(self._due, (time.monotonic() + self.think_time, next(self._order),
+                                       game_id, player_id, version))
+            if self._timer is None:
+                self._timer = threading.Thread(target=self._run, name="bot-timer", daemon=True)
+                self._timer.start()
+            self._wakeup.notify()
+
+    def pending(self) -> int:
+        return len(self._due)
+
+    def _run(self) -> None:
+        while True:
+            with self._wakeup:
+                while not self._due or self._due[0][0] > time.monotonic():
+                    self._wakeup.wait(self._due[0][0] - time.monotonic() if self._due else None)
+                _, _, game_id, player_id, version = heapq.heappop(self._due)
+            self._pool.submit(self._play, game_id, player_id, version)
+
+    def _play(self, game_id: str, player_id: str, version: int) -> None:
+        try:
+            self.play(game_id, player_id, version)
+        except Exception as e:
+            logger.error("Error playing bot turn", extra={'game_id': game_id, 'error': str(e)})
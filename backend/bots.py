@@ -0,0 +1,154 @@
+import importlib
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Type
+
+from game_logic import Game, PlayerStatus
+from suspects import mask_to_letters
+
+
+@dataclass
+class BotAction:
+    """A move chosen by a bot: either an investigation or a final guess"""
+    kind: str  # "investigate" or "guess"
+    questioned_player_id: Optional[str] = None
+    card_index: Optional[int] = None
+    double_card_id: Optional[str] = None
+    suspects: List[str] = field(default_factory=list)
+
+
+class BotPolicy:
+    """Base class for bot decision making.
+
+    A policy only sees what its player could see at the table: its own
+    suspect cards and the public game state. Subclasses implement
+    choose_action; the caller applies the result through Game.investigate
+    or Game.make_guess.
+    """
+    name = "base"
+
+    def choose_action(self, game: Game, player_id: str, rng: random.Random) -> BotAction:
+        raise NotImplementedError
+
+    # ----- Helpers shared by the built-in policies -----
+
+    @staticmethod
+    def questionable_players(game: Game, player_id: str) -> List[str]:
+        return [
+            p.player_id for p in game.players
+            if p.player_id != player_id and p.status == PlayerStatus.ACTIVE
+        ]
+
+    @staticmethod
+    def open_card_indices(game: Game) -> List[int]:
+        return [i for i, card in enumerate(game.face_up_cards) if card]
+
+    @staticmethod
+    def best_guess(game: Game, player_id: str, rng: random.Random) -> BotAction:
+        """Guess one of the triples the player's deduction engine still allows"""
+        candidates = game.get_candidate_masks(player_id)
+        if candidates:
+            return BotAction("guess", suspects=mask_to_letters(rng.choice(candidates)))
+        return BotAction("guess", suspects=rng.sample(game.all_suspects, 3))
+
+
+class RandomPolicy(BotPolicy):
+    """Questions a random opponent with a random face-up card"""
+    name = "random"
+
+    def choose_action(self, game: Game, player_id: str, rng: random.Random) -> BotAction:
+        opponents = self.questionable_players(game, player_id)
+        cards = self.open_card_indices(game)
+        if not opponents or not cards:
+            return BotAction("guess", suspects=rng.sample(game.all_suspects, 3))
+        return BotAction(
+            "investigate",
+            questioned_player_id=rng.choice(opponents),
+            card_index=rng.choice(cards)
+        )
+
+
+class GreedyCoinsPolicy(BotPolicy):
+    """Maximises expected coins: the card with the fewest of its own letters, the biggest hand"""
+    name = "greedy"
+
+    def choose_action(self, game: Game, player_id: str, rng: random.Random) -> BotAction:
+        opponents = self.questionable_players(game, player_id)
+        cards = self.open_card_indices(game)
+        if not opponents or not cards:
+            return self.best_guess(game, player_id, rng)
+
+        own_mask = game.get_player(player_id).suspect_mask
+        card_index = min(
+            cards,
+            key=lambda i: ((game.face_up_cards[i].mask & own_mask).bit_count(), rng.random())
+        )
+        hand_sizes = {p.player_id: len(p.suspect_cards) for p in game.players}
+        questioned = max(opponents, key=lambda pid: (hand_sizes[pid], rng.random()))
+        return BotAction("investigate", questioned_player_id=questioned, card_index=card_index)
+
+
+class SolverPolicy(BotPolicy):
+    """Uses the deduction engine: guesses once the solution is certain, else splits the candidates"""
+    name = "solver"
+
+    def __init__(self, guess_threshold: int = 1):
+        self.guess_threshold = guess_threshold
+
+    def choose_action(self, game: Game, player_id: str, rng: random.Random) -> BotAction:
+        candidates = game.get_candidate_masks(player_id)
+        opponents = self.questionable_players(game, player_id)
+        cards = self.open_card_indices(game)
+        if len(candidates) <= self.guess_threshold or not opponents or not cards:
+            return self.best_guess(game, player_id, rng)
+
+        # Prefer the card whose letters appear in close to half of the remaining triples
+        half = len(candidates) / 2.0
+
+        def imbalance(index: int) -> float:
+            card_mask = game.face_up_cards[index].mask
+            touching = sum(1 for triple in candidates if triple & card_mask)
+            return abs(touching - half)
+
+        card_index = min(cards, key=lambda i: (imbalance(i), rng.random()))
+        return BotAction(
+            "investigate",
+            questioned_player_id=rng.choice(opponents),
+            card_index=card_index
+        )
+
+
+POLICIES: Dict[str, Type[BotPolicy]] = {
+    RandomPolicy.name: RandomPolicy,
+    GreedyCoinsPolicy.name: GreedyCoinsPolicy,
+    SolverPolicy.name: SolverPolicy,
+}
+
+
+def register_policy(policy_class: Type[BotPolicy]) -> Type[BotPolicy]:
+    """Make a policy available by name (usable as a class decorator)"""
+    POLICIES[policy_class.name] = policy_class
+    return policy_class
+
+
+def load_policy(spec: str) -> BotPolicy:
+    """Instantiate a policy from a registered name or a 'module:ClassName' path"""
+    if spec in POLICIES:
+        return POLICIES[spec]()
+    if ":" in spec:
+        module_name, class_name = spec.split(":", 1)
+        policy_class = getattr(importlib.import_module(module_name), class_name)
+        return policy_class()
+    raise ValueError(f"Unknown bot policy: {spec}")
+
+
+def apply_action(game: Game, player_id: str, action: BotAction) -> Dict:
+    """Play a bot's action through the normal Game entry points"""
+    if action.kind == "guess":
+        return game.make_guess(player_id, action.suspects)
+    return game.investigate(
+        investigator_id=player_id,
+        questioned_player_id=action.questioned_player_id,
+        card_index=action.card_index,
+        double_card_id=action.double_card_id
+    )
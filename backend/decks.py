@@ -0,0 +1,143 @@
+"""Investigation card decks: the card definitions of each deck variant, built once.
+
+A variant is a list of three-letter cards. Every variant is validated when
+this module is imported: each card has three distinct known suspects, no
+card appears twice, and no two cards share more than one letter (so two
+investigations never overlap on more than one suspect). A broken variant
+fails at import rather than in the middle of a game.
+
+Card definitions are immutable and shared by every game; a game only
+creates its own InvestigationCard objects, which carry the per-game state
+(which deck, used by whom, for how many coins). Card ids are stable across
+variants: a card id always names the same letters.
+"""
+import itertools
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from suspects import NUM_SUSPECTS, SUSPECT_BITS, SUSPECTS, letters_to_mask
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; without it variants have no incidence matrix
+    np = None
+
+NUM_DECKS = 3
+CARD_SIZE = 3
+
+CLASSIC_COMBINATIONS: List[List[str]] = [
+    ["A", "B", "C"], ["A", "D", "E"], ["A", "F", "G"],
+    ["A", "H", "I"], ["A", "J", "K"], ["A", "L", "M"],
+    ["B", "D", "F"], ["B", "H", "J"], ["B", "L", "N"],
+    ["B", "O", "P"], ["B", "Q", "R"], ["B", "S", "T"],
+    ["C", "D", "H"], ["C", "E", "J"], ["C", "F", "L"],
+    ["C", "G", "N"], ["C", "I", "O"], ["C", "K", "Q"],
+    ["D", "G", "J"], ["D", "I", "L"], ["D", "K", "N"],
+    ["D", "M", "O"], ["D", "P", "Q"], ["D", "R", "S"],
+    ["E", "F", "H"], ["E", "G", "L"], ["E", "I", "N"],
+    ["E", "K", "O"], ["E", "M", "Q"], ["E", "P", "S"],
+    ["F", "I", "J"], ["F", "K", "M"], ["F", "N", "P"],
+    ["F", "O", "R"], ["F", "Q", "T"], ["F", "S", "Ω"]
+]
+
+# Cards bringing in U-Z, which the classic deck never asks about
+ADDITIONAL_COMBINATIONS: List[List[str]] = [
+    ["G", "H", "K"], ["G", "I", "M"], ["G", "O", "Q"],
+    ["H", "L", "O"], ["H", "M", "N"], ["H", "P", "R"],
+    ["I", "P", "Q"], ["I", "R", "T"], ["I", "S", "U"],
+    ["J", "L", "P"], ["J", "M", "R"], ["J", "N", "S"],
+    ["K", "L", "R"], ["K", "P", "S"], ["K", "T", "U"],
+    ["L", "Q", "S"], ["L", "T", "Ω"], ["M", "P", "T"],
+    ["M", "S", "U"], ["N", "O", "T"], ["N", "Q", "U"],
+    ["O", "S", "V"], ["P", "U", "V"], ["Q", "V", "W"],
+    ["R", "U", "W"], ["S", "W", "X"], ["T", "V", "X"],
+    ["U", "X", "Y"], ["V", "Y", "Z"], ["W", "Y", "Ω"],
+    ["X", "Z", "Ω"], ["Y", "A", "T"], ["Z", "B", "U"]
+]
+
+# Additional cards sharing two letters with an earlier card: I-P-Q and K-P-S
+# (with D-P-Q and E-P-S) and M-S-U (with I-S-U)
+CONFLICTING_COMBINATIONS: List[List[str]] = [["I", "P", "Q"], ["K", "P", "S"], ["M", "S", "U"]]
+
+
+@dataclass(frozen=True)
+class CardDefinition:
+    card_id: str
+    letters: Tuple[str, ...]
+    mask: int
+
+
+@dataclass(frozen=True)
+class DeckVariant:
+    """A validated set of card definitions, dealt into NUM_DECKS decks of deck_size cards"""
+    name: str
+    cards: Tuple[CardDefinition, ...]
+    card_rows: Dict[str, int]  # Card id -> its index in cards and row in incidence
+    incidence: Optional[object]  # (cards, suspects) 0/1 NumPy matrix, None without NumPy
+
+    @property
+    def deck_size(self) -> int:
+        return len(self.cards) // NUM_DECKS
+
+
+def validate(card_letters: Sequence[Sequence[str]]) -> None:
+    """Raise ValueError unless every card is sound and no two cards share more than one letter"""
+    masks = []
+    for letters in card_letters:
+        unknown = [letter for letter in letters if letter not in SUSPECT_BITS]
+        if unknown:
+            raise ValueError(f"Card {list(letters)} has unknown suspects {unknown}")
+        mask = letters_to_mask(letters)
+        if len(letters) != CARD_SIZE or mask.bit_count() != CARD_SIZE:
+            raise ValueError(f"Card {list(letters)} must have {CARD_SIZE} distinct suspects")
+        masks.append(mask)
+    for (i, first), (j, second) in itertools.combinations(enumerate(masks), 2):
+        shared = (first & second).bit_count()
+        if shared == CARD_SIZE:
+            raise ValueError(f"Card {list(card_letters[j])} appears twice")
+        if shared > 1:
+            raise ValueError(
+                f"Cards {list(card_letters[i])} and {list(card_letters[j])} share {shared} letters"
+            )
+
+
+def build_variant(name: str, card_letters: Sequence[Sequence[str]]) -> DeckVariant:
+    validate(card_letters)
+    if len(card_letters) % NUM_DECKS:
+        raise ValueError(f"Deck variant {name} has {len(card_letters)} cards, not a multiple of {NUM_DECKS}")
+
+    cards = []
+    for letters in card_letters:
+        key = frozenset(letters)
+        if key not in _CARD_IDS:
+            _CARD_IDS[key] = f"inv_card_{len(_CARD_IDS):02d}"
+        cards.append(CardDefinition(_CARD_IDS[key], tuple(letters), letters_to_mask(letters)))
+
+    incidence = None
+    if np is not None:
+        incidence = np.zeros((len(cards), NUM_SUSPECTS), dtype=np.uint8)
+        for row, card in enumerate(cards):
+            for letter in card.letters:
+                incidence[row, SUSPECTS.index(letter)] = 1
+        incidence.setflags(write=False)
+    return DeckVariant(name, tuple(cards), {card.card_id: row for row, card in enumerate(cards)}, incidence)
+
+
+# Letters -> card id, assigned in the order cards are first seen (classic ids first)
+_CARD_IDS: Dict[frozenset, str] = {}
+
+CLASSIC = "classic"
+EXTENDED = "extended"
+DEFAULT = CLASSIC
+
+VARIANTS: Dict[str, DeckVariant] = {
+    CLASSIC: build_variant(CLASSIC, CLASSIC_COMBINATIONS),
+    EXTENDED: build_variant(EXTENDED, CLASSIC_COMBINATIONS + [
+        letters for letters in ADDITIONAL_COMBINATIONS if letters not in CONFLICTING_COMBINATIONS
+    ]),
+}
+
+
+def variant(name: Optional[str] = None) -> DeckVariant:
+    """A deck variant by name (DEFAULT if None); KeyError for unknown names"""
+    return VARIANTS[name or DEFAULT]
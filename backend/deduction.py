@@ -0,0 +1,351 @@
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from suspects import ALL_SUSPECTS_MASK, iter_bits, mask_to_letters
+
+HIDDEN = 0  # Owner slot holding the three hidden suspects
+HIDDEN_COUNT = 3
+STARTING_COINS = 40
+REPAIR_SWAPS = 4  # Letter swaps tried on a broken witness before searching again
+
+# (assigned, possible) masks per owner slot, plus the mask of unplaced letters
+SearchState = Tuple[List[int], List[int], int]
+
+
+@dataclass(frozen=True)
+class Constraint:
+    """A letter count learned about one hand from a single investigation"""
+    owner: int
+    mask: int
+    coins: int
+    exact: bool = True  # False when the central pool ran dry, so the true count may be higher
+
+    def holds(self, hand_mask: int) -> bool:
+        count = (hand_mask & self.mask).bit_count()
+        return count == self.coins if self.exact else count >= self.coins
+
+
+class DeductionEngine:
+    """Tracks which hidden triples are still consistent with the investigation history.
+
+    Every letter the viewer cannot see is owned by exactly one slot: the hidden
+    pile (slot 0, three letters, unconstrained) or one of the other players.
+    Each investigation adds a count constraint on one player's hand. Search
+    propagates hand sizes and constraint counts before branching, and every
+    surviving triple keeps a witness deal. A new constraint only touches the
+    triples whose witness it breaks: those are first repaired by swapping a few
+    letters between hands, and searched again only when that fails.
+    """
+
+    def __init__(self, hand_sizes: Dict[str, int], viewer_id: Optional[str] = None,
+                 known_mask: int = 0, starting_coins: int = STARTING_COINS):
+        self.viewer_id = viewer_id
+        self.known_mask = known_mask
+        self.owner_ids: List[Optional[str]] = [None] + [
+            player_id for player_id in hand_sizes if player_id != viewer_id
+        ]
+        self.owner_index: Dict[str, int] = {
+            player_id: slot for slot, player_id in enumerate(self.owner_ids) if player_id
+        }
+        self.sizes: List[int] = [HIDDEN_COUNT] + [hand_sizes[pid] for pid in self.owner_ids[1:]]
+        self.unknown_mask: int = ALL_SUSPECTS_MASK & ~known_mask
+
+        self.constraints: List[List[Constraint]] = [[] for _ in self.owner_ids]
+        self._counts: List[List[Tuple[int, int, bool]]] = [[] for _ in self.owner_ids]  # (mask, coins, exact), for repairs
+        self.central_coins = starting_coins
+        self.results_seen = 0
+
+        # hidden triple mask -> witness (one hand mask per owner slot); built lazily
+        self._candidates: Optional[Dict[int, Tuple[int, ...]]] = None
+
+    @classmethod
+    def from_game(cls, game, viewer_id: Optional[str] = None) -> "DeductionEngine":
+        """Build an engine for a set-up game, seeing only viewer_id's cards (or none)"""
+        hand_sizes = {p.player_id: len(p.suspect_cards) for p in game.players}
+        viewer = game.get_player(viewer_id) if viewer_id else None
+        engine = cls(hand_sizes, viewer_id, viewer.suspect_mask if viewer else 0)
+        engine.sync(game.investigation_history)
+        return engine
+
+    # ----- Feeding constraints -----
+
+    def sync(self, investigation_history: List) -> int:
+        """Consume history entries not seen yet; returns how many were added"""
+        new_results = investigation_history[self.results_seen:]
+        for result in new_results:
+            self.add_result(result)
+        return len(new_results)
+
+    def add_result(self, result) -> None:
+        """Narrow the candidates with one InvestigationResult"""
+        pool_before = self.central_coins
+        self.central_coins -= result.coins_taken
+        self.results_seen += 1
+
+        owner = self.owner_index.get(result.questioned_player_id)
+        if owner is None:
+            return  # The viewer was questioned: nothing new to learn
+        self.add_constraint(Constraint(
+            owner=owner,
+            mask=result.card_mask & self.unknown_mask,
+            coins=result.coins_taken,
+            exact=result.coins_taken < pool_before
+        ))
+
+    def add_constraint(self, constraint: Constraint) -> None:
+        """Add a constraint and prune the existing candidate set incrementally"""
+        self.constraints[constraint.owner].append(constraint)
+        self._counts[constraint.owner].append((constraint.mask, constraint.coins, constraint.exact))
+        if self._candidates is None:
+            return
+
+        root = self._root_state()
+        if root is None:
+            self._candidates = {}
+            return
+        open_hidden = root[0][HIDDEN] | (root[1][HIDDEN] & root[2])
+
+        narrowed = {}
+        valid = None  # The last witness known to meet every constraint, a second starting point
+        for triple, witness in self._candidates.items():
+            if triple & ~open_hidden:
+                continue
+            if not constraint.holds(witness[constraint.owner]):
+                witness = (self._repair(witness, triple, constraint.owner)
+                           or valid and self._repair(valid, triple)
+                           or self._find_witness(root, triple))
+                if witness is None:
+                    continue
+            narrowed[triple] = valid = witness
+        self._candidates = narrowed
+
+    # ----- Queries -----
+
+    def candidate_masks(self) -> List[int]:
+        """Bitmasks of every hidden triple still consistent with the history"""
+        return sorted(self._ensure_candidates())
+
+    def candidate_solutions(self) -> List[List[str]]:
+        """Every hidden triple still consistent with the history, as letter lists"""
+        return [mask_to_letters(mask) for mask in self.candidate_masks()]
+
+    def slot_witness(self, triple_mask: int) -> Optional[Tuple[int, ...]]:
+        """One consistent deal for a candidate triple, as hand masks indexed by owner slot"""
+        return self._ensure_candidates().get(triple_mask)
+
+    def witness(self, triple_mask: int) -> Optional[Dict[str, int]]:
+        """One consistent deal (player_id -> hand mask) for a candidate triple"""
+        witness = self.slot_witness(triple_mask)
+        if witness is None:
+            return None
+        return {pid: witness[slot] for slot, pid in enumerate(self.owner_ids) if pid}
+
+    def iter_deals(self) -> Iterator[Tuple[int, ...]]:
+        """Yield every consistent deal as hand masks indexed by owner slot, triple by triple"""
+        root = self._root_state()
+        if root is None:
+            return
+        for triple in self.candidate_masks():
+            yield from self._solve(*self._fix_hidden(root, triple))
+
+    def iter_solutions(self, limit: Optional[int] = None) -> Iterator[Tuple[List[str], Dict[str, List[str]]]]:
+        """Yield every consistent (hidden triple, hand assignment) pair, optionally capped"""
+        produced = 0
+        for deal in self.iter_deals():
+            yield mask_to_letters(deal[HIDDEN]), {
+                pid: mask_to_letters(deal[slot])
+                for slot, pid in enumerate(self.owner_ids) if pid
+            }
+            produced += 1
+            if limit is not None and produced >= limit:
+                return
+
+    # ----- Search -----
+
+    def _ensure_candidates(self) -> Dict[int, Tuple[int, ...]]:
+        if self._candidates is None:
+            self._candidates = {}
+            root = self._root_state()
+            if root is not None:
+                fixed = root[0][HIDDEN]
+                open_hidden = root[1][HIDDEN] & root[2]
+                missing = HIDDEN_COUNT - fixed.bit_count()
+                witness = None
+                for extra in combinations(list(iter_bits(open_hidden)), missing):
+                    triple = fixed | sum(extra)
+                    # Neighbouring triples mostly share a deal up to a few swaps
+                    found = witness and self._repair(witness, triple) or self._find_witness(root, triple)
+                    if found is not None:
+                        self._candidates[triple] = witness = found
+        return self._candidates
+
+    def _root_state(self) -> Optional[SearchState]:
+        assigned = [0] * len(self.owner_ids)
+        possible = [self.unknown_mask] * len(self.owner_ids)
+        free = self._propagate(assigned, possible, self.unknown_mask)
+        if free is None:
+            return None
+        return assigned, possible, free
+
+    @staticmethod
+    def _fix_hidden(root: SearchState, triple: int) -> SearchState:
+        assigned, possible, free = list(root[0]), list(root[1]), root[2]
+        assigned[HIDDEN] = triple
+        possible[HIDDEN] = 0
+        return assigned, possible, free & ~triple
+
+    def _find_witness(self, root: SearchState, triple: int) -> Optional[Tuple[int, ...]]:
+        if root[0][HIDDEN] & ~triple:
+            return None  # Propagation already forced a letter into the hidden pile
+        return next(self._solve(*self._fix_hidden(root, triple)), None)
+
+    def _repair(self, witness: Tuple[int, ...], triple: int, broken: int = HIDDEN) -> Optional[Tuple[int, ...]]:
+        """A deal for triple derived from witness by a few letter swaps, or None if none was found.
+
+        The witness must meet every constraint except perhaps those on slot broken.
+        """
+        hands = list(witness)
+        touched = {broken}
+        leaving = iter_bits(hands[HIDDEN] & ~triple)
+        for bit in iter_bits(triple & ~hands[HIDDEN]):
+            slot = next(slot for slot, hand in enumerate(hands) if hand & bit)
+            hands[slot] ^= bit | next(leaving)
+            touched.add(slot)
+        hands[HIDDEN] = triple
+
+        wrong = [0] * len(hands)
+        for slot in touched:
+            wrong[slot] = self._violations(slot, hands[slot])
+        for _ in range(REPAIR_SWAPS):
+            worst = max(range(len(hands)), key=wrong.__getitem__)
+            if not wrong[worst]:
+                return tuple(hands)
+            swap = self._improving_swap(hands, wrong, worst)
+            if swap is None:
+                return None
+            slot, swapped = swap
+            hands[worst] ^= swapped
+            hands[slot] ^= swapped
+            wrong[worst] = self._violations(worst, hands[worst])
+            wrong[slot] = self._violations(slot, hands[slot])
+        return tuple(hands) if not any(wrong) else None
+
+    def _improving_swap(self, hands: List[int], wrong: List[int], worst: int) -> Optional[Tuple[int, int]]:
+        """A swap (other slot, both letters) moving a broken count of hand worst the right way"""
+        hand = hands[worst]
+        too_few, mask = next((count < coins, mask) for mask, coins, exact in self._counts[worst]
+                             for count in [(hand & mask).bit_count()]
+                             if count < coins or exact and count > coins)
+        giving = hand & ~mask if too_few else hand & mask
+        for slot in range(1, len(hands)):
+            if slot == worst:
+                continue
+            other = hands[slot]
+            taking = other & mask if too_few else other & ~mask
+            for ours in iter_bits(giving):
+                for theirs in iter_bits(taking):
+                    swapped = ours | theirs
+                    if (self._violations(worst, hand ^ swapped) + self._violations(slot, other ^ swapped)
+                            < wrong[worst] + wrong[slot]):
+                        return slot, swapped
+        return None
+
+    def _violations(self, slot: int, hand: int) -> int:
+        """How far a hand is from meeting the count constraints of its slot"""
+        total = 0
+        for mask, coins, exact in self._counts[slot]:
+            count = (hand & mask).bit_count()
+            if count < coins:
+                total += coins - count
+            elif exact and count > coins:
+                total += count - coins
+        return total
+
+    def _solve(self, assigned: List[int], possible: List[int], free: int) -> Iterator[Tuple[int, ...]]:
+        free = self._propagate(assigned, possible, free)
+        if free is None:
+            return
+        if not free:
+            yield tuple(assigned)
+            return
+
+        # Branch on the unplaced letter with the fewest possible owners
+        branch_bit, branch_owners = 0, None
+        for bit in iter_bits(free):
+            owners = [slot for slot, mask in enumerate(possible) if mask & bit]
+            if branch_owners is None or len(owners) < len(branch_owners):
+                branch_bit, branch_owners = bit, owners
+                if len(owners) <= 2:
+                    break
+
+        for slot in branch_owners:
+            child_assigned = list(assigned)
+            child_possible = list(possible)
+            child_assigned[slot] |= branch_bit
+            yield from self._solve(child_assigned, child_possible, free & ~branch_bit)
+
+    def _propagate(self, assigned: List[int], possible: List[int], free: int) -> Optional[int]:
+        """Apply hand-size and count constraints until fixpoint; None on contradiction"""
+        sizes = self.sizes
+        constraints = self.constraints
+        changed = True
+        while changed:
+            changed = False
+
+            for slot, size in enumerate(sizes):
+                hand = assigned[slot]
+                open_mask = possible[slot] & free
+                need = size - hand.bit_count()
+                room = open_mask.bit_count()
+                if need < 0 or room < need:
+                    return None
+                if open_mask and (need == 0 or room == need):
+                    if need:
+                        hand |= open_mask
+                        free &= ~open_mask
+                    assigned[slot] = hand
+                    possible[slot] = 0
+                    changed = True
+                    continue
+
+                for constraint in constraints[slot]:
+                    inside = (hand & constraint.mask).bit_count()
+                    undecided = open_mask & constraint.mask
+                    reachable = inside + undecided.bit_count()
+                    if reachable < constraint.coins:
+                        return None
+                    if constraint.exact and inside > constraint.coins:
+                        return None
+                    if not undecided:
+                        continue
+                    if constraint.exact and inside == constraint.coins:
+                        open_mask &= ~undecided
+                        changed = True
+                    elif reachable == constraint.coins:
+                        hand |= undecided
+                        open_mask &= ~undecided
+                        free &= ~undecided
+                        changed = True
+                assigned[slot] = hand
+                possible[slot] = open_mask
+
+            # Every unplaced letter needs an owner; letters with only one are forced
+            once = twice = 0
+            for mask in possible:
+                mask &= free
+                twice |= once & mask
+                once |= mask
+            if free & ~once:
+                return None
+            forced = free & ~twice
+            if forced:
+                for slot, mask in enumerate(possible):
+                    taken = mask & forced
+                    if taken:
+                        assigned[slot] |= taken
+                        possible[slot] = mask & ~taken
+                free &= ~forced
+                changed = True
+
+        return free
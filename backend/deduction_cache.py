@@ -0,0 +1,192 @@
+"""Cross-game cache of deduction results, keyed by canonical positions.
+
+What a viewer can deduce depends only on the hand sizes, on which of the
+letters they cannot see each investigation covered, and on the coins it
+took. Which letters and which opponents those are does not matter: a
+position with suspects renamed or opponents reordered is the same
+problem. canonical_position() relabels a viewer's position so the letters
+and opponents are ordered by their role in the constraints (refining the
+order a few rounds, like colour refinement on a graph). Equivalent
+positions usually end up with the same key, across games as much as
+within one.
+
+Keys are built from the relabelled constraints themselves, so two
+positions can only share a key if they really are the same problem. A
+symmetry the refinement cannot break just costs a miss, never a wrong
+answer. Results are stored in canonical labels and mapped back to each
+viewer's suspects and players on the way out.
+"""
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from deduction import HIDDEN_COUNT, STARTING_COINS
+from suspects import ALL_SUSPECTS_MASK, SUSPECTS, iter_bits
+
+DEFAULT_CAPACITY = 2048
+REFINEMENT_ROUNDS = 4
+
+
+@dataclass(frozen=True)
+class CanonicalPosition:
+    """A viewer's position under canonical labels, with the way back to the real ones"""
+    key: Tuple
+    letters: Tuple[int, ...]  # Suspect bit of canonical letter i
+    owners: Tuple[Optional[str], ...]  # Player id of canonical owner slot j (slot 0: hidden)
+
+    def triple_mask(self, canonical_mask: int) -> int:
+        mask = 0
+        for bit in iter_bits(canonical_mask):
+            mask |= self.letters[bit.bit_length() - 1]
+        return mask
+
+
+def _ranks(colours: Sequence[Hashable]) -> List[int]:
+    """Replace each colour by its rank among the distinct colours (label-independent ids)"""
+    order = {colour: rank for rank, colour in enumerate(sorted(set(colours)))}
+    return [order[colour] for colour in colours]
+
+
+def canonical_position(hand_sizes: Dict[str, int], viewer_id: str, known_mask: int,
+                       history: Sequence, starting_coins: int = STARTING_COINS) -> CanonicalPosition:
+    """Canonical form of the deduction problem a DeductionEngine for viewer_id would solve"""
+    owners = [player_id for player_id in hand_sizes if player_id != viewer_id]
+    slot_of = {player_id: slot for slot, player_id in enumerate(owners, start=1)}
+    sizes = [HIDDEN_COUNT] + [hand_sizes[player_id] for player_id in owners]
+    unknown_mask = ALL_SUSPECTS_MASK & ~known_mask
+    letters = list(iter_bits(unknown_mask))
+
+    # The constraints DeductionEngine.add_result derives, without duplicates
+    found = set()
+    pool = starting_coins
+    for result in history:
+        pool_before = pool
+        pool -= result.coins_taken
+        slot = slot_of.get(result.questioned_player_id)
+        if slot is not None:
+            found.add((slot, result.card_mask & unknown_mask, result.coins_taken,
+                       result.coins_taken < pool_before))
+    constraints = sorted(found)
+    members = [[i for i, bit in enumerate(letters) if mask & bit] for _, mask, _, _ in constraints]
+    covering = [[] for _ in letters]
+    for index, letter_indices in enumerate(members):
+        for i in letter_indices:
+            covering[i].append(index)
+
+    # The hidden pile keeps slot 0 whatever its colour
+    slot_colours = _ranks([(slot == 0, size) for slot, size in enumerate(sizes)])
+    letter_colours = [0] * len(letters)
+    distinct = None
+    for _ in range(REFINEMENT_ROUNDS):
+        constraint_colours = _ranks([
+            (slot_colours[slot], coins, exact, tuple(sorted(letter_colours[i] for i in members[index])))
+            for index, (slot, _, coins, exact) in enumerate(constraints)
+        ])
+        by_slot = [[] for _ in sizes]
+        for index, (slot, _, _, _) in enumerate(constraints):
+            by_slot[slot].append(constraint_colours[index])
+        slot_colours = _ranks([(slot_colours[slot], tuple(sorted(colours)))
+                               for slot, colours in enumerate(by_slot)])
+        letter_colours = _ranks([tuple(sorted(constraint_colours[index] for index in covering[i]))
+                                 for i in range(len(letters))])
+        refined = (len(set(slot_colours)), len(set(letter_colours)), len(set(constraint_colours)))
+        if refined == distinct:
+            break
+        distinct = refined
+
+    letter_order = sorted(range(len(letters)), key=lambda i: (letter_colours[i], i))
+    slot_order = [0] + sorted(range(1, len(sizes)), key=lambda slot: (slot_colours[slot], slot))
+    canonical_letter = {letters[i]: 1 << rank for rank, i in enumerate(letter_order)}
+    canonical_slot = {slot: rank for rank, slot in enumerate(slot_order)}
+
+    relabelled = sorted(
+        (canonical_slot[slot], sum(canonical_letter[bit] for bit in iter_bits(mask)), coins, exact)
+        for slot, mask, coins, exact in constraints
+    )
+    return CanonicalPosition(
+        key=(len(letters), tuple(sizes[slot] for slot in slot_order), tuple(relabelled)),
+        letters=tuple(letters[i] for i in letter_order),
+        owners=tuple(None if slot == 0 else owners[slot - 1] for slot in slot_order)
+    )
+
+
+class DeductionCache:
+    """Bounded LRU cache of candidate triples and suspect probabilities, shared by all games.
+
+    Safe to use from the handler threads of different games at once. A
+    result missing from the cache is computed outside the cache's lock, so
+    two viewers of the same new position may both compute it.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._entries: "OrderedDict[Tuple[str, Tuple], object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = {"candidates": 0, "probabilities": 0}
+        self.misses: Dict[str, int] = {"candidates": 0, "probabilities": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def candidates(self, position: CanonicalPosition, compute: Callable[[], List[int]]) -> List[int]:
+        """Candidate triple masks of the position; compute() gives them in its real labels on a miss"""
+        stored = self._get("candidates", position.key)
+        if stored is None:
+            lookup = {bit: 1 << i for i, bit in enumerate(position.letters)}
+            stored = array("I", sorted(
+                sum(lookup[bit] for bit in iter_bits(mask)) for mask in compute()
+            ))
+            self._put("candidates", position.key, stored)
+        return sorted(position.triple_mask(mask) for mask in stored)
+
+    def probabilities(self, position: CanonicalPosition,
+                      compute: Callable[[], Tuple[Optional[Dict[str, Dict[str, float]]], bool]]
+                      ) -> Optional[Dict[str, Dict[str, float]]]:
+        """Suspect probabilities of the position, as SuspectProbabilityEstimator.estimate() returns them.
+
+        On a miss compute() gives them in real labels, with whether they are
+        final; an estimate still being refined is returned but not stored.
+        """
+        stored = self._get("probabilities", position.key)
+        if stored is None:
+            estimate, final = compute()
+            if estimate is None or not final:
+                return estimate
+            keys = ["hidden" if owner is None else owner for owner in position.owners]
+            stored = tuple(
+                tuple(estimate[SUSPECTS[bit.bit_length() - 1]][key] for key in keys)
+                for bit in position.letters
+            )
+            self._put("probabilities", position.key, stored)
+        keys = ["hidden" if owner is None else owner for owner in position.owners]
+        return {
+            SUSPECTS[bit.bit_length() - 1]: dict(zip(keys, shares))
+            for bit, shares in sorted(zip(position.letters, stored))
+        }
+
+    def stats(self) -> Dict[str, object]:
+        return {"entries": len(self._entries), "capacity": self.capacity,
+                "hits": dict(self.hits), "misses": dict(self.misses)}
+
+    def _get(self, kind: str, key: Tuple):
+        with self._lock:
+            value = self._entries.get((kind, key))
+            if value is None:
+                self.misses[kind] += 1
+                return None
+            self._entries.move_to_end((kind, key))
+            self.hits[kind] += 1
+            return value
+
+    def _put(self, kind: str, key: Tuple, value) -> None:
+        with self._lock:
+            self._entries[(kind, key)] = value
+            self._entries.move_to_end((kind, key))
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+
+# The cache every Game shares; app.py sizes it from BLACK_VIENNA_DEDUCTION_CACHE
+shared = DeductionCache()
@@ -1,7 +1,26 @@
 import random
+from collections import OrderedDict
 from typing import List, Dict, Optional, Set, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
+from suspects import SUSPECTS, letters_to_mask, mask_to_letters, match_count
+from deduction import DeductionEngine
+from probabilities import SuspectProbabilityEstimator, viewer_seed
+import deduction_cache
+import decks
+from deduction_cache import CanonicalPosition
+
+# How many recently sent public snapshots are kept to compute deltas against
+STATE_DELTA_WINDOW = 32
+
+# Top-level public state fields that are replaced wholesale when they change
+REPLACED_STATE_KEYS = (
+    "status", "players", "current_investigator_index", "current_investigator",
+    "central_coins", "coins_used", "face_up_cards", "double_investigation_enabled",
+    "total_investigations", "round_count"
+)
+# Append-only public state fields, sent as the entries added since the base version
+APPENDED_STATE_KEYS = ("investigation_history", "zero_coin_cards")
 
 class GameStatus(Enum):
     WAITING = "waiting"
@@ -22,6 +41,11 @@ class InvestigationResult:
     card_letters: List[str]
     coins_taken: int
     is_double_investigation: bool = False
+    card_mask: int = field(default=0, repr=False)
+
+    def __post_init__(self):
+        if not self.card_mask:
+            self.card_mask = letters_to_mask(self.card_letters)
 
 @dataclass
 class Player:
@@ -31,6 +55,16 @@ class Player:
     has_been_investigator: bool = False
     status: PlayerStatus = PlayerStatus.ACTIVE
     notes: Dict = field(default_factory=dict)  # For future frontend note-taking feature
+    suspect_mask: int = field(default=0, repr=False)
+
+    def __post_init__(self):
+        if self.suspect_cards and not self.suspect_mask:
+            self.suspect_mask = letters_to_mask(self.suspect_cards)
+
+    def set_suspect_cards(self, cards: List[str]) -> None:
+        """Replace the player's hand, keeping the list and bitmask views in sync"""
+        self.suspect_cards = cards
+        self.suspect_mask = letters_to_mask(cards)
 
 @dataclass
 class InvestigationCard:
@@ -41,15 +75,25 @@ class InvestigationCard:
     coins_when_used: Optional[int] = None
     used_by_player_id: Optional[str] = None
     questioned_player_id: Optional[str] = None
+    mask: int = field(default=0, repr=False)
+
+    def __post_init__(self):
+        if not self.mask:
+            self.mask = letters_to_mask(self.letters)
 
 class Game:
-    def __init__(self, game_id: str):
+    def __init__(self, game_id: str, rng: Optional[random.Random] = None):
         self.game_id = game_id
+        self.rng = rng if rng is not None else random.Random()
         self.players: List[Player] = []
+        self.players_by_id: Dict[str, Player] = {}
+        self.player_names: Dict[str, str] = {}  # player_id -> name, used in serialization
         self.hidden_suspects: List[str] = []
+        self.hidden_mask: int = 0
         self.all_suspects: List[str] = self.create_suspects()
         
         # Investigation cards and decks
+        self.deck: decks.DeckVariant = decks.variant()
         self.investigation_cards: List[InvestigationCard] = []
         self.investigation_decks: List[List[InvestigationCard]] = [[], [], []]
         self.face_up_cards: List[Optional[InvestigationCard]] = [None, None, None]
@@ -66,63 +110,34 @@ class Game:
         
         # Track if each player has been investigator
         self.players_been_investigator: Set[str] = set()
+
+        # Versioned public snapshot shared by every player's view
+        self.state_version: int = 0
+        self._public_state: Optional[Dict] = None
+        self._recent_states: "OrderedDict[int, Dict]" = OrderedDict()
+        
+        # Incremental deduction engines, one per viewing player (built on demand)
+        self.deduction_engines: Dict[str, DeductionEngine] = {}
+        self.probability_estimators: Dict[str, SuspectProbabilityEstimator] = {}
+        # player_id -> (history length, canonical position) for the shared result cache
+        self._canonical_positions: Dict[str, Tuple[int, CanonicalPosition]] = {}
         
     @staticmethod
     def create_suspects() -> List[str]:
         """Create all 27 suspect cards"""
-        return [chr(i) for i in range(65, 91)] + ["Ω"]  # A-Z + Omega (using Ω instead of O:)
+        return list(SUSPECTS)
     
     def create_investigation_cards(self) -> List[InvestigationCard]:
-        """Create 36 investigation cards with proper constraints"""
-        # Proper investigation card combinations for Black Vienna
-        # Each card has 3 letters, no two cards share more than 1 letter
-        card_combinations = [
-            ["A", "B", "C"], ["A", "D", "E"], ["A", "F", "G"],
-            ["A", "H", "I"], ["A", "J", "K"], ["A", "L", "M"],
-            ["B", "D", "F"], ["B", "H", "J"], ["B", "L", "N"],
-            ["B", "O", "P"], ["B", "Q", "R"], ["B", "S", "T"],
-            ["C", "D", "H"], ["C", "E", "J"], ["C", "F", "L"],
-            ["C", "G", "N"], ["C", "I", "O"], ["C", "K", "Q"],
-            ["D", "G", "J"], ["D", "I", "L"], ["D", "K", "N"],
-            ["D", "M", "O"], ["D", "P", "Q"], ["D", "R", "S"],
-            ["E", "F", "H"], ["E", "G", "L"], ["E", "I", "N"],
-            ["E", "K", "O"], ["E", "M", "Q"], ["E", "P", "S"],
-            ["F", "I", "J"], ["F", "K", "M"], ["F", "N", "P"],
-            ["F", "O", "R"], ["F", "Q", "T"], ["F", "S", "Ω"]
-        ]
-        
-        # Add remaining cards with letters U, V, W, X, Y, Z
-        additional_combinations = [
-            ["G", "H", "K"], ["G", "I", "M"], ["G", "O", "Q"],
-            ["H", "L", "O"], ["H", "M", "N"], ["H", "P", "R"],
-            ["I", "P", "Q"], ["I", "R", "T"], ["I", "S", "U"],
-            ["J", "L", "P"], ["J", "M", "R"], ["J", "N", "S"],
-            ["K", "L", "R"], ["K", "P", "S"], ["K", "T", "U"],
-            ["L", "Q", "S"], ["L", "T", "Ω"], ["M", "P", "T"],
-            ["M", "S", "U"], ["N", "O", "T"], ["N", "Q", "U"],
-            ["O", "S", "V"], ["P", "U", "V"], ["Q", "V", "W"],
-            ["R", "U", "W"], ["S", "W", "X"], ["T", "V", "X"],
-            ["U", "X", "Y"], ["V", "Y", "Z"], ["W", "Y", "Ω"],
-            ["X", "Z", "Ω"], ["Y", "A", "T"], ["Z", "B", "U"]
+        """This game's cards for its deck variant (the definitions themselves are built once, in decks)"""
+        return [
+            InvestigationCard(card_id=card.card_id, letters=list(card.letters), deck_index=-1, mask=card.mask)
+            for card in self.deck.cards
         ]
-        
-        # Combine and limit to 36 cards
-        all_combinations = card_combinations[:36]
-        
-        cards = []
-        for i, combo in enumerate(all_combinations):
-            card = InvestigationCard(
-                card_id=f"inv_card_{i:02d}",
-                letters=combo,
-                deck_index=-1,  # Will be set when distributed to decks
-                has_been_used=False
-            )
-            cards.append(card)
-        
-        return cards
     
-    def setup_game(self, players_data: List[Dict]) -> None:
-        """Set up the game with players"""
+    def setup_game(self, players_data: List[Dict], deck: Optional[str] = None) -> None:
+        """Set up the game with players, dealing the cards of a deck variant (decks.DEFAULT if None)"""
+        self.deck = decks.variant(deck)
+        
         # Create players
         for player_data in players_data:
             player = Player(
@@ -130,13 +145,15 @@ class Game:
                 name=player_data['name']
             )
             self.players.append(player)
+        self._index_players()
         
         # Pick 3 hidden suspects
-        self.hidden_suspects = random.sample(self.all_suspects, 3)
+        self.hidden_suspects = self.rng.sample(self.all_suspects, 3)
+        self.hidden_mask = letters_to_mask(self.hidden_suspects)
         
         # Distribute remaining suspects to players
         remaining_suspects = [s for s in self.all_suspects if s not in self.hidden_suspects]
-        random.shuffle(remaining_suspects)
+        self.rng.shuffle(remaining_suspects)
         
         # Calculate cards per player
         num_players = len(self.players)
@@ -146,16 +163,17 @@ class Game:
         card_index = 0
         for i, player in enumerate(self.players):
             num_cards = cards_per_player + (1 if i < extra_cards else 0)
-            player.suspect_cards = remaining_suspects[card_index:card_index + num_cards]
+            player.set_suspect_cards(remaining_suspects[card_index:card_index + num_cards])
             card_index += num_cards
         
         # Create and distribute investigation cards
         self.investigation_cards = self.create_investigation_cards()
-        random.shuffle(self.investigation_cards)
+        self.rng.shuffle(self.investigation_cards)
         
-        # Split into 3 decks of 12 cards each
-        for deck_idx in range(3):
-            deck_cards = self.investigation_cards[deck_idx * 12:(deck_idx + 1) * 12]
+        # Split into 3 decks of equal size
+        deck_size = self.deck.deck_size
+        for deck_idx in range(decks.NUM_DECKS):
+            deck_cards = self.investigation_cards[deck_idx * deck_size:(deck_idx + 1) * deck_size]
             for card in deck_cards:
                 card.deck_index = deck_idx
             self.investigation_decks[deck_idx] = deck_cards
@@ -164,9 +182,27 @@ class Game:
                 self.face_up_cards[deck_idx] = deck_cards[0]
         
         # Set initial investigator randomly
-        self.current_investigator_index = random.randint(0, num_players - 1)
+        self.current_investigator_index = self.rng.randint(0, num_players - 1)
         
+        self.deduction_engines = {}
+        self.probability_estimators = {}
+        self._canonical_positions = {}
         self.game_status = GameStatus.ACTIVE
+        self.mark_state_changed()
+    
+    def _index_players(self) -> None:
+        """Rebuild the player_id lookups; call whenever Game.players changes"""
+        self.players_by_id = {p.player_id: p for p in self.players}
+        self.player_names = {p.player_id: p.name for p in self.players}
+    
+    def get_player(self, player_id: str) -> Optional[Player]:
+        """Look up a player by id in O(1)"""
+        return self.players_by_id.get(player_id)
+    
+    def mark_state_changed(self) -> None:
+        """Bump the state version and drop the cached public snapshot"""
+        self.state_version += 1
+        self._public_state = None
     
     def get_current_investigator(self) -> Optional[Player]:
         """Get the current investigator player"""
@@ -194,8 +230,11 @@ class Game:
     def investigate(self, investigator_id: str, questioned_player_id: str, 
                    card_index: int, double_card_id: Optional[str] = None) -> Dict:
         """Perform an investigation"""
+        if self.game_status != GameStatus.ACTIVE:
+            return {"error": "Game is not active"}
+        
         # Validate investigator
-        investigator = next((p for p in self.players if p.player_id == investigator_id), None)
+        investigator = self.players_by_id.get(investigator_id)
         if not investigator or investigator.status != PlayerStatus.ACTIVE:
             return {"error": "Invalid investigator"}
         
@@ -203,7 +242,7 @@ class Game:
             return {"error": "Not your turn"}
         
         # Validate questioned player
-        questioned = next((p for p in self.players if p.player_id == questioned_player_id), None)
+        questioned = self.players_by_id.get(questioned_player_id)
         if not questioned or questioned.status != PlayerStatus.ACTIVE:
             return {"error": "Invalid player to question"}
         
@@ -217,10 +256,7 @@ class Game:
         investigation_card = self.face_up_cards[card_index]
         
         # Count matching letters
-        matching_count = sum(
-            1 for letter in investigation_card.letters 
-            if letter in questioned.suspect_cards
-        )
+        matching_count = match_count(investigation_card.mask, questioned.suspect_mask)
         
         # Take coins from central pool
         if self.central_coins < matching_count:
@@ -234,7 +270,8 @@ class Game:
             questioned_player_id=questioned_player_id,
             card_letters=investigation_card.letters.copy(),
             coins_taken=matching_count,
-            is_double_investigation=False
+            is_double_investigation=False,
+            card_mask=investigation_card.mask
         )
         self.investigation_history.append(result)
         
@@ -264,10 +301,7 @@ class Game:
             )
             if double_card and double_card.coins_when_used == 0:
                 # Count matching letters for double investigation
-                double_matching = sum(
-                    1 for letter in double_card.letters 
-                    if letter in questioned.suspect_cards
-                )
+                double_matching = match_count(double_card.mask, questioned.suspect_mask)
                 
                 # Take coins
                 if self.central_coins < double_matching:
@@ -280,7 +314,8 @@ class Game:
                     questioned_player_id=questioned_player_id,
                     card_letters=double_card.letters.copy(),
                     coins_taken=double_matching,
-                    is_double_investigation=True
+                    is_double_investigation=True,
+                    card_mask=double_card.mask
                 )
                 self.investigation_history.append(double_result)
         
@@ -300,6 +335,7 @@ class Game:
         if self.check_end_conditions():
             self.game_status = GameStatus.ENDED
         
+        self.mark_state_changed()
         return {
             "success": True,
             "result": result,
@@ -312,6 +348,7 @@ class Game:
         active_players = self.get_active_players()
         if not active_players:
             self.game_status = GameStatus.ENDED
+            self.mark_state_changed()
             return
         
         # Find next active player
@@ -322,10 +359,14 @@ class Game:
                 self.round_count += 1
                 break
             attempts += 1
+        self.mark_state_changed()
     
     def make_guess(self, player_id: str, guessed_suspects: List[str]) -> Dict:
         """Player makes a guess at the hidden suspects"""
-        player = next((p for p in self.players if p.player_id == player_id), None)
+        if self.game_status != GameStatus.ACTIVE:
+            return {"error": "Game is not active"}
+        
+        player = self.players_by_id.get(player_id)
         if not player or player.status != PlayerStatus.ACTIVE:
             return {"error": "Invalid player or already eliminated"}
         
@@ -338,9 +379,10 @@ class Game:
             return {"error": "Must guess exactly 3 suspects"}
         
         # Check if guess is correct
-        if set(guessed_suspects) == set(self.hidden_suspects):
+        if letters_to_mask(guessed_suspects) == self.hidden_mask:
             player.status = PlayerStatus.WINNER
             self.game_status = GameStatus.ENDED
+            self.mark_state_changed()
             return {
                 "success": True,
                 "correct": True,
@@ -356,6 +398,7 @@ class Game:
             else:
                 # Move to next turn if game continues
                 self.next_turn()
+            self.mark_state_changed()
             
             return {
                 "success": True,
@@ -363,6 +406,29 @@ class Game:
                 "eliminated": True
             }
     
+    def forfeit(self, player_id: str) -> Dict:
+        """Eliminate a player who gave up their seat; play passes on if it was their turn"""
+        if self.game_status != GameStatus.ACTIVE:
+            return {"error": "Game is not active"}
+        
+        player = self.players_by_id.get(player_id)
+        if not player or player.status != PlayerStatus.ACTIVE:
+            return {"error": "Invalid player or already eliminated"}
+        
+        was_current = self.players[self.current_investigator_index].player_id == player_id
+        player.status = PlayerStatus.ELIMINATED
+        if not self.get_active_players():
+            self.game_status = GameStatus.ENDED
+        elif was_current:
+            self.next_turn()
+        self.mark_state_changed()
+        
+        return {
+            "success": True,
+            "eliminated": True,
+            "game_ended": self.game_status == GameStatus.ENDED
+        }
+    
     def check_end_conditions(self) -> bool:
         """Check if game should end"""
         # Coin limit: 37 or more coins removed
@@ -384,9 +450,48 @@ class Game:
         return False
     
     def get_game_state(self) -> Dict:
-        """Get the current game state"""
+        """Get the current game state (built at most once per state version)"""
+        # Shallow copy: callers may add keys, the nested values are shared and read-only
+        return dict(self._current_public_state())
+    
+    def _current_public_state(self) -> Dict:
+        if self._public_state is None:
+            self._public_state = self._build_game_state()
+            self._recent_states[self.state_version] = self._public_state
+            while len(self._recent_states) > STATE_DELTA_WINDOW:
+                self._recent_states.popitem(last=False)
+        return self._public_state
+    
+    def get_state_delta(self, since_version: int) -> Optional[Dict]:
+        """Public changes since a previously built version, or None if it is too old to diff"""
+        base = self._recent_states.get(since_version)
+        current = self._current_public_state()
+        if base is None:
+            return None
+        
+        changes = {
+            key: current[key]
+            for key in REPLACED_STATE_KEYS
+            if current[key] != base[key]
+        }
+        for key in APPENDED_STATE_KEYS:
+            start = len(base[key])
+            if len(current[key]) > start:
+                changes[key] = {"from": start, "entries": current[key][start:]}
+        
         return {
             "game_id": self.game_id,
+            "delta": True,
+            "base_version": since_version,
+            "version": current["version"],
+            "changes": changes
+        }
+    
+    def _build_game_state(self) -> Dict:
+        names = self.player_names
+        return {
+            "game_id": self.game_id,
+            "version": self.state_version,
             "status": self.game_status.value,
             "players": [
                 {
@@ -415,8 +520,8 @@ class Game:
             "investigation_history": [
                 {
                     "round": r.round_number,
-                    "investigator": next(p.name for p in self.players if p.player_id == r.investigator_id),
-                    "questioned": next(p.name for p in self.players if p.player_id == r.questioned_player_id),
+                    "investigator": names[r.investigator_id],
+                    "questioned": names[r.questioned_player_id],
                     "letters": r.card_letters,
                     "coins": r.coins_taken,
                     "is_double": r.is_double_investigation
@@ -428,8 +533,8 @@ class Game:
                 {
                     "id": card.card_id,
                     "letters": card.letters,
-                    "used_by": next((p.name for p in self.players if p.player_id == card.used_by_player_id), "Unknown"),
-                    "questioned": next((p.name for p in self.players if p.player_id == card.questioned_player_id), "Unknown")
+                    "used_by": names.get(card.used_by_player_id, "Unknown"),
+                    "questioned": names.get(card.questioned_player_id, "Unknown")
                 }
                 for card in self.get_zero_coin_cards()
             ],
@@ -437,26 +542,115 @@ class Game:
             "round_count": self.round_count
         }
     
-    def get_player_view(self, player_id: str) -> Dict:
+    def get_deduction_engine(self, player_id: str) -> Optional[DeductionEngine]:
+        """Get a player's deduction engine, brought up to date with the history"""
+        engine = self.deduction_engines.get(player_id)
+        if engine is None:
+            if player_id not in self.players_by_id:
+                return None
+            engine = DeductionEngine.from_game(self, player_id)
+            self.deduction_engines[player_id] = engine
+        else:
+            engine.sync(self.investigation_history)
+        return engine
+    
+    def get_canonical_position(self, player_id: str) -> Optional[CanonicalPosition]:
+        """A player's deduction problem in canonical form, the key of the shared result cache"""
+        player = self.players_by_id.get(player_id)
+        if player is None:
+            return None
+        cached = self._canonical_positions.get(player_id)
+        if cached is None or cached[0] != len(self.investigation_history):
+            position = deduction_cache.canonical_position(
+                {p.player_id: len(p.suspect_cards) for p in self.players},
+                player_id, player.suspect_mask, self.investigation_history
+            )
+            cached = self._canonical_positions[player_id] = (len(self.investigation_history), position)
+        return cached[1]
+    
+    def get_candidate_masks(self, player_id: str) -> List[int]:
+        """Masks of the hidden triples still consistent with the history from a player's perspective.
+        
+        Served from the shared cache when any game has met an equivalent
+        position; the player's engine is only brought up to date on a miss.
+        """
+        position = self.get_canonical_position(player_id)
+        if position is None:
+            return []
+        return deduction_cache.shared.candidates(
+            position, lambda: self.get_deduction_engine(player_id).candidate_masks())
+    
+    def get_candidate_solutions(self, player_id: str) -> List[List[str]]:
+        """Hidden triples still consistent with the history from a player's perspective"""
+        return [mask_to_letters(mask) for mask in self.get_candidate_masks(player_id)]
+    
+    def get_suspect_probabilities(self, player_id: str) -> Optional[Dict[str, Dict[str, float]]]:
+        """Per-suspect probability of being hidden or held by each opponent (None without NumPy).
+        
+        Each call does a bounded amount of sampling, so right after a move
+        the estimate may be rough; later calls for the same position refine it.
+        """
+        if not SuspectProbabilityEstimator.available():
+            return None
+        position = self.get_canonical_position(player_id)
+        if position is None:
+            return None
+        return deduction_cache.shared.probabilities(position, lambda: self._estimate_probabilities(player_id))
+    
+    def _estimate_probabilities(self, player_id: str) -> Tuple[Optional[Dict[str, Dict[str, float]]], bool]:
+        engine = self.get_deduction_engine(player_id)
+        estimator = self.probability_estimators.get(player_id)
+        if estimator is None or estimator.engine is not engine:
+            estimator = SuspectProbabilityEstimator(engine, seed=viewer_seed(self.game_id, player_id))
+            self.probability_estimators[player_id] = estimator
+        return estimator.estimate(), estimator.final
+    
+    def get_player_view(self, player_id: str, include_probabilities: bool = False) -> Dict:
         """Get game state from a specific player's perspective"""
-        player = next((p for p in self.players if p.player_id == player_id), None)
+        player = self.players_by_id.get(player_id)
         if not player:
             return {"error": "Player not found"}
         
         state = self.get_game_state()
         state["my_cards"] = player.suspect_cards
-        state["my_status"] = player.status.value
-        state["is_my_turn"] = (
-            self.get_current_investigator() and 
-            self.get_current_investigator().player_id == player_id
-        )
+        state.update(self._private_fields(player, state["players"]))
+        
+        if include_probabilities:
+            state["probabilities"] = self.get_suspect_probabilities(player_id)
+        
+        return state
+    
+    def get_player_update(self, player_id: str, since_version: Optional[int] = None) -> Dict:
+        """Delta since the version a player already holds, or a full view if that is unavailable"""
+        player = self.players_by_id.get(player_id)
+        delta = self.get_state_delta(since_version) if player and since_version else None
+        if delta is None:
+            return self.get_player_view(player_id)
+        
+        delta["private"] = self._private_fields(player, self._current_public_state()["players"])
+        return delta
+
+    def get_private_fields(self, player_id: str) -> Dict:
+        """A player's private fields at the current version (empty for unknown players)"""
+        player = self.players_by_id.get(player_id)
+        if not player:
+            return {}
+        return self._private_fields(player, self._current_public_state()["players"])
+
+    def _private_fields(self, player: Player, public_players: List[Dict]) -> Dict:
+        """Per-player fields overlaid on the shared public state (except my_cards)"""
+        current = self.get_current_investigator()
+        fields = {
+            "my_status": player.status.value,
+            "is_my_turn": bool(current and current.player_id == player.player_id)
+        }
         
         # Add questionable players (for investigation)
-        if state["is_my_turn"]:
-            state["can_question"] = [
-                {"id": p.player_id, "name": p.name}
-                for p in self.players
-                if p.player_id != player_id and p.status == PlayerStatus.ACTIVE
+        if fields["is_my_turn"]:
+            fields["can_question"] = [
+                {"id": p["id"], "name": p["name"]}
+                for p in public_players
+                if p["id"] != player.player_id and p["status"] == PlayerStatus.ACTIVE.value
             ]
         
-        return state
\ No newline at end of file
+        return fields
@@ -0,0 +1,99 @@
+"""Finding a lobby without a game ID: the open-game index and the quick-match queue.
+
+OpenGames keeps every listed lobby (a WAITING game with at least one free
+seat) in a bucket per number of free seats. Buckets are insertion-ordered
+dicts, so moving a lobby between buckets on a join or a leave, dropping it
+when it starts or is evicted, and finding the fullest lobby (the first
+non-empty bucket, oldest lobby first) are all O(1): there are only
+MAX_PLAYERS buckets.
+
+MatchQueue holds the players who asked for a quick match while no lobby
+was open, in an insertion-ordered dict keyed by connection, so cancelling
+(on disconnect) is O(1) too and a player who queues again after
+cancelling goes to the back.
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+
+MIN_PLAYERS = 3
+MAX_PLAYERS = 8
+
+
+class OpenGames:
+    """Listed WAITING games with free seats, fullest first"""
+
+    def __init__(self, max_players: int = MAX_PLAYERS):
+        # _buckets[n]: game ids with n free seats, oldest first (dicts as ordered sets)
+        self._buckets: List[Dict[str, None]] = [{} for _ in range(max_players + 1)]
+        self._free: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._free)
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self._free
+
+    def update(self, game_id: str, free_seats: int) -> None:
+        """Record a lobby's free seats; a full lobby leaves the index until a seat frees up"""
+        with self._lock:
+            previous = self._free.pop(game_id, None)
+            if previous is not None:
+                del self._buckets[previous][game_id]
+            if 0 < free_seats < len(self._buckets):
+                self._buckets[free_seats][game_id] = None
+                self._free[game_id] = free_seats
+
+    def remove(self, game_id: str) -> None:
+        """Drop a game that started, was evicted or is no longer listed"""
+        self.update(game_id, 0)
+
+    def free_seats(self, game_id: str) -> int:
+        """Free seats of a listed lobby (0 if it is not in the index)"""
+        return self._free.get(game_id, 0)
+
+    def fullest(self) -> Optional[str]:
+        """The open lobby with the fewest free seats (the oldest among equals), if any"""
+        with self._lock:
+            for bucket in self._buckets[1:]:
+                if bucket:
+                    return next(iter(bucket))
+        return None
+
+    def counts(self) -> Dict[int, int]:
+        """Number of open lobbies by free seats"""
+        with self._lock:
+            return {free: len(bucket) for free, bucket in enumerate(self._buckets) if free}
+
+
+class MatchQueue:
+    """Players waiting for a quick match, first come first served"""
+
+    def __init__(self):
+        self._waiting: Dict[str, str] = {}  # sid -> player name, longest waiting first
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._waiting)
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._waiting
+
+    def push(self, sid: str, player_name: str) -> int:
+        """Queue a player (with a new name, keeping their place, if already queued); returns how many are waiting"""
+        with self._lock:
+            self._waiting[sid] = player_name
+            return len(self._waiting)
+
+    def cancel(self, sid: str) -> bool:
+        with self._lock:
+            return self._waiting.pop(sid, None) is not None
+
+    def pop(self, count: int) -> List[Tuple[str, str]]:
+        """Take up to count waiting players, longest waiting first"""
+        taken = []
+        with self._lock:
+            while self._waiting and len(taken) < count:
+                sid = next(iter(self._waiting))
+                taken.append((sid, self._waiting.pop(sid)))
+        return taken
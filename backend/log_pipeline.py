@@ -0,0 +1,221 @@
+"""Non-blocking structured logging.
+
+Request threads only filter a record and put it on a bounded queue; a
+background QueueListener formats it as one JSON object per line and does
+the I/O. Each category (logger name prefix such as "engineio" or "app")
+has its own level and sample rate, both changeable at runtime, so the
+chatty engine.io packet log can be kept at 1% instead of all or nothing.
+
+    {"ts": 1760000000.123, "level": "INFO", "category": "app",
+     "event": "Game created", "game_id": "AB12CD34", "player_name": "Ada"}
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+from typing import Dict, Optional, TextIO, Union
+
+DEFAULT_QUEUE_SIZE = 10000
+
+# Attributes every LogRecord has; anything else came from extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sample_rate"}
+
+
+def parse_level(level) -> int:
+    """A level name such as "warning" or a level number; ValueError if logging has no such level"""
+    if isinstance(level, int) and not isinstance(level, bool):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):  # getLevelName answers "Level X" for unknown names
+        raise ValueError(f"Unknown log level: {level!r}")
+    return value
+
+
+def parse_rate(rate) -> float:
+    """A sample rate as a float; ValueError (or TypeError) unless it is a number"""
+    value = float(rate)
+    if value != value:
+        raise ValueError(f"Sample rate is not a number: {rate!r}")
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: timestamp, level, category, event and extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "category": record.name,
+            "event": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if getattr(record, "sample_rate", 1.0) < 1.0:
+            entry["sample_rate"] = record.sample_rate
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a random fraction of the records of each category.
+
+    A record's category is the longest configured prefix of its logger name
+    ("engineio" covers "engineio.server"); rates are cached per logger name.
+    Kept records carry their sample_rate so counts can be re-weighted.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.rates: Dict[str, float] = dict(rates or {})
+        self._cache: Dict[str, float] = {}
+
+    def set_rate(self, category: str, rate: float) -> None:
+        self.rates[category] = min(max(rate, 0.0), 1.0)
+        self._cache = {}
+
+    def rate_for(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            for prefix in sorted(self.rates, key=len):
+                if name == prefix or name.startswith(prefix + "."):
+                    rate = self.rates[prefix]
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rate_for(record.name)
+        if rate >= 1.0:
+            return True
+        if random.random() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves all formatting to the listener thread and never blocks.
+
+    The stock prepare() formats the message on the calling thread; records
+    stay in-process here, so they can be queued untouched. When the queue is
+    full the record is dropped and counted instead of waiting.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Root logging through a sampling filter, a bounded queue and a background writer"""
+
+    def __init__(self, level: int = logging.INFO, stream: Optional[TextIO] = None,
+                 path: Optional[str] = None, sample_rates: Optional[Dict[str, float]] = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.sampler = SamplingFilter(sample_rates)
+        self.queue_handler = DeferredQueueHandler(queue.Queue(queue_size))
+        self.queue_handler.addFilter(self.sampler)
+
+        writer = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler(stream or sys.stderr)
+        writer.setFormatter(JsonFormatter())
+        self.listener = logging.handlers.QueueListener(self.queue_handler.queue, writer)
+        self._lock = threading.Lock()
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.queue_handler)
+        root.setLevel(level)
+        self.listener.start()
+        self._running = True
+        atexit.register(self.stop)
+
+    @classmethod
+    def from_config(cls, level: str = "INFO", path: Optional[str] = None, sampling: str = "") -> "LogPipeline":
+        """Build from strings such as level="INFO", sampling="engineio=0.01,socketio=0.1".
+
+        Invalid settings (from the environment) are logged and skipped
+        rather than stopping the server: the level falls back to INFO.
+        """
+        problems = []
+        try:
+            root_level = parse_level(level)
+        except ValueError as e:
+            root_level = logging.INFO
+            problems.append(str(e))
+        rates = {}
+        for item in filter(None, (part.strip() for part in sampling.split(","))):
+            category, _, rate = item.partition("=")
+            try:
+                rates[category.strip()] = parse_rate(rate)
+            except ValueError as e:
+                problems.append(f"Ignoring sample rate {item!r}: {e}")
+        pipeline = cls(level=root_level, path=path, sample_rates=rates)
+        for problem in problems:
+            logging.getLogger(__name__).warning("Invalid logging setting", extra={"error": problem})
+        return pipeline
+
+    # ----- Runtime control -----
+
+    def set_level(self, category: str, level: Union[str, int]) -> None:
+        """Change the level of a category ("root" for everything) without a restart"""
+        with self._lock:
+            logger = logging.getLogger() if category == "root" else logging.getLogger(category)
+            logger.setLevel(parse_level(level))
+
+    def set_sample_rate(self, category: str, rate: float) -> None:
+        with self._lock:
+            self.sampler.set_rate(category, rate)
+
+    def configure(self, levels: Optional[Dict[str, str]] = None,
+                  sampling: Optional[Dict[str, float]] = None) -> Dict:
+        """Apply level and sampling changes; returns the resulting settings.
+
+        Everything is checked before anything is applied: an invalid level or
+        rate raises ValueError (TypeError for a malformed request) and
+        changes nothing.
+        """
+        for settings in (levels, sampling):
+            if settings is not None and not isinstance(settings, dict):
+                raise TypeError("levels and sampling must be objects")
+        levels = {category: parse_level(level) for category, level in (levels or {}).items()}
+        rates = {category: parse_rate(rate) for category, rate in (sampling or {}).items()}
+        for category, level in levels.items():
+            self.set_level(category, level)
+        for category, rate in rates.items():
+            self.set_sample_rate(category, rate)
+        return self.settings()
+
+    def settings(self) -> Dict:
+        loggers = [name for name, logger in logging.root.manager.loggerDict.items()
+                   if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET]
+        return {
+            "levels": {"root": logging.getLevelName(logging.getLogger().level),
+                       **{name: logging.getLevelName(logging.getLogger(name).level) for name in sorted(loggers)}},
+            "sampling": dict(self.sampler.rates),
+            "queued": self.queue_handler.queue.qsize(),
+            "dropped": self.queue_handler.dropped,
+        }
+
+    def stop(self) -> None:
+        """Flush everything queued so far and stop the writer thread"""
+        with self._lock:
+            if self._running:
+                self._running = False
+                self.listener.stop()
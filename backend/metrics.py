@@ -0,0 +1,206 @@
+"""Minimal Prometheus-style metrics rendered in the text exposition format (0.0.4).
+
+Metric children are looked up once (at decoration or registration time) and
+updated with plain attribute increments: no locks and no string formatting on
+the hot path. Under heavy thread contention an increment can occasionally be
+lost, which is acceptable for monitoring. All formatting happens in
+Registry.render(), when /metrics is scraped.
+"""
+import bisect
+import functools
+import json
+import math
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        """The child for one combination of label values (created on first use)"""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}",
+                *self._samples()]
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self) -> Iterable[str]:
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Gauge(Counter):
+    """A value that goes up and down, or is computed by a function at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Callable[[], Dict[Tuple[str, ...], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+    def _samples(self) -> Iterable[str]:
+        if self.function is None:
+            yield from super()._samples()
+            return
+        for values, value in self.function().items():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # The last slot is the +Inf bucket
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.bounds)
+
+    def _samples(self) -> Iterable[str]:
+        for values, child in list(self._children.items()):
+            counts = list(child.counts)
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+def timed(child: _HistogramChild) -> Callable:
+    """Decorator observing the wall time of every call in a histogram child"""
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                child.observe(perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+class PacketJSON:
+    """json module for Socket.IO packets that counts emits and encoded bytes per event.
+
+    python-socketio encodes an emit once however many clients receive it, so
+    each dumps() of an event packet is one emit.
+    """
+
+    def __init__(self, emits: Counter, emitted_bytes: Counter):
+        self.emits = emits
+        self.emitted_bytes = emitted_bytes
+
+    def dumps(self, obj, *args, **kwargs) -> str:
+        encoded = json.dumps(obj, *args, **kwargs)
+        if type(obj) is list and obj and type(obj[0]) is str:
+            self.emits.labels(obj[0]).inc()
+            self.emitted_bytes.labels(obj[0]).inc(len(encoded))
+        return encoded
+
+    @staticmethod
+    def loads(*args, **kwargs):
+        return json.loads(*args, **kwargs)
+
+    def packet_class(self, base: type) -> type:
+        """Subclass of a Socket.IO packet class whose binary attachments count as emitted bytes.
+
+        A binary payload (a msgpack state) leaves only a placeholder in the
+        packet dumps() sees; the attachments follow it as separate frames.
+        """
+        emitted_bytes = self.emitted_bytes
+
+        class CountedPacket(base):
+            def encode(self):
+                encoded = super().encode()
+                if type(encoded) is list and type(self.data) is list and self.data and type(self.data[0]) is str:
+                    emitted_bytes.labels(self.data[0]).inc(sum(len(attachment) for attachment in encoded[1:]))
+                return encoded
+
+        return CountedPacket
@@ -0,0 +1,119 @@
+"""Coalesced state pushes for one move.
+
+A move reaches the players of a game as:
+
+- one room broadcast: the public delta since the version before the move,
+  with the move's outcome events (investigation_result, player_eliminated,
+  game_won, game_ended) attached and is_my_turn reset to False, since the
+  turn always passes and clients drop can_question with it, and
+- a private envelope, a delta without public changes, for each player
+  whose private fields differ from what the broadcast leaves them with.
+  That is usually only the next investigator.
+
+The servers keep the private fields each client holds in its session (see
+held_private), so envelopes are only sent when something really changed.
+"""
+from typing import Dict, List, Optional
+
+from game_logic import Game, GameStatus
+
+PRIVATE_KEYS = ("my_status", "is_my_turn", "can_question")
+TURN_PASSED = {"is_my_turn": False}
+
+
+def base_version(game: Game) -> int:
+    """The version clients hold before a move; its public state is built so the move can be diffed"""
+    return game.get_game_state()["version"]
+
+
+def move_update(game: Game, since_version: int, events: List[Dict]) -> Dict:
+    """The room broadcast for a move applied on top of since_version"""
+    update = game.get_state_delta(since_version)
+    update["private"] = dict(TURN_PASSED)
+    update["events"] = events
+    return update
+
+
+def held_private(held: Optional[Dict], payload: Dict) -> Dict:
+    """The private fields a client holds after applying payload (mirrors stateDelta.js)"""
+    if payload.get("delta"):
+        fields = dict(held or {})
+        fields.update(payload.get("private", {}))
+    else:
+        fields = {key: payload[key] for key in PRIVATE_KEYS if key in payload}
+    if not fields.get("is_my_turn"):
+        fields.pop("can_question", None)
+    return fields
+
+
+def private_envelope(game: Game, player_id: str, held: Dict) -> Optional[Dict]:
+    """A private-only update for a player whose fields differ from those held, else None"""
+    fields = game.get_private_fields(player_id)
+    if not fields or fields == held:
+        return None
+    version = game.state_version
+    return {
+        "game_id": game.game_id,
+        "delta": True,
+        "base_version": version,
+        "version": version,
+        "changes": {},
+        "private": fields
+    }
+
+
+# ----- Outcome events carried by the broadcast -----
+
+def investigation_events(game: Game, result: Dict) -> List[Dict]:
+    investigation = result["result"]
+    events = [{"event": "investigation_result", "data": {
+        "result": {
+            "investigator_id": investigation.investigator_id,
+            "investigator_name": game.player_names[investigation.investigator_id],
+            "questioned_player_id": investigation.questioned_player_id,
+            "questioned_player_name": game.player_names[investigation.questioned_player_id],
+            "card_letters": investigation.card_letters,
+            "coins_taken": investigation.coins_taken
+        },
+        "double_result": {
+            "card_letters": result["double_result"].card_letters,
+            "coins_taken": result["double_result"].coins_taken
+        } if result.get("double_result") else None
+    }}]
+    if result.get("game_ended"):
+        events.append(game_ended_event(game, "conditions_met"))
+    return events
+
+
+def guess_events(game: Game, player_id: str, guessed_suspects: List[str], result: Dict) -> List[Dict]:
+    player_name = game.player_names[player_id]
+    if result["correct"]:
+        return [{"event": "game_won", "data": {
+            "winner_id": player_id,
+            "winner_name": player_name,
+            "solution": result["solution"]
+        }}]
+    events = [{"event": "player_eliminated", "data": {
+        "player_id": player_id,
+        "player_name": player_name,
+        "wrong_guess": guessed_suspects
+    }}]
+    if game.game_status == GameStatus.ENDED:
+        events.append(game_ended_event(game, "all_eliminated"))
+    return events
+
+
+def forfeit_events(game: Game, player_id: str) -> List[Dict]:
+    events = [{"event": "player_eliminated", "data": {
+        "player_id": player_id,
+        "player_name": game.player_names[player_id],
+        "forfeited": True
+    }}]
+    if game.game_status == GameStatus.ENDED:
+        events.append(game_ended_event(game, "all_eliminated"))
+    return events
+
+
+def game_ended_event(game: Game, reason: str) -> Dict:
+    # The final state itself is the delta the event travels with
+    return {"event": "game_ended", "data": {"reason": reason, "solution": game.hidden_suspects}}
@@ -0,0 +1,332 @@
+import json
+import logging
+import os
+import random
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, Iterator, List, Optional
+
+from game_logic import (
+    Game, GameStatus, InvestigationCard, InvestigationResult, Player, PlayerStatus
+)
+from suspects import letters_to_mask
+import decks
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "snapshot.json"
+EVENTS_DIR = "events"
+ARCHIVE_DIR = "archive"
+
+
+# ----- Game (de)serialization -----
+
+def _rng_state_to_json(state) -> List:
+    version, internal, gauss_next = state
+    return [version, list(internal), gauss_next]
+
+
+def _rng_state_from_json(data) -> tuple:
+    version, internal, gauss_next = data
+    return version, tuple(internal), gauss_next
+
+
+def snapshot_game(game: Game) -> Dict:
+    """Compact, JSON-serializable copy of everything needed to rebuild a Game"""
+    return {
+        "game_id": game.game_id,
+        "rng_state": _rng_state_to_json(game.rng.getstate()),
+        "players": [
+            {
+                "id": p.player_id,
+                "name": p.name,
+                "cards": p.suspect_cards,
+                "status": p.status.value,
+                "has_been_investigator": p.has_been_investigator
+            }
+            for p in game.players
+        ],
+        "hidden_suspects": game.hidden_suspects,
+        "deck": game.deck.name,
+        "decks": [
+            [
+                [card.card_id, card.letters, card.has_been_used, card.coins_when_used,
+                 card.used_by_player_id, card.questioned_player_id]
+                for card in deck
+            ]
+            for deck in game.investigation_decks
+        ],
+        "face_up": [
+            game.investigation_decks[i].index(card) if card else None
+            for i, card in enumerate(game.face_up_cards)
+        ],
+        "used_cards": [card.card_id for card in game.used_investigation_cards],
+        "central_coins": game.central_coins,
+        "history": [
+            [r.round_number, r.investigator_id, r.questioned_player_id, r.card_letters,
+             r.coins_taken, r.is_double_investigation]
+            for r in game.investigation_history
+        ],
+        "current_investigator_index": game.current_investigator_index,
+        "round_count": game.round_count,
+        "total_investigations": game.total_investigations,
+        "double_investigation_enabled": game.double_investigation_enabled,
+        "status": game.game_status.value,
+        "players_been_investigator": sorted(game.players_been_investigator),
+        "state_version": game.state_version
+    }
+
+
+def restore_game(data: Dict) -> Game:
+    """Rebuild a Game from snapshot_game() output"""
+    rng = random.Random()
+    rng.setstate(_rng_state_from_json(data["rng_state"]))
+    game = Game(data["game_id"], rng=rng)
+
+    for p in data["players"]:
+        player = Player(player_id=p["id"], name=p["name"],
+                        has_been_investigator=p["has_been_investigator"],
+                        status=PlayerStatus(p["status"]))
+        player.set_suspect_cards(p["cards"])
+        game.players.append(player)
+    game._index_players()
+    game.hidden_suspects = data["hidden_suspects"]
+    game.hidden_mask = letters_to_mask(game.hidden_suspects)
+    game.deck = decks.variant(data.get("deck"))
+
+    cards_by_id = {}
+    for deck_index, deck in enumerate(data["decks"]):
+        game.investigation_decks[deck_index] = []
+        for card_id, letters, used, coins, used_by, questioned in deck:
+            card = InvestigationCard(card_id=card_id, letters=letters, deck_index=deck_index,
+                                     has_been_used=used, coins_when_used=coins,
+                                     used_by_player_id=used_by, questioned_player_id=questioned)
+            game.investigation_decks[deck_index].append(card)
+            cards_by_id[card_id] = card
+    game.investigation_cards = [card for deck in game.investigation_decks for card in deck]
+    game.face_up_cards = [
+        game.investigation_decks[i][position] if position is not None else None
+        for i, position in enumerate(data["face_up"])
+    ]
+    game.used_investigation_cards = [cards_by_id[card_id] for card_id in data["used_cards"]]
+
+    game.central_coins = data["central_coins"]
+    game.investigation_history = [
+        InvestigationResult(round_number=r[0], investigator_id=r[1], questioned_player_id=r[2],
+                            card_letters=r[3], coins_taken=r[4], is_double_investigation=r[5])
+        for r in data["history"]
+    ]
+    game.current_investigator_index = data["current_investigator_index"]
+    game.round_count = data["round_count"]
+    game.total_investigations = data["total_investigations"]
+    game.double_investigation_enabled = data["double_investigation_enabled"]
+    game.game_status = GameStatus(data["status"])
+    game.players_been_investigator = set(data["players_been_investigator"])
+    game.state_version = data["state_version"]
+    return game
+
+
+def apply_event(game: Game, event: Dict) -> Dict:
+    """Re-apply one logged move to a game; returns the Game method's result"""
+    if event["type"] == "setup":
+        game.rng.setstate(_rng_state_from_json(event["rng_state"]))
+        game.setup_game(event["players"], deck=event.get("deck"))
+        return {"success": True}
+    if event["type"] == "investigate":
+        return game.investigate(
+            investigator_id=event["investigator_id"],
+            questioned_player_id=event["questioned_player_id"],
+            card_index=event["card_index"],
+            double_card_id=event.get("double_card_id")
+        )
+    if event["type"] == "guess":
+        return game.make_guess(event["player_id"], event["suspects"])
+    if event["type"] == "forfeit":
+        return game.forfeit(event["player_id"])
+    raise ValueError(f"Unknown event type: {event['type']}")
+
+
+# ----- On-disk store -----
+
+class GameStore:
+    """Append-only per-game event logs plus periodic snapshots of all live games.
+
+    Every accepted setup_game, investigate, make_guess and forfeit is appended to
+    events/<game_id>.jsonl together with the state version it produced. The
+    setup event carries the RNG state used for the deal, so replaying a log
+    reproduces the game exactly, and the human players' resume tokens, so
+    their seats can be taken back after a restart. write_snapshot() stores a compact copy of
+    every registered game; at startup load() restores the snapshot and only
+    replays the log entries newer than each game's snapshot version. Logs of
+    finished games are moved to archive/ so they are not reloaded.
+    """
+
+    def __init__(self, data_dir: str, fsync: bool = False):
+        self.data_dir = data_dir
+        self.fsync = fsync
+        self.events_dir = os.path.join(data_dir, EVENTS_DIR)
+        self.archive_dir = os.path.join(data_dir, ARCHIVE_DIR)
+        os.makedirs(self.events_dir, exist_ok=True)
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+    def _log_path(self, game_id: str) -> str:
+        return os.path.join(self.events_dir, f"{game_id}.jsonl")
+
+    def _append(self, game_id: str, event: Dict) -> None:
+        line = json.dumps(event, separators=(",", ":")) + "\n"
+        with open(self._log_path(game_id), "a", encoding="utf-8") as log:
+            log.write(line)
+            if self.fsync:
+                log.flush()
+                os.fsync(log.fileno())
+
+    # ----- Recording -----
+
+    def record_setup(self, game: Game, lobby_players: List[Dict], host: str, rng_state,
+                     resume_tokens: Optional[Dict[str, str]] = None) -> None:
+        """Record a game start; rng_state is game.rng.getstate() from just before setup_game.
+
+        resume_tokens maps each human player to the token their seat is resumed with,
+        so the seats can be taken back after a restart.
+        """
+        self._append(game.game_id, {
+            "type": "setup",
+            "version": game.state_version,
+            "players": [
+                {"id": p["id"], "name": p["name"], **({"bot": p["bot"]} if p.get("bot") else {})}
+                for p in lobby_players
+            ],
+            "deck": game.deck.name,
+            "host": host,
+            "resume_tokens": dict(resume_tokens or {}),
+            "rng_state": _rng_state_to_json(rng_state)
+        })
+
+    def record_investigate(self, game: Game, investigator_id: str, questioned_player_id: str,
+                           card_index: int, double_card_id: Optional[str]) -> None:
+        self._append(game.game_id, {
+            "type": "investigate",
+            "version": game.state_version,
+            "investigator_id": investigator_id,
+            "questioned_player_id": questioned_player_id,
+            "card_index": card_index,
+            "double_card_id": double_card_id
+        })
+
+    def record_guess(self, game: Game, player_id: str, suspects: List[str]) -> None:
+        self._append(game.game_id, {
+            "type": "guess",
+            "version": game.state_version,
+            "player_id": player_id,
+            "suspects": list(suspects)
+        })
+
+    def record_forfeit(self, game: Game, player_id: str) -> None:
+        self._append(game.game_id, {
+            "type": "forfeit",
+            "version": game.state_version,
+            "player_id": player_id
+        })
+
+    def archive(self, game_id: str) -> None:
+        """Move a finished game's log out of the set reloaded at startup"""
+        source = self._log_path(game_id)
+        if os.path.exists(source):
+            os.replace(source, os.path.join(self.archive_dir, f"{game_id}.jsonl"))
+
+    # ----- Reading -----
+
+    def archived_game_ids(self) -> List[str]:
+        """Ids of every finished game whose log has been archived"""
+        return sorted(
+            filename[:-len(".jsonl")] for filename in os.listdir(self.archive_dir)
+            if filename.endswith(".jsonl")
+        )
+
+    def read_events(self, game_id: str) -> Iterator[Dict]:
+        """Yield a game's logged events, from the live or the archived log"""
+        path = self._log_path(game_id)
+        if not os.path.exists(path):
+            path = os.path.join(self.archive_dir, f"{game_id}.jsonl")
+        with open(path, encoding="utf-8") as log:
+            for line in log:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+    def write_snapshot(self, games: Dict[str, Dict],
+                       lock_for: Optional[Callable[[str], ContextManager]] = None) -> int:
+        """Atomically replace the snapshot with every started, unfinished game; returns the count.
+
+        lock_for(game_id), if given, returns the lock held while that game is copied.
+        """
+        entries = []
+        for game_id, game_data in list(games.items()):
+            with lock_for(game_id) if lock_for else nullcontext():
+                game = game_data['game']
+                if game.game_status != GameStatus.ACTIVE:
+                    continue
+                entries.append({
+                    "players": list(game_data['players']),
+                    "host": game_data['host'],
+                    "resume_tokens": game_data.get('resume_tokens', {}),
+                    "game": snapshot_game(game)
+                })
+
+        path = os.path.join(self.data_dir, SNAPSHOT_FILE)
+        temporary = path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as snapshot:
+            json.dump({"games": entries}, snapshot, separators=(",", ":"))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temporary, path)
+        return len(entries)
+
+    def load(self) -> Dict[str, Dict]:
+        """Rebuild the games registry from the snapshot plus the newer log entries"""
+        games: Dict[str, Dict] = {}
+
+        path = os.path.join(self.data_dir, SNAPSHOT_FILE)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as snapshot:
+                for entry in json.load(snapshot)["games"]:
+                    if not os.path.exists(self._log_path(entry["game"]["game_id"])):
+                        continue  # Finished (and archived) since the snapshot was taken
+                    game = restore_game(entry["game"])
+                    games[game.game_id] = {
+                        'game': game, 'players': entry["players"], 'host': entry["host"],
+                        'resume_tokens': entry.get("resume_tokens", {})
+                    }
+
+        for filename in os.listdir(self.events_dir):
+            if not filename.endswith(".jsonl"):
+                continue
+            game_id = filename[:-len(".jsonl")]
+            try:
+                self._replay_tail(game_id, games)
+            except (ValueError, KeyError) as e:
+                logger.error("Could not restore game", extra={"game_id": game_id, "error": str(e)})
+                games.pop(game_id, None)
+
+        return {
+            game_id: game_data for game_id, game_data in games.items()
+            if game_data['game'].game_status == GameStatus.ACTIVE
+        }
+
+    def _replay_tail(self, game_id: str, games: Dict[str, Dict]) -> None:
+        game_data = games.get(game_id)
+        for event in self.read_events(game_id):
+            if game_data is None:
+                if event["type"] != "setup":
+                    raise ValueError("log does not start with a setup event")
+                game_data = {
+                    'game': Game(game_id),
+                    'players': event["players"],
+                    'host': event["host"],
+                    'resume_tokens': event.get("resume_tokens", {})
+                }
+                games[game_id] = game_data
+            elif event["version"] <= game_data['game'].state_version:
+                continue  # Already contained in the snapshot
+            result = apply_event(game_data['game'], event)
+            if 'error' in result:
+                raise ValueError(f"replayed move rejected: {result['error']}")
@@ -0,0 +1,312 @@
+import time
+import zlib
+from itertools import islice
+from typing import Dict, Iterator, Optional
+
+from deduction import HIDDEN, DeductionEngine
+from suspects import SUSPECTS, iter_bits
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; without it probabilities are simply not reported
+    np = None
+
+DEFAULT_CHAINS = 256
+DEFAULT_STEPS = 16  # Steps walked per estimate() call, settling chains included
+FINAL_STEPS = 64  # Steps tallied on settled chains before an estimate is final
+EXACT_DEALS = 128  # Positions with at most this many consistent deals are enumerated, not sampled
+BURN_IN_STEPS = 64  # Steps walked after (re)seeding before any deal is tallied...
+MIXING_WINDOW = 256  # ...then windows of this many until the chains agree...
+MAX_BURN_IN_STEPS = 1024  # ...or this many steps are walked
+MIXED_RHAT = 1.2
+MIN_SURVIVORS = 0.125  # Share of chains a new constraint must leave valid to restart the rest from them
+RESAMPLE_STEPS = 16
+
+
+def _popcount_table():
+    table = np.zeros(1 << 14, dtype=np.uint8)
+    for i in range(1, 1 << 14):
+        table[i] = table[i >> 1] + (i & 1)
+    return table
+
+
+def _popcount(values):
+    """Vectorised popcount for non-negative masks of up to 28 bits"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    global _POPCOUNT_TABLE
+    if _POPCOUNT_TABLE is None:
+        _POPCOUNT_TABLE = _popcount_table()
+    return _POPCOUNT_TABLE[values & 0x3FFF] + _POPCOUNT_TABLE[values >> 14]
+
+
+_POPCOUNT_TABLE = None
+
+
+def viewer_seed(game_id: str, viewer_id: str) -> int:
+    """A stable seed per game and viewer, so a viewer's estimates are reproducible"""
+    return zlib.crc32(f"{game_id}/{viewer_id}".encode())
+
+
+class SuspectProbabilityEstimator:
+    """Estimates, for one viewer, who holds each suspect they cannot see.
+
+    Marginals are taken over the deals consistent with the viewer's
+    DeductionEngine, every deal counting once. Small positions (at most
+    EXACT_DEALS deals) are enumerated with the engine's search, which gives
+    the exact marginals and exact uniform samples.
+
+    Larger positions are sampled by a batch of Markov chains: each step
+    proposes, for every chain at once, swapping the owners of two letters
+    (or of two pairs, which keeps a hand's counts on cards sharing a letter)
+    and keeps the swaps that still satisfy all constraints. The proposals
+    are symmetric, so the chains sample consistent deals uniformly once
+    they have forgotten their seeds, the engine's witness deals (one per
+    candidate triple, so seeds alone would weight triples equally whatever
+    their number of completions). Freshly seeded chains walk BURN_IN_STEPS
+    first, then keep walking until the Gelman-Rubin statistic of the letter
+    owners across chains falls below MIXED_RHAT (or MAX_BURN_IN_STEPS).
+    Chains persist between calls. A chain broken by a new constraint
+    restarts from a copy of one that still holds (the survivors are uniform
+    over the deals left); only when too few survive do all chains start
+    over from witnesses. Pass a seed for reproducible estimates.
+
+    estimate() runs in request handlers, so one call walks at most `steps`
+    steps: settling chains (burn-in or resampling) take them first, across
+    as many calls as it needs, and the rest are tallied. Tallies add up
+    over calls until the constraints change, and the estimate is final once
+    FINAL_STEPS steps have been tallied on settled chains.
+    """
+
+    def __init__(self, engine: DeductionEngine, chains: int = DEFAULT_CHAINS,
+                 steps: int = DEFAULT_STEPS, seed: Optional[int] = None):
+        self.engine = engine
+        self.chains = chains
+        self.steps = steps
+        self.rng = np.random.default_rng(seed)
+
+        self.letter_bits = np.array(list(iter_bits(engine.unknown_mask)), dtype=np.int64)
+        self.letters = [SUSPECTS[int(bit).bit_length() - 1] for bit in self.letter_bits]
+        self.slot_ids = np.arange(len(engine.owner_ids))
+
+        self._constraints_seen = -1
+        self._slots = self._masks = self._coins = self._exact = None
+        self._deals = None  # (deals, slots) every consistent deal, when there are few enough
+        self._owner = None  # (chains, letters) owner slot of every unknown letter
+        self._hands = None  # (chains, slots) hand mask per owner slot
+        self._settling: Optional[Iterator[None]] = None  # Burn-in or resampling still to walk, a step per item
+        self._tally = None  # (slots, letters) owner counts over the steps tallied since the last change
+        self.tallied = 0
+        self.mixed = True  # False if the last burn-in hit MAX_BURN_IN_STEPS before the chains agreed
+
+    @staticmethod
+    def available() -> bool:
+        return np is not None
+
+    @property
+    def final(self) -> bool:
+        """Whether the last estimate was exact or tallied FINAL_STEPS steps on settled chains"""
+        return self._deals is not None or (self._settling is None and self.tallied >= FINAL_STEPS)
+
+    def estimate(self) -> Optional[Dict[str, Dict[str, float]]]:
+        """Marginal probability of each unseen suspect being hidden or held by each opponent"""
+        candidates = self.engine.candidate_masks()
+        if not candidates:
+            return None
+        self._refresh(candidates)
+
+        if self._deals is not None:
+            shares = self._owner_counts(self._owners_of(self._deals)) / float(len(self._deals))
+        else:
+            rows = np.arange(self.chains)
+            for _ in range(self.steps - self._settle(self.steps)):
+                self._step(rows)
+                self._tally += self._owner_counts(self._owner)
+                self.tallied += 1
+            if self.tallied:
+                shares = self._tally / float(self.chains * self.tallied)
+            else:  # Still settling: the best guess is where the chains stand
+                shares = self._owner_counts(self._owner) / float(self.chains)
+
+        keys = ["hidden" if slot == HIDDEN else pid for slot, pid in enumerate(self.engine.owner_ids)]
+        return {
+            letter: {key: round(float(shares[slot, i]), 4) for slot, key in enumerate(keys)}
+            for i, letter in enumerate(self.letters)
+        }
+
+    def sample_deals(self, steps: Optional[int] = None, deadline: Optional[float] = None):
+        """Hand masks of consistent deals, chains * steps rows: (samples, owner slots).
+
+        None if there are none, or if the chains are still settling when
+        the deadline (time.monotonic()) passes; a later call carries on.
+        """
+        candidates = self.engine.candidate_masks()
+        if not candidates:
+            return None
+        self._refresh(candidates)
+
+        steps = steps or self.steps
+        if self._deals is not None:
+            return self._deals[self.rng.integers(0, len(self._deals), self.chains * steps)]
+        self._settle(None, deadline)
+        if self._settling is not None:
+            return None
+        rows = np.arange(self.chains)
+        samples = []
+        for _ in range(steps):
+            self._step(rows)
+            samples.append(self._hands.copy())
+        return np.concatenate(samples)
+
+    def _refresh(self, candidates) -> None:
+        """Pick up new constraints: enumerate small positions, reseed broken chains and restart the tally"""
+        constraint_count = sum(len(c) for c in self.engine.constraints)
+        if constraint_count == self._constraints_seen:
+            return
+        self._constraints_seen = constraint_count
+        self._tally = np.zeros((len(self.slot_ids), len(self.letter_bits)), dtype=np.int64)
+        self.tallied = 0
+
+        flat = [c for per_owner in self.engine.constraints for c in per_owner]
+        self._slots = np.array([c.owner for c in flat], dtype=np.int64)
+        self._masks = np.array([c.mask for c in flat], dtype=np.int64)
+        self._coins = np.array([c.coins for c in flat], dtype=np.int64)
+        self._exact = np.array([c.exact for c in flat], dtype=bool)
+
+        # Constraints only ever remove deals, so a position small enough stays enumerated
+        if self._deals is not None:
+            self._deals = self._deals[self._valid(self._deals)]
+            return
+        if len(candidates) <= EXACT_DEALS:  # Every candidate triple has at least one deal
+            deals = list(islice(self.engine.iter_deals(), EXACT_DEALS + 1))
+            if len(deals) <= EXACT_DEALS:
+                self._deals = np.array(deals, dtype=np.int64).reshape(len(deals), len(self.slot_ids))
+                self._owner = self._hands = self._settling = None
+                return
+
+        rows = np.arange(self.chains)
+        if self._owner is not None:
+            # Mixed chains that satisfy the new constraints are uniform over the deals that
+            # still do: broken chains restart from copies of them and soon drift apart
+            valid = np.flatnonzero(self._valid(self._hands))
+            if len(valid) == self.chains:
+                return
+            if len(valid) >= self.chains * MIN_SURVIVORS:
+                broken = np.setdiff1d(rows, valid)
+                picks = self.rng.choice(valid, len(broken))
+                self._owner[broken] = self._owner[picks]
+                self._hands[broken] = self._hands[picks]
+                if self._settling is None:  # A burn-in under way just carries on
+                    self._settling = self._resample()
+                return
+
+        # Too few survivors: start over from the engine's witness deals
+        seeds_hands = np.array(
+            [self.engine.slot_witness(triple) for triple in candidates], dtype=np.int64
+        )
+        picks = self.rng.integers(0, len(seeds_hands), self.chains)
+        self._owner = self._owners_of(seeds_hands)[picks]
+        self._hands = seeds_hands[picks]
+        self._settling = self._burn_in()
+
+    def _settle(self, budget: Optional[int], deadline: Optional[float] = None) -> int:
+        """Walk settling chains for at most budget steps (None: until settled) or until the deadline.
+
+        Returns the number of steps walked.
+        """
+        walked = 0
+        while self._settling is not None and (budget is None or walked < budget):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            try:
+                next(self._settling)
+                walked += 1
+            except StopIteration:
+                self._settling = None
+        return walked
+
+    def _burn_in(self) -> Iterator[None]:
+        """Walk the chains until they agree on who holds each letter (or MAX_BURN_IN_STEPS)"""
+        rows = np.arange(self.chains)
+        for _ in range(BURN_IN_STEPS):
+            self._step(rows)
+            yield
+        walked = BURN_IN_STEPS
+        self.mixed = False
+        while not self.mixed and walked < MAX_BURN_IN_STEPS:
+            held = np.zeros((self.chains, len(self.slot_ids), len(self.letter_bits)))
+            for _ in range(MIXING_WINDOW):
+                self._step(rows)
+                held += self._owner[:, None, :] == self.slot_ids[None, :, None]
+                yield
+            self.mixed = self._rhat(held, MIXING_WINDOW) < MIXED_RHAT
+            walked += MIXING_WINDOW
+
+    def _resample(self) -> Iterator[None]:
+        """Let chains restarted from copies of the survivors drift apart"""
+        rows = np.arange(self.chains)
+        for _ in range(RESAMPLE_STEPS):
+            self._step(rows)
+            yield
+
+    def _rhat(self, held, window: int) -> float:
+        """Largest Gelman-Rubin statistic of the letter owners, from how often each chain held each.
+
+        Near 1 when the chains vary as much within themselves as between
+        them; infinite when some letter never moves in any chain but sits
+        with different owners in different chains.
+        """
+        means = held / window
+        within = (means * (1 - means)).mean(axis=0) * window / (window - 1)
+        between = means.var(axis=0, ddof=1) * window
+        varies = within > 0
+        if (between[~varies] > 0).any():
+            return float("inf")
+        if not varies.any():
+            return 1.0
+        pooled = within * (window - 1) / window + between / window
+        return float(np.sqrt(pooled[varies] / within[varies]).max())
+
+    def _owners_of(self, hands):
+        """(deals, letters) owner slot of every unknown letter, from (deals, slots) hand masks"""
+        holds = (hands[:, :, None] & self.letter_bits[None, None, :]) != 0
+        return holds.argmax(axis=1).astype(np.int64)
+
+    def _owner_counts(self, owner):
+        """(slots, letters) number of rows in which each slot holds each letter"""
+        num_letters = len(self.letter_bits)
+        counts = np.bincount((owner * num_letters + np.arange(num_letters)).ravel(),
+                             minlength=len(self.slot_ids) * num_letters)
+        return counts.reshape(len(self.slot_ids), num_letters)
+
+    def _valid(self, hands):
+        if not len(self._slots):
+            return np.ones(len(hands), dtype=bool)
+        counts = _popcount(hands[:, self._slots] & self._masks)
+        ok = np.where(self._exact, counts == self._coins, counts >= self._coins)
+        return ok.all(axis=1)
+
+    def _step(self, rows) -> None:
+        num_letters = len(self.letter_bits)
+        first, second, third, fourth = self.rng.integers(0, num_letters, (4, self.chains))
+        single = self.rng.random(self.chains) < 0.5
+        fourth = np.where(single, third, fourth)  # Swapping a letter with itself changes nothing
+
+        owner = self._owner.copy()
+        hands = self._hands.copy()
+        self._swap(owner, hands, rows, first, second)
+        self._swap(owner, hands, rows, third, fourth)
+        accept = self._valid(hands)
+        self._owner[accept] = owner[accept]
+        self._hands[accept] = hands[accept]
+
+    def _swap(self, owner, hands, rows, first, second) -> None:
+        """Exchange the owners of two letters in every chain, in place"""
+        first_owner = owner[rows, first]
+        second_owner = owner[rows, second]
+        moved = np.where(first_owner != second_owner,
+                         self.letter_bits[first] | self.letter_bits[second], 0)
+        hands[rows, first_owner] ^= moved
+        hands[rows, second_owner] ^= moved
+        owner[rows, first] = second_owner
+        owner[rows, second] = first_owner
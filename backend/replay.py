@@ -0,0 +1,114 @@
+import bisect
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from game_logic import Game
+from persistence import GameStore, apply_event, restore_game, snapshot_game
+
+DEFAULT_CHECKPOINT_INTERVAL = 8
+
+
+class GameReplay:
+    """Random access to every intermediate state of a recorded game.
+
+    The first seek replays the whole move list once and keeps a compact
+    snapshot every checkpoint_interval moves, so any later seek restores the
+    nearest checkpoint and applies fewer than checkpoint_interval moves.
+    iter_states() streams states in order without checkpoints, for bulk
+    analysis.
+    """
+
+    def __init__(self, game_id: str, events: List[Dict],
+                 checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL):
+        if not events or events[0]["type"] != "setup":
+            raise ValueError("A recorded game must start with a setup event")
+        self.game_id = game_id
+        self.setup_event = events[0]
+        self.moves = events[1:]
+        self.checkpoint_interval = max(1, checkpoint_interval)
+
+        self._checkpoints: List[Dict] = []  # _checkpoints[i] = state after i * interval moves
+        self._rounds: List[int] = []  # round_count after each number of moves (index 0 = setup)
+
+    @classmethod
+    def from_store(cls, store: GameStore, game_id: str, **kwargs) -> "GameReplay":
+        return cls(game_id, list(store.read_events(game_id)), **kwargs)
+
+    def __len__(self) -> int:
+        """Number of moves after setup"""
+        return len(self.moves)
+
+    def _initial_game(self) -> Game:
+        game = Game(self.game_id)
+        apply_event(game, self.setup_event)
+        return game
+
+    def _apply(self, game: Game, move: Dict) -> None:
+        result = apply_event(game, move)
+        if 'error' in result:
+            raise ValueError(f"Recorded move rejected on replay: {result['error']}")
+
+    def _build_checkpoints(self) -> None:
+        if self._checkpoints:
+            return
+        game = self._initial_game()
+        self._checkpoints.append(snapshot_game(game))
+        self._rounds.append(game.round_count)
+        for number, move in enumerate(self.moves, start=1):
+            self._apply(game, move)
+            self._rounds.append(game.round_count)
+            if number % self.checkpoint_interval == 0:
+                self._checkpoints.append(snapshot_game(game))
+
+    # ----- Seeking -----
+
+    def state_after(self, move_number: int) -> Game:
+        """Fresh Game as it stood after move_number moves (0 = just after setup)"""
+        if not 0 <= move_number <= len(self.moves):
+            raise IndexError(f"Move {move_number} out of range 0..{len(self.moves)}")
+        self._build_checkpoints()
+        checkpoint = move_number // self.checkpoint_interval
+        game = restore_game(self._checkpoints[checkpoint])
+        for move in self.moves[checkpoint * self.checkpoint_interval:move_number]:
+            self._apply(game, move)
+        return game
+
+    def move_for_round(self, round_number: int) -> int:
+        """Number of moves played once round_number was reached (last move of earlier rounds)"""
+        self._build_checkpoints()
+        position = bisect.bisect_right(self._rounds, round_number) - 1
+        return max(position, 0)
+
+    def state_at_round(self, round_number: int) -> Game:
+        """Fresh Game at the start of the given round"""
+        return self.state_after(self.move_for_round(round_number))
+
+    @property
+    def final_round(self) -> int:
+        self._build_checkpoints()
+        return self._rounds[-1]
+
+    # ----- Streaming -----
+
+    def iter_states(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, Game]]:
+        """Yield (move_number, game) for each state in order.
+
+        The same Game object is advanced in place between yields; snapshot or
+        copy it if a state must outlive the next iteration.
+        """
+        stop = len(self.moves) if stop is None else min(stop, len(self.moves))
+        if self._checkpoints and start:
+            game = self.state_after(start)
+        else:
+            game = self._initial_game()
+            for move in self.moves[:start]:
+                self._apply(game, move)
+        yield start, game
+        for number in range(start, stop):
+            self._apply(game, self.moves[number])
+            yield number + 1, game
+
+
+def iter_archived_replays(store: GameStore, **kwargs) -> Iterator[GameReplay]:
+    """Stream a GameReplay for every archived (finished) game in a store"""
+    for game_id in store.archived_game_ids():
+        yield GameReplay.from_store(store, game_id, **kwargs)
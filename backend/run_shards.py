@@ -0,0 +1,55 @@
+"""Run the game server as N sharded worker processes on one host.
+
+Worker i listens on BASE_PORT + i and owns the games whose ID hashes to
+shard i. Workers share rooms and forward events through a Unix-socket
+message broker started by this script. Put a load balancer with sticky
+sessions in front of the ports.
+
+    python run_shards.py --shards 4 --base-port 5001
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from sharding import UnixSocketBroker
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, default=os.cpu_count())
+    parser.add_argument("--base-port", type=int, default=5001)
+    parser.add_argument("--socket", default="/tmp/black-vienna-bus.sock")
+    args = parser.parse_args()
+
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    broker = UnixSocketBroker(args.socket)
+    threading.Thread(target=broker.serve_forever, daemon=True).start()
+    while not os.path.exists(args.socket):
+        time.sleep(0.05)
+
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    workers = []
+    for shard in range(args.shards):
+        env = dict(
+            os.environ,
+            BLACK_VIENNA_SHARDS=str(args.shards),
+            BLACK_VIENNA_SHARD_ID=str(shard),
+            BLACK_VIENNA_BUS_URL=f"unix://{args.socket}",
+            BLACK_VIENNA_PORT=str(args.base_port + shard),
+        )
+        workers.append(subprocess.Popen([sys.executable, app_path], env=env))
+
+    try:
+        for worker in workers:
+            worker.wait()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+
+
+if __name__ == "__main__":
+    main()
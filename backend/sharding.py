@@ -0,0 +1,221 @@
+import bisect
+import hashlib
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+import socketio
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VIRTUAL_NODES = 128
+BROADCAST_CHANNEL = "socketio"
+
+
+# ----- Consistent hashing -----
+
+class HashRing:
+    """Consistent-hash ring mapping game IDs to shard numbers"""
+
+    def __init__(self, shard_count: int, virtual_nodes: int = DEFAULT_VIRTUAL_NODES):
+        self.shard_count = shard_count
+        points = []
+        for shard in range(shard_count):
+            for replica in range(virtual_nodes):
+                points.append((self._hash(f"shard-{shard}#{replica}"), shard))
+        points.sort()
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def owner(self, key: str) -> int:
+        """Shard that owns the given key"""
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._shards[index]
+
+
+# ----- Pluggable message bus -----
+
+class MessageBus:
+    """Minimal publish/subscribe interface used for routing and room broadcasts.
+
+    Messages are JSON-serializable dicts. Every subscriber of a channel sees
+    every message published on it after it subscribed, in publish order.
+    """
+
+    def publish(self, channel: str, message: Dict) -> None:
+        raise NotImplementedError
+
+    def subscribe(self, channel: str) -> Iterator[Dict]:
+        """Blocking iterator over the messages published on a channel"""
+        raise NotImplementedError
+
+
+class LocalBus(MessageBus):
+    """In-process bus, for a single process or for tests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[queue.Queue]] = {}
+
+    def publish(self, channel: str, message: Dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            subscriber.put(message)
+
+    def subscribe(self, channel: str) -> Iterator[Dict]:
+        inbox: queue.Queue = queue.Queue()
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(inbox)
+        while True:
+            yield inbox.get()
+
+
+class UnixSocketBus(MessageBus):
+    """Bus client talking to a UnixSocketBroker; a local stand-in for Redis/AMQP.
+
+    The wire format is one JSON object per line: {"op": "sub", "channel": ...}
+    or {"op": "pub", "channel": ..., "message": ...}.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._publisher: Optional[socket.socket] = None
+        self._publish_lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(self.path)
+        return connection
+
+    def publish(self, channel: str, message: Dict) -> None:
+        line = json.dumps({"op": "pub", "channel": channel, "message": message}) + "\n"
+        with self._publish_lock:
+            if self._publisher is None:
+                self._publisher = self._connect()
+            self._publisher.sendall(line.encode("utf-8"))
+
+    def subscribe(self, channel: str) -> Iterator[Dict]:
+        connection = self._connect()
+        connection.sendall((json.dumps({"op": "sub", "channel": channel}) + "\n").encode("utf-8"))
+        with connection.makefile("r", encoding="utf-8") as lines:
+            for line in lines:
+                yield json.loads(line)
+
+
+class UnixSocketBroker:
+    """Tiny fan-out broker for UnixSocketBus clients (run once per host)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[socket.socket]] = {}
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        listener.listen()
+        while True:
+            connection, _ = listener.accept()
+            threading.Thread(target=self._serve_client, args=(connection,), daemon=True).start()
+
+    def _serve_client(self, connection: socket.socket) -> None:
+        with connection.makefile("r", encoding="utf-8") as lines:
+            for line in lines:
+                request = json.loads(line)
+                if request["op"] == "sub":
+                    with self._lock:
+                        self._subscribers.setdefault(request["channel"], []).append(connection)
+                elif request["op"] == "pub":
+                    self._fan_out(request["channel"], request["message"])
+
+    def _fan_out(self, channel: str, message: Dict) -> None:
+        payload = (json.dumps(message) + "\n").encode("utf-8")
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+            for subscriber in subscribers:
+                try:
+                    subscriber.sendall(payload)
+                except OSError:
+                    self._subscribers[channel].remove(subscriber)
+
+
+BUS_BACKENDS: Dict[str, Callable[[str], MessageBus]] = {
+    "local": lambda url: LocalBus(),
+    "unix": lambda url: UnixSocketBus(urlparse(url).path),
+}
+
+
+def register_bus(scheme: str, factory: Callable[[str], MessageBus]) -> None:
+    """Plug in another bus backend for URLs starting with scheme://"""
+    BUS_BACKENDS[scheme] = factory
+
+
+def create_bus(url: str) -> MessageBus:
+    """Create a bus from a URL such as local:// or unix:///tmp/black-vienna.sock"""
+    scheme = urlparse(url).scheme
+    if scheme not in BUS_BACKENDS:
+        raise ValueError(f"Unsupported message bus: {url}")
+    return BUS_BACKENDS[scheme](url)
+
+
+# ----- Socket.IO integration -----
+
+class BusClientManager(socketio.PubSubManager):
+    """Socket.IO client manager that shares rooms and broadcasts over a MessageBus"""
+    name = "bus"
+
+    def __init__(self, bus: MessageBus, channel: str = BROADCAST_CHANNEL, **kwargs):
+        super().__init__(channel=channel, **kwargs)
+        self.bus = bus
+
+    def _publish(self, data):
+        self.bus.publish(self.channel, data)
+
+    def _listen(self):
+        yield from self.bus.subscribe(self.channel)
+
+
+class ShardRouter:
+    """Routes game events to the worker process that owns the game.
+
+    Each worker owns the games whose ID hashes to its shard number. Events
+    that arrive on a connection held by another worker are forwarded over
+    the bus to shard.<owner> and dispatched there.
+    """
+
+    def __init__(self, shard_id: int, shard_count: int, bus: MessageBus):
+        self.shard_id = shard_id
+        self.ring = HashRing(shard_count)
+        self.bus = bus
+
+    def owner(self, game_id: str) -> int:
+        return self.ring.owner(game_id)
+
+    def owns(self, game_id: str) -> bool:
+        return self.ring.owner(game_id) == self.shard_id
+
+    def forward(self, game_id: str, event: str, sid: str, data, **context) -> None:
+        """Send an event to the owning shard; context carries connection details such as the encoding"""
+        self.bus.publish(f"shard.{self.owner(game_id)}",
+                         {"event": event, "sid": sid, "data": data, "context": context})
+
+    def serve(self, dispatch: Callable[[str, str, Dict, Dict], None]) -> None:
+        """Blocking loop handling events forwarded to this shard"""
+        for message in self.bus.subscribe(f"shard.{self.shard_id}"):
+            try:
+                dispatch(message["event"], message["sid"], message["data"], message.get("context", {}))
+            except Exception as e:
+                logger.error("Error handling forwarded event",
+                             extra={"event": message.get("event"), "error": str(e)})
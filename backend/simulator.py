@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from multiprocessing import Pool
+from typing import Dict, List, Optional
+
+from bots import BotPolicy, apply_action, load_policy
+from game_logic import Game, GameStatus, PlayerStatus
+
+# Generous upper bound on turns; a real game ends long before (36 cards, 40 coins)
+MAX_TURNS = 500
+
+
+def play_game(policies: List[BotPolicy], rng: random.Random, game_id: str = "SIM") -> Dict:
+    """Play one complete game between the given policies (one per seat)"""
+    game = Game(game_id, rng=rng)
+    seats = [{'id': f"seat{i}", 'name': policy.name} for i, policy in enumerate(policies)]
+    game.setup_game(seats)
+    policy_by_id = {seat['id']: policy for seat, policy in zip(seats, policies)}
+
+    reason = None
+    turns = 0
+    while game.game_status == GameStatus.ACTIVE and turns < MAX_TURNS:
+        player = game.get_current_investigator()
+        action = policy_by_id[player.player_id].choose_action(game, player.player_id, rng)
+        result = apply_action(game, player.player_id, action)
+        turns += 1
+        if 'error' in result:
+            reason = "illegal_move"
+            break
+        if action.kind == "guess" and result['correct']:
+            reason = "solved"
+
+    if reason is None:
+        if not game.get_active_players():
+            reason = "all_eliminated"
+        elif 40 - game.central_coins >= 37:
+            reason = "coins"
+        elif all(card is None for card in game.face_up_cards):
+            reason = "cards"
+        else:
+            reason = "turn_limit"
+
+    winner_seat = next(
+        (i for i, p in enumerate(game.players) if p.status == PlayerStatus.WINNER), None
+    )
+    return {
+        "players": len(policies),
+        "policies": [policy.name for policy in policies],
+        "reason": reason,
+        "winner_seat": winner_seat,
+        "winner_policy": policies[winner_seat].name if winner_seat is not None else None,
+        "eliminated": sum(1 for p in game.players if p.status == PlayerStatus.ELIMINATED),
+        "investigations": game.total_investigations,
+        "coins_used": 40 - game.central_coins,
+        "turns": turns,
+    }
+
+
+def _run_chunk(task) -> List[Dict]:
+    """Worker entry point: play a chunk of games with an RNG seeded from (seed, chunk)"""
+    seed, chunk_index, first_game, count, policy_specs = task
+    rng = random.Random(f"{seed}:{chunk_index}")
+    results = []
+    for offset in range(count):
+        # Rotate seats so no policy always sits in the same position
+        rotation = (first_game + offset) % len(policy_specs)
+        specs = policy_specs[rotation:] + policy_specs[:rotation]
+        result = play_game([load_policy(spec) for spec in specs], rng)
+        result["game"] = first_game + offset
+        results.append(result)
+    return results
+
+
+class SimulationSummary:
+    """Running aggregate over streamed game results"""
+
+    def __init__(self):
+        self.games = 0
+        self.reasons: Counter = Counter()
+        self.wins: Counter = Counter()
+        self.seats: Counter = Counter()
+        self.investigations = 0
+
+    def add(self, result: Dict) -> None:
+        self.games += 1
+        self.reasons[result["reason"]] += 1
+        self.investigations += result["investigations"]
+        self.seats.update(result["policies"])
+        if result["winner_policy"]:
+            self.wins[result["winner_policy"]] += 1
+
+    def as_dict(self) -> Dict:
+        return {
+            "games": self.games,
+            "end_reasons": dict(self.reasons),
+            "win_rate_by_policy": {
+                name: round(self.wins[name] / seats, 4) for name, seats in self.seats.items()
+            },
+            "mean_investigations": round(self.investigations / self.games, 2) if self.games else 0,
+        }
+
+
+def run_simulation(games: int, policy_specs: List[str], output_path: Optional[str],
+                   workers: Optional[int] = None, seed: int = 0, chunk_size: int = 200) -> Dict:
+    """Spread games over a process pool, streaming results to output_path as JSON lines"""
+    tasks = []
+    for chunk_index, first_game in enumerate(range(0, games, chunk_size)):
+        count = min(chunk_size, games - first_game)
+        tasks.append((seed, chunk_index, first_game, count, list(policy_specs)))
+
+    summary = SimulationSummary()
+    output = open(output_path, "w") if output_path else None
+    try:
+        with Pool(processes=workers or os.cpu_count()) as pool:
+            for results in pool.imap_unordered(_run_chunk, tasks):
+                for result in results:
+                    summary.add(result)
+                    if output:
+                        output.write(json.dumps(result) + "\n")
+    finally:
+        if output:
+            output.close()
+    return summary.as_dict()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run headless Black Vienna games between bots")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--policies", default="random,random,random",
+                        help="comma-separated policy per seat (name or module:Class)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--output", default="simulation_results.jsonl",
+                        help="JSON-lines file for per-game results ('' to skip)")
+    args = parser.parse_args(argv)
+
+    policy_specs = [spec.strip() for spec in args.policies.split(",") if spec.strip()]
+    if not 3 <= len(policy_specs) <= 8:
+        parser.error("Black Vienna needs 3 to 8 players")
+
+    started = time.perf_counter()
+    summary = run_simulation(args.games, policy_specs, args.output or None,
+                             args.workers, args.seed, args.chunk_size)
+    elapsed = time.perf_counter() - started
+    summary["seconds"] = round(elapsed, 2)
+    summary["games_per_minute"] = round(args.games / elapsed * 60) if elapsed else None
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
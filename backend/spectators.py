@@ -0,0 +1,59 @@
+"""Spectator feeds: the public state of a game fanned out to any number of watchers.
+
+Spectators are not players. They are not in the game's player list, so
+they do not count against the 8-player limit, and they only receive the
+public state, never anyone's cards. Each version of a game gets one
+payload, built once and broadcast to the spectator room in a single emit
+(Socket.IO encodes a room emit once, whatever the number of receivers).
+
+Payloads are full snapshots rather than deltas, so a spectator whose
+connection falls behind can skip versions: while its send backlog is above
+a threshold it is left out of broadcasts, and once it has drained it is
+sent the latest snapshot only.
+"""
+from typing import Callable, Dict, List, Optional, Set
+
+from game_logic import Game
+
+
+class SpectatorFeed:
+    """The spectators of one game and the payload of its latest version"""
+
+    def __init__(self, game_id: str):
+        self.game_id = game_id
+        self.spectators: Set[str] = set()
+        self.behind: Set[str] = set()  # Spectators that skipped the latest version
+        self.version: Optional[int] = None
+        self.payload: Optional[Dict] = None
+
+    def snapshot(self, game: Game, events: Optional[List[Dict]] = None) -> Dict:
+        """The payload for the game's current version, built at most once per version.
+
+        events are the outcome events of the move that produced the version;
+        spectators joining later get them along with the snapshot.
+        """
+        if self.version != game.state_version or self.payload is None:
+            payload = game.get_game_state()
+            payload["events"] = events or []
+            self.version, self.payload = game.state_version, payload
+        return self.payload
+
+    def add(self, sid: str) -> None:
+        self.spectators.add(sid)
+        self.behind.discard(sid)
+
+    def remove(self, sid: str) -> None:
+        self.spectators.discard(sid)
+        self.behind.discard(sid)
+
+    def slow(self, backlog: Callable[[str], int], max_backlog: int) -> List[str]:
+        """Spectators to leave out of the broadcast of a new version (they are marked behind)"""
+        slow = [sid for sid in list(self.spectators) if backlog(sid) > max_backlog]
+        self.behind = set(slow)
+        return slow
+
+    def caught_up(self, backlog: Callable[[str], int], max_backlog: int) -> List[str]:
+        """Spectators behind on the latest version whose backlog has drained (no longer behind)"""
+        ready = [sid for sid in list(self.behind) if backlog(sid) <= max_backlog]
+        self.behind.difference_update(ready)
+        return ready
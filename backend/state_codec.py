@@ -0,0 +1,153 @@
+"""Optional compact binary encoding of player state payloads.
+
+Clients opt in at connect time with auth={"encoding": "msgpack"}; everyone
+else keeps the plain JSON dicts. The compact form interns player names as
+indices into Game.players and turns letter lists into 27-bit masks (see
+suspects.py). It is packed with msgpack, which is optional: without it the
+server negotiates JSON.
+
+Compact layouts (all other keys are unchanged):
+    investigation_history  [round, investigator, questioned, letters_mask, coins, is_double]
+    zero_coin_cards        [card_id, letters_mask, used_by, questioned]
+    face_up_cards          [card_id, letters_mask] or None, in deck order
+    my_cards               letters_mask
+    can_question           [player index, ...]
+Player references are indices into the game's player order (the order of
+the full state's "players" list); -1 means unknown. Letter lists decode in
+alphabetical order. Deltas use the same layouts inside "changes" and
+"private".
+"""
+from typing import Dict, List, Optional, Sequence, Union
+
+from suspects import letters_to_mask, mask_to_letters
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+APPENDED_KEYS = ("investigation_history", "zero_coin_cards")
+
+
+def available_encodings() -> List[str]:
+    return [JSON, MSGPACK] if msgpack is not None else [JSON]
+
+
+def negotiate(requested: Optional[str]) -> str:
+    """The encoding to use for a client that asked for `requested`"""
+    return requested if requested in available_encodings() else JSON
+
+
+# ----- Compact form -----
+
+def _index_of(name: str, indices: Dict[str, int]) -> int:
+    return indices.get(name, -1)
+
+
+def _compact_fields(fields: Dict, indices: Dict[str, int], ids: Dict[str, int]) -> Dict:
+    compact = dict(fields)
+    if "investigation_history" in fields:
+        compact["investigation_history"] = _compact_entries(
+            fields["investigation_history"], lambda r: [
+                r["round"], _index_of(r["investigator"], indices), _index_of(r["questioned"], indices),
+                letters_to_mask(r["letters"]), r["coins"], r["is_double"]
+            ])
+    if "zero_coin_cards" in fields:
+        compact["zero_coin_cards"] = _compact_entries(
+            fields["zero_coin_cards"], lambda c: [
+                c["id"], letters_to_mask(c["letters"]),
+                _index_of(c["used_by"], indices), _index_of(c["questioned"], indices)
+            ])
+    if "face_up_cards" in fields:
+        compact["face_up_cards"] = [
+            [slot["card"]["id"], letters_to_mask(slot["card"]["letters"])] if slot["card"] else None
+            for slot in fields["face_up_cards"]
+        ]
+    if "my_cards" in fields:
+        compact["my_cards"] = letters_to_mask(fields["my_cards"])
+    if "can_question" in fields:
+        compact["can_question"] = [ids.get(p["id"], -1) for p in fields["can_question"]]
+    return compact
+
+
+def _compact_entries(value: Union[List, Dict], compact_entry) -> Union[List, Dict]:
+    # Full states hold a list; deltas hold {"from": n, "entries": [...]}
+    if isinstance(value, dict):
+        return {"from": value["from"], "entries": [compact_entry(entry) for entry in value["entries"]]}
+    return [compact_entry(entry) for entry in value]
+
+
+def compact_state(payload: Dict, players: Sequence) -> Dict:
+    """Compact a full view or a delta; players are the game's Player objects in order"""
+    indices: Dict[str, int] = {}
+    for index, player in enumerate(players):
+        indices.setdefault(player.name, index)
+    ids = {p.player_id: index for index, p in enumerate(players)}
+
+    if payload.get("delta"):
+        compact = dict(payload)
+        compact["changes"] = _compact_fields(payload["changes"], indices, ids)
+        if "private" in payload:
+            compact["private"] = _compact_fields(payload["private"], indices, ids)
+        return compact
+    return _compact_fields(payload, indices, ids)
+
+
+def _expand_fields(fields: Dict, players: List[Dict]) -> Dict:
+    def name(index):
+        return players[index]["name"] if 0 <= index < len(players) else "Unknown"
+
+    expanded = dict(fields)
+    if "investigation_history" in fields:
+        expanded["investigation_history"] = _compact_entries(
+            fields["investigation_history"], lambda r: {
+                "round": r[0], "investigator": name(r[1]), "questioned": name(r[2]),
+                "letters": mask_to_letters(r[3]), "coins": r[4], "is_double": r[5]
+            })
+    if "zero_coin_cards" in fields:
+        expanded["zero_coin_cards"] = _compact_entries(
+            fields["zero_coin_cards"], lambda c: {
+                "id": c[0], "letters": mask_to_letters(c[1]), "used_by": name(c[2]), "questioned": name(c[3])
+            })
+    if "face_up_cards" in fields:
+        expanded["face_up_cards"] = [
+            {"deck_index": i, "card": {"id": card[0], "letters": mask_to_letters(card[1])} if card else None}
+            for i, card in enumerate(fields["face_up_cards"])
+        ]
+    if "my_cards" in fields:
+        expanded["my_cards"] = mask_to_letters(fields["my_cards"])
+    if "can_question" in fields:
+        expanded["can_question"] = [
+            {"id": players[i]["id"], "name": players[i]["name"]} for i in fields["can_question"]
+        ]
+    return expanded
+
+
+def expand_state(compact: Dict, players: List[Dict]) -> Dict:
+    """Inverse of compact_state; players is the public "players" list the client already holds"""
+    if compact.get("delta"):
+        players = compact["changes"].get("players", players)
+        expanded = dict(compact)
+        expanded["changes"] = _expand_fields(compact["changes"], players)
+        if "private" in compact:
+            expanded["private"] = _expand_fields(compact["private"], players)
+        return expanded
+    return _expand_fields(compact, compact.get("players", players))
+
+
+# ----- Wire format -----
+
+def encode(payload: Dict, players: Sequence, encoding: str) -> Union[Dict, bytes]:
+    """Payload as emitted to a client using `encoding` (dicts are sent as JSON by Socket.IO)"""
+    if encoding == MSGPACK and msgpack is not None:
+        return msgpack.packb(compact_state(payload, players), use_bin_type=True)
+    return payload
+
+
+def decode(data: Union[Dict, bytes], players: Optional[List[Dict]] = None) -> Dict:
+    """Client-side counterpart of encode()"""
+    if isinstance(data, (bytes, bytearray)):
+        return expand_state(msgpack.unpackb(data, raw=False), players or [])
+    return data
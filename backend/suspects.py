@@ -0,0 +1,46 @@
+from typing import Dict, Iterable, List
+
+# The 27 suspects in their canonical order: A-Z + Omega (using Ω instead of O:)
+SUSPECTS: List[str] = [chr(i) for i in range(65, 91)] + ["Ω"]
+NUM_SUSPECTS = len(SUSPECTS)
+
+# Each suspect owns one bit of a 27-bit integer, so hands and investigation
+# cards can be stored as plain ints and compared with a single AND.
+SUSPECT_BITS: Dict[str, int] = {s: 1 << i for i, s in enumerate(SUSPECTS)}
+ALL_SUSPECTS_MASK: int = (1 << NUM_SUSPECTS) - 1
+
+
+def letters_to_mask(letters: Iterable[str]) -> int:
+    """Pack a collection of suspect letters into a bitmask (unknown letters are ignored)"""
+    mask = 0
+    for letter in letters:
+        mask |= SUSPECT_BITS.get(letter, 0)
+    return mask
+
+
+def mask_to_letters(mask: int) -> List[str]:
+    """Unpack a bitmask into suspect letters, in canonical order"""
+    letters = []
+    while mask:
+        low = mask & -mask
+        letters.append(SUSPECTS[low.bit_length() - 1])
+        mask ^= low
+    return letters
+
+
+def iter_bits(mask: int):
+    """Yield the single-bit masks set in mask, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low
+        mask ^= low
+
+
+def popcount(mask: int) -> int:
+    """Number of suspects in a mask"""
+    return mask.bit_count()
+
+
+def match_count(card_mask: int, hand_mask: int) -> int:
+    """Number of letters of an investigation card found in a hand"""
+    return (card_mask & hand_mask).bit_count()
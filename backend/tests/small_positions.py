@@ -0,0 +1,120 @@
+"""Small random positions, and their exact answers by enumerating every deal"""
+import itertools
+import random
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from deduction import STARTING_COINS
+from game_logic import InvestigationResult
+from suspects import ALL_SUSPECTS_MASK, NUM_SUSPECTS, SUSPECTS, letters_to_mask, mask_to_letters
+
+VIEWER = "viewer"
+
+
+@dataclass
+class SmallPosition:
+    """A viewer who sees all but a handful of letters, and the investigations so far"""
+    hand_sizes: Dict[str, int]
+    known_mask: int
+    history: List[InvestigationResult]
+    hidden_mask: int
+    starting_coins: int
+
+    @property
+    def opponents(self) -> List[str]:
+        return [player_id for player_id in self.hand_sizes if player_id != VIEWER]
+
+
+def random_position(seed: int, opponent_sizes=(3, 3), rounds: int = 6,
+                    starting_coins: int = STARTING_COINS) -> SmallPosition:
+    """Deal the unknown letters at random and question the players with random cards.
+
+    Cards mostly carry unknown letters, so the constraints bite; with few
+    starting coins the pool runs dry and later counts are only lower bounds.
+    """
+    rng = random.Random(seed)
+    unknown = rng.sample(SUSPECTS, 3 + sum(opponent_sizes))
+    known = [letter for letter in SUSPECTS if letter not in unknown]
+    opponents = [f"p{i}" for i in range(1, len(opponent_sizes) + 1)]
+    hands = {VIEWER: letters_to_mask(known)}
+    start = 3
+    for player_id, size in zip(opponents, opponent_sizes):
+        hands[player_id] = letters_to_mask(unknown[start:start + size])
+        start += size
+
+    history = []
+    pool = starting_coins
+    for round_number in range(rounds):
+        questioned = rng.choice(opponents + [VIEWER])
+        card = rng.sample(unknown, 2) + rng.sample(SUSPECTS, 1)
+        if len(set(card)) < 3:
+            card = rng.sample(unknown, 3)
+        coins = min((letters_to_mask(card) & hands[questioned]).bit_count(), pool)
+        pool -= coins
+        history.append(InvestigationResult(round_number, "investigator", questioned, card, coins))
+
+    return SmallPosition(
+        hand_sizes={VIEWER: NUM_SUSPECTS - len(unknown),
+                    **dict(zip(opponents, opponent_sizes))},
+        known_mask=hands[VIEWER],
+        history=history,
+        hidden_mask=letters_to_mask(unknown[:3]),
+        starting_coins=starting_coins
+    )
+
+
+def enumerate_deals(position: SmallPosition) -> List[Tuple[int, Dict[str, int]]]:
+    """Every (hidden triple, opponent hands) deal consistent with the history, by brute force"""
+    unknown = mask_to_letters(ALL_SUSPECTS_MASK & ~position.known_mask)
+    opponents = position.opponents
+    deals = []
+
+    def assign(rest, index, hands):
+        if index == len(opponents):
+            deals.append(dict(hands))
+            return
+        player_id = opponents[index]
+        for hand in itertools.combinations(rest, position.hand_sizes[player_id]):
+            hands[player_id] = letters_to_mask(hand)
+            assign([letter for letter in rest if letter not in hand], index + 1, hands)
+
+    consistent = []
+    for hidden in itertools.combinations(unknown, 3):
+        deals.clear()
+        assign([letter for letter in unknown if letter not in hidden], 0, {})
+        for hands in deals:
+            if _consistent(position, hands):
+                consistent.append((letters_to_mask(hidden), hands))
+    return consistent
+
+
+def _consistent(position: SmallPosition, hands: Dict[str, int]) -> bool:
+    pool = position.starting_coins
+    for result in position.history:
+        if result.questioned_player_id != VIEWER:
+            count = (result.card_mask & hands[result.questioned_player_id]).bit_count()
+            if result.coins_taken != min(count, pool):
+                return False
+        pool -= result.coins_taken
+    return True
+
+
+def triple_weights(position: SmallPosition) -> Counter:
+    """Number of consistent deals per hidden triple"""
+    return Counter(hidden for hidden, _ in enumerate_deals(position))
+
+
+def marginals(position: SmallPosition) -> Dict[str, Dict[str, float]]:
+    """Exact probability of each unknown letter being in each hand, over consistent deals"""
+    deals = enumerate_deals(position)
+    owners = {"hidden": Counter()}
+    for player_id in position.opponents:
+        owners[player_id] = Counter()
+    for hidden, hands in deals:
+        owners["hidden"].update(mask_to_letters(hidden))
+        for player_id, hand in hands.items():
+            owners[player_id].update(mask_to_letters(hand))
+    unknown = mask_to_letters(ALL_SUSPECTS_MASK & ~position.known_mask)
+    return {letter: {owner: counts[letter] / len(deals) for owner, counts in owners.items()}
+            for letter in unknown}
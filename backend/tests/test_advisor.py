@@ -0,0 +1,115 @@
+import random
+import time
+from collections import OrderedDict, defaultdict
+
+import pytest
+
+import decks
+import probabilities
+from advisor import Position, snapshot, suggest, suspect_probabilities
+from bots import RandomPolicy, apply_action
+from deduction import STARTING_COINS
+from game_logic import Game
+from probabilities import SuspectProbabilityEstimator
+from small_positions import VIEWER, enumerate_deals, marginals, random_position
+
+pytestmark = pytest.mark.skipif(not SuspectProbabilityEstimator.available(), reason="needs NumPy")
+
+
+def advisor_position(seed, opponent_sizes):
+    """A small position with four face-up cards and one zero-coin card, as the advisor sees it"""
+    position = random_position(seed, opponent_sizes, rounds=5)
+    cards = random.Random(seed).sample(decks.variant().cards, 5)
+    return position, Position(
+        game_id=f"game-{seed}",
+        version=1,
+        player_id=VIEWER,
+        hand_sizes=position.hand_sizes,
+        known_mask=position.known_mask,
+        history=tuple(position.history),
+        central_coins=STARTING_COINS - sum(result.coins_taken for result in position.history),
+        deck=decks.DEFAULT,
+        face_up=tuple((index, card.card_id) for index, card in enumerate(cards[:4])),
+        opponents=tuple((player_id, player_id.upper()) for player_id in position.opponents),
+        double_cards=(cards[4].card_id,)
+    )
+
+
+def exact_remaining(position, advice_position):
+    """Expected candidates left after each option, over every consistent deal"""
+    deals = enumerate_deals(position)
+    coins = advice_position.central_coins
+    variant = decks.variant(advice_position.deck)
+    mask = lambda card_id: variant.cards[variant.card_rows[card_id]].mask
+    remaining = {}
+    for card_index, card_id in advice_position.face_up:
+        card_mask = mask(card_id)
+        for opponent_id, _ in advice_position.opponents:
+            for double_id, double_mask in [(None, 0)] + [(d, mask(d)) for d in advice_position.double_cards]:
+                triples, counts = defaultdict(set), defaultdict(int)
+                for hidden, hands in deals:
+                    taken = min((hands[opponent_id] & card_mask).bit_count(), coins)
+                    outcome = (taken, min((hands[opponent_id] & double_mask).bit_count(), coins - taken))
+                    triples[outcome].add(hidden)
+                    counts[outcome] += 1
+                remaining[card_index, opponent_id, double_id] = sum(
+                    counts[outcome] * len(triples[outcome]) for outcome in counts) / len(deals)
+    return remaining
+
+
+def scored(reply, remaining):
+    return [remaining[s["card_index"], s["questioned_player_id"], s["double_card_id"]]
+            for s in reply["suggestions"]]
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_ranking_matches_exact_scoring(seed):
+    position, advice_position = advisor_position(seed, (3, 3))
+    remaining = exact_remaining(position, advice_position)
+    reply = suggest(advice_position, time.monotonic() + 30)
+    tolerance = 0.01 * reply["candidates"]
+
+    assert reply["complete"]
+    assert reply["candidates"] == len({hidden for hidden, _ in enumerate_deals(position)})
+    assert scored(reply, remaining) == pytest.approx(sorted(remaining.values())[:3], abs=tolerance)
+    for suggestion, exact in zip(reply["suggestions"], scored(reply, remaining)):
+        assert suggestion["expected_remaining"] == pytest.approx(exact, abs=tolerance)
+
+
+@pytest.mark.parametrize("seed", [1, 3, 4])
+def test_sampled_best_option_is_near_exact_best(seed, monkeypatch):
+    monkeypatch.setattr(probabilities, "EXACT_DEALS", 0)
+    position, advice_position = advisor_position(seed, (3, 3, 3))
+    remaining = exact_remaining(position, advice_position)
+    reply = suggest(advice_position, time.monotonic() + 30)
+
+    assert scored(reply, remaining)[0] <= min(remaining.values()) + 0.05 * reply["candidates"]
+
+
+def test_short_deadline_returns_before_the_burn_in_ends():
+    rng = random.Random(3)
+    game = Game("DEADLINE", rng=rng)
+    game.setup_game([{"id": f"p{i}", "name": f"Player {i}"} for i in range(6)])
+    for _ in range(6):
+        player_id = game.get_current_investigator().player_id
+        apply_action(game, player_id, RandomPolicy().choose_action(game, player_id, rng))
+    position = snapshot(game, game.get_current_investigator().player_id)
+    engines = OrderedDict()
+    suggest(position, time.monotonic() + 0.001, engines)  # Builds the engine; its chains are still cold
+
+    started = time.monotonic()
+    reply = suggest(position, started + 0.02, engines)
+
+    assert time.monotonic() - started < 0.15
+    assert not reply["complete"] and reply["candidates"] > 1
+
+
+@pytest.mark.parametrize("seed", [0, 2])
+def test_worker_probabilities_match_enumeration(seed):
+    position, advice_position = advisor_position(seed, (3, 3, 3))
+    exact = marginals(position)
+    reply = suspect_probabilities(advice_position, time.monotonic() + 30)
+
+    assert reply["version"] == advice_position.version
+    assert max(abs(reply["probabilities"][letter][owner] - share)
+               for letter, shares in exact.items() for owner, share in shares.items()) < 0.05
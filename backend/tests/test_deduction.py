@@ -0,0 +1,115 @@
+import random
+from collections import defaultdict
+
+import pytest
+
+from deduction import DeductionEngine
+from deduction_cache import DeductionCache, canonical_position
+from game_logic import InvestigationResult
+from small_positions import VIEWER, enumerate_deals, random_position, triple_weights
+from suspects import SUSPECTS, iter_bits, letters_to_mask, mask_to_letters
+
+
+def engine_for(position):
+    return DeductionEngine(position.hand_sizes, VIEWER, position.known_mask,
+                           starting_coins=position.starting_coins)
+
+
+@pytest.mark.parametrize("seed", range(12))
+@pytest.mark.parametrize("opponent_sizes", [(3, 3), (2, 3, 2)])
+def test_candidates_match_brute_force(seed, opponent_sizes):
+    position = random_position(seed, opponent_sizes)
+    engine = engine_for(position)
+    engine.sync(position.history)
+
+    assert engine.candidate_masks() == sorted(triple_weights(position))
+    assert position.hidden_mask in engine.candidate_masks()
+
+
+# Seeds whose history empties the 4-coin pool while questioning an opponent
+@pytest.mark.parametrize("seed", [0, 1, 2, 3, 4, 6, 7, 8, 10, 11])
+def test_pool_running_dry_only_gives_lower_bounds(seed):
+    position = random_position(seed, (3, 3), rounds=8, starting_coins=4)
+    engine = engine_for(position)
+    engine.sync(position.history)
+
+    assert any(not c.exact for constraints in engine.constraints for c in constraints)
+    assert engine.candidate_masks() == sorted(triple_weights(position))
+    assert position.hidden_mask in engine.candidate_masks()
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("opponent_sizes", [(3, 3), (3, 2, 3)])
+def test_incremental_narrowing_matches_a_fresh_engine(seed, opponent_sizes):
+    position = random_position(seed, opponent_sizes, rounds=8, starting_coins=6)
+    engine = engine_for(position)
+    engine.candidate_masks()  # Build the witnesses before any constraint arrives
+
+    for seen in range(1, len(position.history) + 1):
+        engine.sync(position.history[:seen])
+        fresh = engine_for(position)
+        fresh.sync(position.history[:seen])
+        assert engine.candidate_masks() == fresh.candidate_masks()
+        for triple in engine.candidate_masks():
+            deal = engine.slot_witness(triple)
+            assert deal[0] == triple and sum(deal) == engine.unknown_mask
+            assert [hand.bit_count() for hand in deal] == engine.sizes
+            assert all(c.holds(deal[slot]) for slot, constraints in enumerate(engine.constraints)
+                       for c in constraints)
+    assert engine.candidate_masks() == sorted(triple_weights(position))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_iter_solutions_yields_every_consistent_deal(seed):
+    position = random_position(seed, (3, 3))
+    engine = engine_for(position)
+    engine.sync(position.history)
+
+    solutions = {(tuple(triple), tuple(sorted((pid, tuple(hand)) for pid, hand in hands.items())))
+                 for triple, hands in engine.iter_solutions()}
+    assert len(solutions) == len(enumerate_deals(position))
+
+
+def relabelled(position, seed):
+    """The same problem with the suspects permuted and the opponents renamed and reordered"""
+    rng = random.Random(seed)
+    letters = dict(zip(SUSPECTS, rng.sample(SUSPECTS, len(SUSPECTS))))
+    opponents = position.opponents
+    names = dict(zip(opponents, rng.sample([f"q{i}" for i in range(len(opponents))], len(opponents))))
+    names[VIEWER] = VIEWER
+    rename = lambda mask: letters_to_mask([letters[letter] for letter in mask_to_letters(mask)])
+    order = [VIEWER] + rng.sample(opponents, len(opponents))
+    history = [
+        InvestigationResult(r.round_number, r.investigator_id, names[r.questioned_player_id],
+                            mask_to_letters(rename(r.card_mask)), r.coins_taken)
+        for r in position.history
+    ]
+    return ({names[player_id]: position.hand_sizes[player_id] for player_id in order},
+            rename(position.known_mask), history)
+
+
+def test_shared_cache_matches_fresh_engines():
+    """Every position and relabelled copy, at every history length, served from one cache"""
+    cache = DeductionCache()
+    candidates_by_key = defaultdict(set)
+    compared = 0
+    for seed in range(12):
+        position = random_position(seed, (3, 2, 3) if seed % 2 else (3, 3), rounds=8)
+        problems = [(position.hand_sizes, position.known_mask, position.history)]
+        problems += [relabelled(position, seed * 10 + copy) for copy in range(3)]
+        for hand_sizes, known_mask, history in problems:
+            for seen in range(len(history) + 1):
+                engine = DeductionEngine(hand_sizes, VIEWER, known_mask)
+                engine.sync(history[:seen])
+                canonical = canonical_position(hand_sizes, VIEWER, known_mask, history[:seen])
+
+                assert cache.candidates(canonical, engine.candidate_masks) == engine.candidate_masks()
+                compared += 1
+                # Positions sharing a key are the same problem: same candidates in canonical labels
+                lookup = {bit: 1 << i for i, bit in enumerate(canonical.letters)}
+                candidates_by_key[canonical.key].add(tuple(sorted(
+                    sum(lookup[bit] for bit in iter_bits(mask)) for mask in engine.candidate_masks())))
+
+    assert all(len(candidate_sets) == 1 for candidate_sets in candidates_by_key.values())
+    assert cache.hits["candidates"] > 0
+    assert compared > 300
@@ -0,0 +1,116 @@
+import importlib
+
+import pytest
+
+from lobbies import MAX_PLAYERS, MatchQueue, OpenGames
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    """app.py with its data in a temporary directory"""
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("BLACK_VIENNA_DATA_DIR", str(tmp_path_factory.mktemp("game_data")))
+        patch.setenv("BLACK_VIENNA_LOG_LEVEL", "WARNING")
+        yield importlib.import_module("app")
+
+
+def connect(server):
+    client = server.socketio.test_client(server.app)
+    sid = next(m for m in client.get_received() if m["name"] == "connected")["args"][0]["session_id"]
+    return client, sid
+
+
+def create_lobby(client):
+    client.emit("create_game", {"player_name": "host"})
+    return next(m for m in client.get_received() if m["name"] == "game_created")["args"][0]["game_id"]
+
+
+def test_requeue_after_cancel_goes_to_the_back():
+    queue = MatchQueue()
+    queue.push("a", "Anna")
+    queue.push("b", "Ben")
+    assert queue.cancel("a")
+    queue.push("a", "Anna")
+
+    assert queue.pop(2) == [("b", "Ben"), ("a", "Anna")]
+
+
+def test_renaming_keeps_the_place():
+    queue = MatchQueue()
+    queue.push("a", "Anna")
+    assert queue.push("b", "Ben") == 2
+    assert queue.push("a", "Ann") == 2
+
+    assert queue.pop(1) == [("a", "Ann")]
+    assert "a" not in queue and len(queue) == 1
+
+
+def test_cancelled_players_leave_nothing_behind():
+    queue = MatchQueue()
+    for round_number in range(1000):
+        queue.push("a", f"Anna {round_number}")
+        queue.cancel("a")
+
+    assert len(queue) == 0
+    assert queue.pop(8) == []
+    assert not queue.cancel("a")
+
+
+def test_open_games_are_ordered_fullest_first():
+    index = OpenGames()
+    index.update("A", 5)
+    index.update("B", 2)
+    index.update("C", 2)
+
+    assert index.fullest() == "B"
+    assert index.counts() == {**{free: 0 for free in range(1, MAX_PLAYERS + 1)}, 2: 2, 5: 1}
+    index.update("B", 6)
+    assert index.fullest() == "C"
+
+
+def test_full_or_removed_games_leave_the_index():
+    index = OpenGames()
+    index.update("A", 1)
+    index.update("B", 3)
+    index.update("A", 0)
+
+    assert "A" not in index and index.free_seats("A") == 0 and len(index) == 1
+    index.remove("B")
+    assert len(index) == 0 and index.fullest() is None
+    index.remove("B")
+    index.update("A", 2)
+    assert index.fullest() == "A"
+
+
+def test_lobby_leaves_the_index_when_it_fills_or_starts(server):
+    host, _ = connect(server)
+    game_id = create_lobby(host)
+    assert game_id in server.open_games
+
+    for _ in range(MAX_PLAYERS - 1):
+        host.emit("add_bot", {"game_id": game_id})
+    assert server.open_games.free_seats(game_id) == 0
+    host.emit("remove_bot", {"game_id": game_id, "player_id": server.games[game_id]["players"][-1]["id"]})
+    assert server.open_games.free_seats(game_id) == 1
+
+    host.emit("start_game", {"game_id": game_id})
+    assert server.games[game_id]["game"].game_status.value == "active"
+    assert game_id not in server.open_games
+
+
+def test_lobby_stays_listed_when_the_host_hands_off(server):
+    host, _ = connect(server)
+    guest, guest_sid = connect(server)
+    game_id = create_lobby(host)
+    guest.emit("join_game", {"game_id": game_id, "player_name": "guest"})
+    host.emit("add_bot", {"game_id": game_id})
+    assert server.open_games.free_seats(game_id) == MAX_PLAYERS - 3
+
+    host.emit("leave_game", {"game_id": game_id})
+    assert server.games[game_id]["host"] == guest_sid
+    assert server.open_games.free_seats(game_id) == MAX_PLAYERS - 2
+
+    # Only the bot is left
+    guest.emit("leave_game", {"game_id": game_id})
+    assert game_id not in server.games
+    assert game_id not in server.open_games
@@ -0,0 +1,94 @@
+import pytest
+
+import probabilities
+from deduction import DeductionEngine
+from probabilities import SuspectProbabilityEstimator
+from small_positions import VIEWER, enumerate_deals, marginals, random_position
+
+pytestmark = pytest.mark.skipif(not SuspectProbabilityEstimator.available(), reason="needs NumPy")
+
+
+def engine_for(position, history=None):
+    engine = DeductionEngine(position.hand_sizes, VIEWER, position.known_mask,
+                             starting_coins=position.starting_coins)
+    engine.sync(position.history if history is None else history)
+    return engine
+
+
+def refined_estimate(estimator, tallied=400):
+    """Call estimate() until that many steps were tallied on settled chains, as repeated requests would"""
+    estimate = estimator.estimate()
+    while not estimator.final or estimator.tallied < tallied:
+        estimate = estimator.estimate()
+    return estimate
+
+
+def largest_error(estimate, exact):
+    return max(abs(estimate[letter][owner] - share)
+               for letter, shares in exact.items() for owner, share in shares.items())
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_small_positions_are_exact(seed):
+    position = random_position(seed, (3, 3), rounds=8)
+    estimator = SuspectProbabilityEstimator(engine_for(position), seed=seed)
+
+    assert largest_error(estimator.estimate(), marginals(position)) < 1e-4
+
+
+@pytest.mark.parametrize("seed", [0, 4])
+def test_sampled_marginals_match_enumeration(seed, monkeypatch):
+    monkeypatch.setattr(probabilities, "EXACT_DEALS", 0)
+    position = random_position(seed, (3, 3, 3), rounds=6)
+    estimator = SuspectProbabilityEstimator(engine_for(position), seed=seed)
+
+    assert largest_error(refined_estimate(estimator), marginals(position)) < 0.05
+
+
+def test_chains_follow_new_constraints(monkeypatch):
+    monkeypatch.setattr(probabilities, "EXACT_DEALS", 0)
+    position = random_position(1, (3, 3, 3), rounds=6)
+    engine = engine_for(position, position.history[:3])
+    estimator = SuspectProbabilityEstimator(engine, seed=1)
+    refined_estimate(estimator)
+
+    engine.sync(position.history)
+    assert largest_error(refined_estimate(estimator), marginals(position)) < 0.05
+
+
+def test_sampled_deals_are_consistent():
+    position = random_position(2, (3, 3), rounds=8)
+    engine = engine_for(position)
+    deals = {tuple(int(hand) for hand in row)
+             for row in SuspectProbabilityEstimator(engine, seed=2).sample_deals(4)}
+    consistent = {(hidden, *(hands[pid] for pid in engine.owner_ids[1:]))
+                  for hidden, hands in enumerate_deals(position)}
+
+    assert deals <= consistent
+
+
+def test_estimates_are_bounded_per_call_and_refined_over_calls(monkeypatch):
+    monkeypatch.setattr(probabilities, "EXACT_DEALS", 0)
+    position = random_position(0, (3, 3, 3), rounds=6)
+    estimator = SuspectProbabilityEstimator(engine_for(position), seed=0)
+    walked = []
+    step = estimator._step
+    monkeypatch.setattr(estimator, "_step", lambda rows: walked.append(1) or step(rows))
+
+    calls = 0
+    while not estimator.final:
+        walked.clear()
+        estimator.estimate()
+        calls += 1
+        assert len(walked) <= estimator.steps
+    assert calls > 1  # The burn-in alone takes more than one call
+    assert estimator.tallied >= probabilities.FINAL_STEPS
+
+
+def test_seeded_estimates_are_reproducible(monkeypatch):
+    monkeypatch.setattr(probabilities, "EXACT_DEALS", 0)
+    position = random_position(3, (3, 3, 3), rounds=4)
+    first = SuspectProbabilityEstimator(engine_for(position), seed=7).estimate()
+    second = SuspectProbabilityEstimator(engine_for(position), seed=7).estimate()
+
+    assert first == second
@@ -1,10 +1,14 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import Menu from './components/Menu';
 import Lobby from './components/Lobby';
 import GameBoard from './components/GameBoard';
 import { useSocket } from './hooks/useSocket';
+import { applyStateDelta } from './utils/stateDelta';
 import './styles/App.css';
 
+// Lets a reconnecting client (or a reloaded tab) take its seat back
+const SESSION_KEY = 'blackVienna.session';
+
 function App() {
   const [gameState, setGameState] = useState('menu'); // menu, lobby, playing, ended
   const [playerName, setPlayerName] = useState('');
@@ -15,9 +19,22 @@ function App() {
   const [currentGameState, setCurrentGameState] = useState(null);
   const [gameEndData, setGameEndData] = useState(null);
   const [notifications, setNotifications] = useState([]);
+  const gameStateRef = useRef(null);
 
   const { socket, isConnected } = useSocket();
 
+  // Deltas are applied to the latest state even before React re-renders
+  useEffect(() => {
+    gameStateRef.current = currentGameState;
+  }, [currentGameState]);
+
+  // The host can change in the lobby when the previous one leaves
+  useEffect(() => {
+    if (lobbyData && playerId) {
+      setIsHost(lobbyData.host_id === playerId);
+    }
+  }, [lobbyData, playerId]);
+
   // Add notification
   const addNotification = (message, type = 'info') => {
     const id = Date.now();
@@ -33,6 +50,28 @@ function App() {
     // Connection events
     socket.on('connected', (data) => {
       console.log('Connected with session ID:', data.session_id);
+      const saved = JSON.parse(sessionStorage.getItem(SESSION_KEY) || 'null');
+      if (saved) {
+        socket.emit('resume_session', {
+          game_id: saved.gameId,
+          token: saved.token,
+          version: gameStateRef.current?.version
+        });
+      }
+    });
+
+    socket.on('session_resumed', (data) => {
+      setGameId(data.game_id);
+      setPlayerId(data.player_id);
+      setIsHost(data.is_host);
+      if (data.status === 'waiting') {
+        setGameState('lobby');
+      }
+    });
+
+    socket.on('resume_failed', (data) => {
+      sessionStorage.removeItem(SESSION_KEY);
+      addNotification(data.message, 'warning');
     });
 
     // Game creation
@@ -41,6 +80,7 @@ function App() {
       setPlayerId(data.player_id);
       setIsHost(data.is_host);
       setGameState('lobby');
+      sessionStorage.setItem(SESSION_KEY, JSON.stringify({ gameId: data.game_id, token: data.resume_token }));
       addNotification(`Game created! ID: ${data.game_id}`, 'success');
     });
 
@@ -50,6 +90,7 @@ function App() {
       setPlayerId(data.player_id);
       setIsHost(data.is_host);
       setGameState('lobby');
+      sessionStorage.setItem(SESSION_KEY, JSON.stringify({ gameId: data.game_id, token: data.resume_token }));
       addNotification('Successfully joined game!', 'success');
     });
 
@@ -58,66 +99,90 @@ function App() {
       setLobbyData(data);
     });
 
-    // Game started
+    // Outcome events of a move, delivered with the state update that carries the move
+    const moveEventHandlers = {
+      investigation_result: (data) => {
+        const result = data.result;
+        const message = `${result.investigator_name} questioned ${result.questioned_player_name} about ${result.card_letters.join(', ')} → ${result.coins_taken} coin${result.coins_taken !== 1 ? 's' : ''}`;
+        addNotification(message, 'info');
+        
+        if (data.double_result) {
+          const double = data.double_result;
+          const doubleMessage = `Double Investigation: ${double.card_letters.join(', ')} → ${double.coins_taken} coin${double.coins_taken !== 1 ? 's' : ''}`;
+          addNotification(doubleMessage, 'info');
+        }
+      },
+
+      player_eliminated: (data) => {
+        addNotification(`${data.player_name} has been eliminated!`, 'warning');
+      },
+
+      game_won: (data) => {
+        setGameEndData({
+          type: 'won',
+          winner: data.winner_name,
+          solution: data.solution
+        });
+        setGameState('ended');
+        addNotification(`🏆 ${data.winner_name} has won the game!`, 'success');
+      },
+
+      game_ended: (data) => {
+        setGameEndData({
+          type: 'ended',
+          reason: data.reason,
+          solution: data.solution
+        });
+        setGameState('ended');
+        
+        if (data.reason === 'conditions_met') {
+          addNotification('Game ended - conditions met!', 'info');
+        } else if (data.reason === 'all_eliminated') {
+          addNotification('Game ended - all players eliminated!', 'warning');
+        }
+      }
+    };
+
+    const dispatchMoveEvents = (data) => {
+      (data.events || []).forEach(({ event, data: eventData }) => moveEventHandlers[event]?.(eventData));
+    };
+
+    // Game started (also sent to a reloaded client resuming a running game)
     socket.on('game_started', (data) => {
+      gameStateRef.current = data;
       setCurrentGameState(data);
       setGameState('playing');
       addNotification('Game has started!', 'success');
+      dispatchMoveEvents(data);
     });
 
-    // Game state updates
+    // Game state updates: full snapshots, deltas against the version a request named,
+    // a move broadcast to the whole game, or a private envelope with only our own fields
     socket.on('game_state_update', (data) => {
-      setCurrentGameState(data);
-    });
+      dispatchMoveEvents(data);
 
-    // Investigation results
-    socket.on('investigation_result', (data) => {
-      const result = data.result;
-      const message = `${result.investigator_name} questioned ${result.questioned_player_name} about ${result.card_letters.join(', ')} → ${result.coins_taken} coin${result.coins_taken !== 1 ? 's' : ''}`;
-      addNotification(message, 'info');
-      
-      if (data.double_result) {
-        const double = data.double_result;
-        const doubleMessage = `Double Investigation: ${double.card_letters.join(', ')} → ${double.coins_taken} coin${double.coins_taken !== 1 ? 's' : ''}`;
-        addNotification(doubleMessage, 'info');
+      const next = data.delta ? applyStateDelta(gameStateRef.current, data) : data;
+      if (!next) {
+        socket.emit('request_game_state', { game_id: data.game_id });
+        return;
       }
-    });
 
-    // Player eliminated
-    socket.on('player_eliminated', (data) => {
-      addNotification(`${data.player_name} has been eliminated!`, 'warning');
+      gameStateRef.current = next;
+      setCurrentGameState(next);
     });
 
-    // Game won
-    socket.on('game_won', (data) => {
-      setGameEndData({
-        type: 'won',
-        winner: data.winner_name,
-        solution: data.solution
-      });
-      setGameState('ended');
-      addNotification(`🏆 ${data.winner_name} has won the game!`, 'success');
+    // Player disconnected
+    socket.on('player_disconnected', (data) => {
+      addNotification(data.message, 'warning');
     });
 
-    // Game ended
-    socket.on('game_ended', (data) => {
-      setGameEndData({
-        type: 'ended',
-        reason: data.reason,
-        solution: data.solution
-      });
-      setGameState('ended');
-      
-      if (data.reason === 'conditions_met') {
-        addNotification('Game ended - conditions met!', 'info');
-      } else if (data.reason === 'all_eliminated') {
-        addNotification('Game ended - all players eliminated!', 'warning');
-      }
+    socket.on('player_reconnected', (data) => {
+      addNotification(`${data.player_name} is back`, 'info');
     });
 
-    // Player disconnected
-    socket.on('player_disconnected', (data) => {
-      addNotification(data.message, 'warning');
+    // Quick match: no open lobby yet, wait for one (game_joined/game_created follow)
+    socket.on('quick_match_queued', (data) => {
+      addNotification(`Looking for a game... (${data.waiting} waiting)`, 'info');
     });
 
     // Errors
@@ -128,16 +193,16 @@ function App() {
     // Clean up
     return () => {
       socket.off('connected');
+      socket.off('session_resumed');
+      socket.off('resume_failed');
       socket.off('game_created');
       socket.off('game_joined');
       socket.off('lobby_update');
       socket.off('game_started');
       socket.off('game_state_update');
-      socket.off('investigation_result');
-      socket.off('player_eliminated');
-      socket.off('game_won');
-      socket.off('game_ended');
       socket.off('player_disconnected');
+      socket.off('player_reconnected');
+      socket.off('quick_match_queued');
       socket.off('error');
     };
   }, [socket]);
@@ -150,6 +215,14 @@ function App() {
     socket?.emit('create_game', { player_name: playerName });
   };
 
+  const handleQuickMatch = () => {
+    if (!playerName.trim()) {
+      addNotification('Please enter your name', 'error');
+      return;
+    }
+    socket?.emit('quick_match', { player_name: playerName });
+  };
+
   const handleJoinGame = () => {
     if (!playerName.trim() || !gameId.trim()) {
       addNotification('Please enter your name and game ID', 'error');
@@ -175,10 +248,19 @@ function App() {
     socket?.emit('start_game', { game_id: gameId });
   };
 
+  const handleAddBot = (policy) => {
+    socket?.emit('add_bot', { game_id: gameId, policy: policy || undefined });
+  };
+
+  const handleRemoveBot = (botId) => {
+    socket?.emit('remove_bot', { game_id: gameId, player_id: botId });
+  };
+
   const handleBackToMenu = () => {
     if (gameState === 'playing' || gameState === 'lobby') {
       socket?.emit('leave_game', { game_id: gameId });
     }
+    sessionStorage.removeItem(SESSION_KEY);
     
     setGameState('menu');
     setGameId('');
@@ -221,6 +303,7 @@ function App() {
             onGameIdChange={setGameId}
             onCreateGame={handleCreateGame}
             onJoinGame={handleJoinGame}
+            onQuickMatch={handleQuickMatch}
           />
         )}
         
@@ -230,6 +313,8 @@ function App() {
             lobbyData={lobbyData}
             isHost={isHost}
             onStartGame={handleStartGame}
+            onAddBot={handleAddBot}
+            onRemoveBot={handleRemoveBot}
             onBackToMenu={handleBackToMenu}
           />
         )}
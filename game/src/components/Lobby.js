@@ -1,7 +1,8 @@
 import React, { useState } from 'react';
 
-const Lobby = ({ gameId, lobbyData, isHost, onStartGame, onBackToMenu }) => {
+const Lobby = ({ gameId, lobbyData, isHost, onStartGame, onAddBot, onRemoveBot, onBackToMenu }) => {
   const [copied, setCopied] = useState(false);
+  const [botPolicy, setBotPolicy] = useState('');
   
   const copyToClipboard = () => {
     if (navigator.clipboard) {
@@ -63,6 +64,18 @@ const Lobby = ({ gameId, lobbyData, isHost, onStartGame, onBackToMenu }) => {
                 {player.id === lobbyData?.host_id && (
                   <span className="host-badge">Host</span>
                 )}
+                {player.bot && (
+                  <span className="bot-badge" title={`Plays the ${player.bot} strategy`}>Bot</span>
+                )}
+                {player.bot && isHost && (
+                  <button
+                    onClick={() => onRemoveBot(player.id)}
+                    className="btn btn-ghost btn-xs"
+                    title="Remove bot"
+                  >
+                    ✕
+                  </button>
+                )}
               </div>
             ))}
             
@@ -80,6 +93,23 @@ const Lobby = ({ gameId, lobbyData, isHost, onStartGame, onBackToMenu }) => {
         <div className="lobby-actions">
           {isHost ? (
             <>
+              {playerCount < maxPlayers && (
+                <div className="add-bot">
+                  <select
+                    value={botPolicy}
+                    onChange={(e) => setBotPolicy(e.target.value)}
+                    className="bot-policy-select"
+                  >
+                    <option value="">Default bot</option>
+                    {(lobbyData?.bot_policies || []).map(policy => (
+                      <option key={policy} value={policy}>{policy}</option>
+                    ))}
+                  </select>
+                  <button onClick={() => onAddBot(botPolicy)} className="btn btn-ghost btn-sm">
+                    🤖 Add bot
+                  </button>
+                </div>
+              )}
               <button 
                 onClick={onStartGame} 
                 className={`btn ${canStart ? 'btn-primary' : 'btn-disabled'} btn-lg`}
@@ -6,7 +6,8 @@ const Menu = ({
   onPlayerNameChange, 
   onGameIdChange, 
   onCreateGame, 
-  onJoinGame 
+  onJoinGame,
+  onQuickMatch
 }) => {
   return (
     <div className="menu-container">
@@ -35,6 +36,11 @@ const Menu = ({
             Create New Game
           </button>
           
+          <button onClick={onQuickMatch} className="btn btn-secondary">
+            <span className="btn-icon">⚡</span>
+            Quick Match
+          </button>
+          
           <div className="divider">
             <span>or</span>
           </div>
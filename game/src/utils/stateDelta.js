@@ -0,0 +1,22 @@
+// Apply a delta-encoded game_state_update on top of the state the client holds.
+// Returns null when the delta cannot be applied and a full snapshot is needed.
+export const applyStateDelta = (state, update) => {
+  if (!state || state.version === undefined || state.version < update.base_version) {
+    return null;
+  }
+
+  const next = { ...state, ...update.private, version: update.version };
+  Object.entries(update.changes).forEach(([key, value]) => {
+    if (value && value.entries && value.from !== undefined) {
+      // Append-only lists: replace everything from the first new entry onwards
+      next[key] = (state[key] || []).slice(0, value.from).concat(value.entries);
+    } else {
+      next[key] = value;
+    }
+  });
+
+  if (!next.is_my_turn) {
+    delete next.can_question;
+  }
+  return next;
+};